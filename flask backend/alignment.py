@@ -0,0 +1,131 @@
+# Moteur d'alignement texte cible / transcription.
+# Les distances sont calculées par vecteurs de bits (Myers / Hyyrö) : une passe
+# sur la seconde séquence, chaque colonne de la matrice étant traitée d'un coup
+# sous forme d'entier. L'alignement mot à mot est reconstruit par une
+# programmation dynamique limitée à une bande de largeur égale à la distance
+# (Ukkonen), donc en O(n·d) au lieu de O(n·m).
+
+EQUAL = "egal"
+SUBSTITUTE = "substitution"
+INSERT = "insertion"
+DELETE = "suppression"
+
+
+def symbol_masks(seq):
+    # Masque de bits des positions de chaque symbole de seq
+    masks = {}
+    for i, symbol in enumerate(seq):
+        masks[symbol] = masks.get(symbol, 0) | (1 << i)
+    return masks
+
+
+def lcs_length(a, b, peq=None):
+    """
+    Longueur de la plus longue sous-séquence commune (bits parallèles).
+    peq : masques de a déjà calculés (voir PassageIndex), sinon calculés ici.
+    """
+    if not a or not b:
+        return 0
+    peq = peq if peq is not None else symbol_masks(a)
+    mask = (1 << len(a)) - 1
+    v = mask
+    for symbol in b:
+        u = v & peq.get(symbol, 0)
+        v = ((v + u) | (v - u)) & mask
+    return len(a) - bin(v).count("1")
+
+
+def levenshtein(a, b, peq=None):
+    """
+    Distance d'édition (substitution, insertion, suppression de coût 1),
+    algorithme de Myers sur vecteurs de bits.
+    """
+    n = len(a)
+    if n == 0:
+        return len(b)
+    peq = peq if peq is not None else symbol_masks(a)
+    mask = (1 << n) - 1
+    last = 1 << (n - 1)
+    pv, mv, score = mask, 0, n
+    for symbol in b:
+        eq = peq.get(symbol, 0)
+        xv = eq | mv
+        xh = ((((eq & pv) + pv) & mask) ^ pv) | eq
+        ph = (mv | ~(xh | pv)) & mask
+        mh = pv & xh
+        if ph & last:
+            score += 1
+        elif mh & last:
+            score -= 1
+        ph = ((ph << 1) | 1) & mask
+        mh = (mh << 1) & mask
+        pv = (mh | ~(xv | ph)) & mask
+        mv = ph & xv
+    return score
+
+
+def similarity_ratio(a, b, peq=None):
+    """
+    2 * LCS / (len(a) + len(b)) : même définition que difflib.SequenceMatcher.ratio(),
+    mais exacte (pas d'heuristique autojunk) et stable sur les longs textes.
+    """
+    total = len(a) + len(b)
+    if total == 0:
+        return 1.0
+    return 2.0 * lcs_length(a, b, peq) / total
+
+
+def align(ref, hyp, peq=None):
+    """
+    Alignement de coût minimal entre deux listes de mots.
+    Renvoie (distance, opérations) où chaque opération est (type, mot_ref, mot_hyp).
+    """
+    n, m = len(ref), len(hyp)
+    band = max(levenshtein(ref, hyp, peq), abs(n - m))
+
+    # Programmation dynamique limitée à |i - j| <= band ; ligne i stockée pour j in [lo, hi]
+    inf = n + m + 1
+    rows = []
+    prev = None
+    prev_lo = 0
+    for i in range(n + 1):
+        lo, hi = max(0, i - band), min(m, i + band)
+        row = [inf] * (hi - lo + 1)
+        for j in range(lo, hi + 1):
+            if i == 0:
+                row[j - lo] = j
+                continue
+            best = inf
+            if prev_lo <= j - 1 < prev_lo + len(prev):
+                best = prev[j - 1 - prev_lo] + (ref[i - 1] != hyp[j - 1])
+            if prev_lo <= j < prev_lo + len(prev):
+                best = min(best, prev[j - prev_lo] + 1)
+            if j > lo:
+                best = min(best, row[j - 1 - lo] + 1)
+            elif j == 0:
+                best = min(best, i)
+            row[j - lo] = best
+        rows.append((lo, row))
+        prev, prev_lo = row, lo
+
+    def cell(i, j):
+        lo, row = rows[i]
+        return row[j - lo] if lo <= j < lo + len(row) else inf
+
+    # Remontée du chemin optimal
+    operations = []
+    i, j = n, m
+    while i > 0 or j > 0:
+        current = cell(i, j)
+        if i > 0 and j > 0 and cell(i - 1, j - 1) + (ref[i - 1] != hyp[j - 1]) == current:
+            kind = EQUAL if ref[i - 1] == hyp[j - 1] else SUBSTITUTE
+            operations.append((kind, ref[i - 1], hyp[j - 1]))
+            i, j = i - 1, j - 1
+        elif i > 0 and cell(i - 1, j) + 1 == current:
+            operations.append((DELETE, ref[i - 1], None))
+            i -= 1
+        else:
+            operations.append((INSERT, None, hyp[j - 1]))
+            j -= 1
+    operations.reverse()
+    return cell(n, m), operations
@@ -0,0 +1,258 @@
+import time
+import threading
+from collections import Counter
+from alignment import DELETE, SUBSTITUTE
+from normalization import strip_punctuation
+from passage_registry import passage_key
+
+# Agrégats tenus à jour à chaque insertion d'évaluations, dans la même
+# transaction que les lignes de record/recorder : les tableaux de bord lisent
+# une ligne par texte (ou par texte et par jour) au lieu de réagréger
+# l'historique. Le texte est identifié comme dans PassageRegistry
+# (passage_key de la langue et du texte cible).
+#   analytics_passage          : cumul par texte
+#   analytics_passage_jour     : cumul par texte et par jour
+#   analytics_mot_manque       : occurrences de chaque mot manqué, par texte
+#   analytics_mot_manque_jour  : idem par texte et par jour
+
+CUMULS = ("evaluations", "somme_similarite", "mots_corrects", "mots_manquants", "mots_supplementaires")
+
+SCHEMA = {
+    "analytics_passage": (
+        "passage_id VARCHAR(64) NOT NULL, langue VARCHAR(8), evaluations INTEGER NOT NULL, "
+        "somme_similarite DOUBLE NOT NULL, mots_corrects INTEGER NOT NULL, mots_manquants INTEGER NOT NULL, "
+        "mots_supplementaires INTEGER NOT NULL, premiere DOUBLE, derniere DOUBLE, PRIMARY KEY (passage_id)",
+        [("analytics_passage_recent", "langue, derniere")],
+    ),
+    "analytics_passage_jour": (
+        "passage_id VARCHAR(64) NOT NULL, jour CHAR(10) NOT NULL, langue VARCHAR(8), evaluations INTEGER NOT NULL, "
+        "somme_similarite DOUBLE NOT NULL, mots_corrects INTEGER NOT NULL, mots_manquants INTEGER NOT NULL, "
+        "mots_supplementaires INTEGER NOT NULL, premiere DOUBLE, derniere DOUBLE, PRIMARY KEY (passage_id, jour)",
+        [],
+    ),
+    "analytics_mot_manque": (
+        "passage_id VARCHAR(64) NOT NULL, mot VARCHAR(191) NOT NULL, occurrences INTEGER NOT NULL, "
+        "PRIMARY KEY (passage_id, mot)",
+        [("analytics_mot_manque_freq", "passage_id, occurrences")],
+    ),
+    "analytics_mot_manque_jour": (
+        "passage_id VARCHAR(64) NOT NULL, jour CHAR(10) NOT NULL, mot VARCHAR(191) NOT NULL, "
+        "occurrences INTEGER NOT NULL, PRIMARY KEY (passage_id, jour, mot)",
+        [("analytics_mot_manque_jour_freq", "passage_id, jour, occurrences")],
+    ),
+}
+
+
+def missed_words(report):
+    """
+    Mots du texte cible manqués (supprimés ou remplacés) d'après l'alignement du rapport.
+    Les profils qui conservent la ponctuation alignent "dort." sur "dort" :
+    les mots sont comptés sans ponctuation, et un remplacement qui ne diffère
+    que par elle (ou par la casse) n'est pas un mot manqué.
+    """
+    missed = []
+    for kind, original, hypothesis in report.get("alignement", ()):
+        if kind not in (DELETE, SUBSTITUTE):
+            continue
+        word = strip_punctuation(original or "")
+        if word and not (kind == SUBSTITUTE and word.casefold() == strip_punctuation(hypothesis or "").casefold()):
+            missed.append(word)
+    return missed
+
+
+class AnalyticsStore:
+    """
+    Agrégats d'évaluations par texte et par jour (MySQL ou SQLite), mis à jour
+    de façon incrémentale par EvaluationWriter (voir apply). Les requêtes ne
+    lisent que des lignes d'agrégats par clé primaire ou par index : leur coût
+    ne dépend pas de la taille de l'historique. Les tables sont créées au
+    premier accès (ensure_schema) : construire le magasin ne touche pas à la base.
+    """
+
+    def __init__(self, pool, dialect="mysql", placeholder="%s"):
+        if dialect not in ("mysql", "sqlite"):
+            raise ValueError(f"Dialecte SQL inconnu : {dialect}")
+        self.pool = pool
+        self.dialect = dialect
+        self.placeholder = placeholder
+        self._schema_ready = False
+        self._schema_lock = threading.Lock()
+
+    def ensure_schema(self):
+        """
+        Crée les tables d'agrégats si ce n'est pas encore fait. Lève l'erreur de
+        la base si elle est injoignable : l'essai est refait au prochain appel.
+        À appeler hors transaction (MySQL valide implicitement autour d'un CREATE).
+        """
+        if self._schema_ready:
+            return
+        with self._schema_lock:
+            if not self._schema_ready:
+                self._create_schema()
+                self._schema_ready = True
+
+    def _create_schema(self):
+        conn = self.pool.acquire()
+        try:
+            cursor = conn.cursor()
+            for table, (columns, indexes) in SCHEMA.items():
+                if self.dialect == "mysql":
+                    # MySQL n'a pas CREATE INDEX IF NOT EXISTS : index déclarés avec la table
+                    inline = "".join(f", INDEX {name} ({cols})" for name, cols in indexes)
+                    cursor.execute(f"CREATE TABLE IF NOT EXISTS {table} ({columns}{inline})")
+                else:
+                    cursor.execute(f"CREATE TABLE IF NOT EXISTS {table} ({columns})")
+                    for name, cols in indexes:
+                        cursor.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({cols})")
+            conn.commit()
+            cursor.close()
+        except Exception:
+            self.pool.release(conn, broken=True)
+            raise
+        self.pool.release(conn)
+
+    def _upsert(self, table, keys, values, sums, extremes=()):
+        """
+        Requête d'insertion qui, si la clé existe, ajoute les colonnes sums et
+        garde le min/max des colonnes extremes ((colonne, "MIN" | "MAX")).
+        """
+        columns = keys + values
+        placeholders = ", ".join([self.placeholder] * len(columns))
+        query = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders})"
+        if self.dialect == "mysql":
+            updates = [f"{c} = {c} + VALUES({c})" for c in sums]
+            updates += [f"{c} = {'LEAST' if f == 'MIN' else 'GREATEST'}({c}, VALUES({c}))" for c, f in extremes]
+            return f"{query} ON DUPLICATE KEY UPDATE {', '.join(updates)}"
+        updates = [f"{c} = {c} + excluded.{c}" for c in sums]
+        updates += [f"{c} = {f}({c}, excluded.{c})" for c, f in extremes]
+        return f"{query} ON CONFLICT ({', '.join(keys)}) DO UPDATE SET {', '.join(updates)}"
+
+    def apply(self, cursor, rows):
+        """
+        Met à jour les agrégats pour un lot d'évaluations, dans la transaction
+        de l'appelant. rows : (passage_id, langue, horodatage, similarité,
+        mots corrects, manquants, supplémentaires, mots manqués). Le lot est
+        d'abord réduit par clé : une requête par texte, jour et mot.
+        """
+        passages, days = {}, {}
+        words, words_by_day = Counter(), Counter()
+        for passage_id, langue, when, similarity, correct, missing, extra, missed in rows:
+            jour = time.strftime("%Y-%m-%d", time.localtime(when))
+            values = (1, similarity or 0.0, correct or 0, missing or 0, extra or 0)
+            for totals, key in ((passages, (passage_id,)), (days, (passage_id, jour))):
+                current = totals.get(key)
+                if current is None:
+                    totals[key] = [langue, *values, when, when]
+                else:
+                    for i, value in enumerate(values, start=1):
+                        current[i] += value
+                    current[-2] = min(current[-2], when)
+                    current[-1] = max(current[-1], when)
+            for mot in missed:
+                words[(passage_id, mot)] += 1
+                words_by_day[(passage_id, jour, mot)] += 1
+
+        extremes = (("premiere", "MIN"), ("derniere", "MAX"))
+        columns = ["langue", *CUMULS, "premiere", "derniere"]
+        cursor.executemany(self._upsert("analytics_passage", ["passage_id"], columns, CUMULS, extremes),
+                           [(*key, *totals) for key, totals in passages.items()])
+        cursor.executemany(self._upsert("analytics_passage_jour", ["passage_id", "jour"], columns, CUMULS, extremes),
+                           [(*key, *totals) for key, totals in days.items()])
+        if words:
+            cursor.executemany(self._upsert("analytics_mot_manque", ["passage_id", "mot"], ["occurrences"], ["occurrences"]),
+                               [(*key, n) for key, n in words.items()])
+            cursor.executemany(self._upsert("analytics_mot_manque_jour", ["passage_id", "jour", "mot"],
+                                            ["occurrences"], ["occurrences"]),
+                               [(*key, n) for key, n in words_by_day.items()])
+
+    @staticmethod
+    def row(passage_id, langue, target_text, similarity, report, when=None):
+        """
+        Ligne d'agrégat d'une évaluation (voir apply), à partir du rapport de compare_texts.
+        """
+        return (passage_id or passage_key(target_text, langue), langue, when or time.time(), similarity,
+                report.get("mots_communs"), report.get("mots_manquants"), report.get("mots_supplementaires"),
+                tuple(missed_words(report)))
+
+    # Lecture
+    def _fetch(self, query, params):
+        self.ensure_schema()
+        conn = self.pool.acquire()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(query.replace("?", self.placeholder), params)
+            names = [d[0] for d in cursor.description]
+            rows = [dict(zip(names, r)) for r in cursor.fetchall()]
+            cursor.close()
+        except Exception:
+            self.pool.release(conn, broken=True)
+            raise
+        self.pool.release(conn)
+        return rows
+
+    @staticmethod
+    def _summary(row):
+        n = row["evaluations"]
+        summary = {
+            "passage_id": row["passage_id"],
+            "langue": row["langue"],
+            "evaluations": n,
+            "similarite_moyenne": round(row["somme_similarite"] / n, 2) if n else None,
+            "mots_corrects_moyenne": round(row["mots_corrects"] / n, 2) if n else None,
+            "mots_manquants_moyenne": round(row["mots_manquants"] / n, 2) if n else None,
+            "mots_supplementaires_moyenne": round(row["mots_supplementaires"] / n, 2) if n else None,
+            "premiere": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(row["premiere"])),
+            "derniere": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(row["derniere"])),
+        }
+        if "jour" in row:
+            summary["jour"] = row["jour"]
+        return summary
+
+    def passage(self, passage_id, top=10):
+        """
+        Cumul d'un texte et ses `top` mots les plus manqués, ou None s'il n'a jamais été lu.
+        """
+        rows = self._fetch("SELECT * FROM analytics_passage WHERE passage_id = ?", (passage_id,))
+        if not rows:
+            return None
+        words = self._fetch("SELECT mot, occurrences FROM analytics_mot_manque WHERE passage_id = ? "
+                            "ORDER BY occurrences DESC LIMIT ?", (passage_id, int(top)))
+        return {**self._summary(rows[0]), "mots_les_plus_manques": words}
+
+    def passage_day(self, passage_id, jour, top=10):
+        """
+        Cumul d'un texte pour un jour (AAAA-MM-JJ) et ses `top` mots les plus manqués ce jour-là.
+        """
+        rows = self._fetch("SELECT * FROM analytics_passage_jour WHERE passage_id = ? AND jour = ?",
+                           (passage_id, jour))
+        if not rows:
+            return None
+        words = self._fetch("SELECT mot, occurrences FROM analytics_mot_manque_jour "
+                            "WHERE passage_id = ? AND jour = ? ORDER BY occurrences DESC LIMIT ?",
+                            (passage_id, jour, int(top)))
+        return {**self._summary(rows[0]), "mots_les_plus_manques": words}
+
+    def passage_days(self, passage_id, debut=None, fin=None, limit=31):
+        """
+        Progression jour par jour d'un texte (du plus récent au plus ancien), bornée à `limit` jours.
+        """
+        query, params = "SELECT * FROM analytics_passage_jour WHERE passage_id = ?", [passage_id]
+        if debut:
+            query += " AND jour >= ?"
+            params.append(debut)
+        if fin:
+            query += " AND jour <= ?"
+            params.append(fin)
+        rows = self._fetch(query + " ORDER BY jour DESC LIMIT ?", (*params, int(limit)))
+        return [self._summary(r) for r in rows]
+
+    def passages(self, langue=None, limit=100):
+        """
+        Cumul de chaque texte lu (les plus récemment lus d'abord).
+        """
+        if langue:
+            rows = self._fetch("SELECT * FROM analytics_passage WHERE langue = ? ORDER BY derniere DESC LIMIT ?",
+                               (langue, int(limit)))
+        else:
+            rows = self._fetch("SELECT * FROM analytics_passage ORDER BY derniere DESC LIMIT ?", (int(limit),))
+        return [self._summary(r) for r in rows]
@@ -1,51 +1,338 @@
-from flask import Flask, request, jsonify, render_template
-from arabic_audio_diacritizer_fixed import ArabicAudioProcessor
+from flask import Flask, request, jsonify, render_template, send_file
 from arabic_text_comparator import TextComparator
-from french_audio_transcriber import FrenchAudioProcessor
-import tempfile
+from speech_engine import SpeechEngine
+from micro_batcher import MicroBatcher, QueueFullError
+from live_reading import LiveReadingSession, LiveWindow
+from transcription_cache import TranscriptionCache
+from audio_ingest import decode_upload
+from inference_pool import InferencePool
+from passage_registry import PassageRegistry, UnknownPassage
+from vad import VoiceActivityDetector
+from evaluation_store import EvaluationWriter, mysql_pool, sqlite_pool, tables_of
+from analytics_store import AnalyticsStore
+from audio_archive import AudioArchive
+from logit_store import LogitStore
+from concurrent.futures import TimeoutError as InferenceTimeout
+from metrics import timed
+import metrics
+import multiprocessing
 import os
-import shutil
-import mysql.connector
-from datetime import datetime
+import json
+import atexit
+from functools import partial
+import logging
+
+try:
+    from flask_sock import Sock
+except ImportError:
+    Sock = None
+
+# 📝 Journalisation (LOG_LEVEL=DEBUG pour le détail du traitement)
+logging.basicConfig(level=os.environ.get("LOG_LEVEL", "INFO"),
+                    format="%(asctime)s %(levelname)s %(name)s : %(message)s")
+logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
+sock = Sock(app) if Sock else None
+
+# 🗃️ Cache des transcriptions (empreinte du signal décodé + modèle)
+CACHE_CONFIG = dict(
+    cache_dir=os.environ.get("ASR_CACHE_DIR", "cache_transcriptions") or None,
+    max_memory_items=int(os.environ.get("ASR_CACHE_MEMORY_ITEMS", 1024)),
+    max_disk_bytes=int(float(os.environ.get("ASR_CACHE_DISK_MB", 200)) * 1024 * 1024)
+)
+transcription_cache = TranscriptionCache(**CACHE_CONFIG)
+
+# 🔇 Détection d'activité vocale : silences de début/fin retirés et découpage
+# sur les pauses longues avant le modèle (ASR_VAD=0 pour désactiver)
+VAD_CONFIG = dict(
+    min_pause_s=float(os.environ.get("ASR_VAD_PAUSE_S", 0.8)),
+    split=os.environ.get("ASR_VAD_SPLIT", "1") == "1"
+) if os.environ.get("ASR_VAD", "1") == "1" else None
+vad = VoiceActivityDetector(**VAD_CONFIG) if VAD_CONFIG is not None else None
+
+# ⚙️ Pool de workers d'inférence (mode production)
+# ASR_WORKERS=N lance N processus épinglés chacun sur un bloc de cœurs
+# (ASR_THREADS_PER_WORKER threads torch) ; 0 = inférence dans le processus HTTP.
+# ASR_REQUEST_TIMEOUT_S borne l'attente d'une requête (file d'attente comprise)
+# comme celle d'un lot confié au pool.
+ASR_WORKERS = int(os.environ.get("ASR_WORKERS", 0))
+ASR_THREADS_PER_WORKER = int(os.environ.get("ASR_THREADS_PER_WORKER", 0)) or None
+ASR_REQUEST_TIMEOUT_S = float(os.environ.get("ASR_REQUEST_TIMEOUT_S", 60))
+
+# 🔤 Moteur de reconnaissance multilingue : un modèle par langue configurée
+# (voir speech_engine.LANGUES et ASR_LANGUES_FILE), chargé à la première utilisation.
+# ASR_PRELOAD=ar,fr précharge les langues listées au démarrage ;
+# ASR_IDLE_UNLOAD_S décharge un modèle inutilisé depuis ce délai (0 = jamais) ;
+# ASR_MIN_MEMOIRE_MB décharge le modèle utilisé le moins récemment tant que la
+# mémoire disponible du système est sous ce seuil (0 = jamais).
+ENGINE_CONFIG = dict(
+    idle_unload_s=float(os.environ.get("ASR_IDLE_UNLOAD_S", 0)),
+    min_available_mb=float(os.environ.get("ASR_MIN_MEMOIRE_MB", 0)),
+)
+engine = SpeechEngine(cache=transcription_cache, vad=vad, **ENGINE_CONFIG)
+
+ASR_PRELOAD = [l.strip() for l in os.environ.get("ASR_PRELOAD", "").split(",") if l.strip()]
+# Avec un pool de workers, ce sont les workers qui préchargent leurs modèles
+if ASR_PRELOAD and ASR_WORKERS == 0:
+    logger.info("Préchargement des modèles : %s...", ", ".join(ASR_PRELOAD))
+    engine.preload(ASR_PRELOAD)
+    logger.info("✅ Modèles chargés.")
+
+# Les workers (spawn) réimportent ce module : ils ne doivent pas créer leur propre pool.
+# ASR_POIDS_PARTAGES=1 (défaut) : le processus HTTP charge les modèles de
+# ASR_PRELOAD (toutes les langues si la liste est vide) et les workers en
+# partagent les poids (une copie au lieu d'une par worker, voir SpeechEngine.share_weights).
+ASR_POIDS_PARTAGES = os.environ.get("ASR_POIDS_PARTAGES", "1") == "1"
+if ASR_WORKERS > 0 and multiprocessing.parent_process() is None:
+    shared = {}
+    if ASR_POIDS_PARTAGES:
+        logger.info("Chargement des modèles partagés par les workers...")
+        shared = engine.share_weights(ASR_PRELOAD or list(engine.langues))
+    inference_pool = InferencePool(ASR_WORKERS, ASR_THREADS_PER_WORKER,
+                                   cache_kwargs=CACHE_CONFIG, preload=ASR_PRELOAD, vad_kwargs=VAD_CONFIG,
+                                   shared=shared, engine_kwargs=ENGINE_CONFIG, timeout_s=ASR_REQUEST_TIMEOUT_S)
+else:
+    inference_pool = None
+# Devant le pool, le processus HTTP ne charge jamais de modèle : toute inférence passe par les workers
+if inference_pool is not None:
+    engine.models.disable_loading("inférence déléguée au pool de workers (ASR_WORKERS > 0)")
+
+# 🎯 Décodage : "glouton" (argmax CTC) ou "cible" (alignement forcé sur le texte cible,
+# avec début, fin et confiance de chaque mot). En mode cible, les éléments des
+# micro-lots sont des couples (audio, texte cible).
+ASR_DECODAGE = os.environ.get("ASR_DECODAGE", "glouton")
+# Confiance minimale de chaque mot aligné pour signaler une lecture assurée
+# ("lecture_assuree" de la réponse ; la note reste celle de la transcription)
+ASR_SEUIL_LECTURE = float(os.environ.get("ASR_SEUIL_LECTURE", 0.6))
+
+# 🧮 ASR_LOGITS=1 conserve les log-probabilités de chaque enregistrement (float16,
+# LOGITS_DIR) pour re-noter sans le modèle (voir rescore.py) ; le cache des
+# transcriptions n'est alors pas consulté. Les résultats des micro-lots se
+# terminent par les log-probabilités.
+ASR_LOGITS = os.environ.get("ASR_LOGITS", "0") == "1"
+
+# 🪜 Cascade (ASR_CASCADE=1) : pour chaque langue dotée d'un modele_rapide, ce petit
+# modèle transcrit d'abord et le modèle complet ne reprend que les audios sous les
+# seuils de confiance ou de similarité (voir SpeechEngine.transcribe_batch_cascade).
+# Les micro-lots de ces langues reçoivent des couples (audio, texte cible).
+# ASR_PRELOAD=ar:rapide précharge le modèle rapide de l'arabe.
+ASR_CASCADE = os.environ.get("ASR_CASCADE", "0") == "1"
+if ASR_CASCADE and ASR_LOGITS:
+    # Les log-probabilités conservées doivent toutes venir du même modèle
+    logger.warning("⚠️ ASR_CASCADE ignoré : incompatible avec ASR_LOGITS.")
+    ASR_CASCADE = False
+CASCADE_LANGUES = {langue for langue in engine.langues if ASR_CASCADE and engine.has_cascade(langue)}
+
+def transcrire_glouton(langue, speech_arrays):
+    if inference_pool is not None:
+        return inference_pool.transcribe_batch(langue, speech_arrays)
+    return engine.transcribe_batch(langue, speech_arrays)
+
+def transcrire_fenetres(langue, windows):
+    windows = [(w.audio, w.left, w.right, w.prefix) for w in windows]
+    if inference_pool is not None:
+        return inference_pool.transcribe_windows(langue, windows)
+    return engine.transcribe_windows(langue, windows)
+
+def transcrire(langue, items):
+    # Fenêtres de lecture en direct : décodage glouton par fenêtres, dans le même lot
+    windows = [i for i, item in enumerate(items) if isinstance(item, LiveWindow)]
+    if windows:
+        results = [None] * len(items)
+        for i, result in zip(windows, transcrire_fenetres(langue, [items[i] for i in windows])):
+            results[i] = result
+        others = [i for i, item in enumerate(items) if not isinstance(item, LiveWindow)]
+        if others:
+            for i, result in zip(others, transcrire(langue, [items[i] for i in others])):
+                results[i] = result
+        return results
+
+    if langue in CASCADE_LANGUES:
+        if inference_pool is not None:
+            return inference_pool.transcribe_batch_cascade(langue, items, ASR_DECODAGE == "cible")
+        return engine.transcribe_batch_cascade(langue, items, ASR_DECODAGE == "cible")
+
+    if ASR_DECODAGE == "cible":
+        if inference_pool is not None:
+            return inference_pool.transcribe_batch_aligned(langue, items, ASR_LOGITS)
+        return engine.transcribe_batch_aligned(langue, items, ASR_LOGITS)
+
+    if ASR_LOGITS:
+        if inference_pool is not None:
+            return inference_pool.transcribe_batch_log_probs(langue, items)
+        return engine.transcribe_batch_log_probs(langue, items)
+    return transcrire_glouton(langue, items)
+
+# 📦 Regroupement des requêtes en micro-lots (une passe du modèle par lot)
+BATCH_WINDOW_MS = float(os.environ.get("ASR_BATCH_WINDOW_MS", 20))
+BATCH_MAX_SIZE = int(os.environ.get("ASR_BATCH_MAX_SIZE", 8))
+# Contre-pression : au-delà de ASR_MAX_QUEUE requêtes en attente, réponse 429
+ASR_MAX_QUEUE = int(os.environ.get("ASR_MAX_QUEUE", 64))
+ASR_RETRY_AFTER_S = int(os.environ.get("ASR_RETRY_AFTER_S", 2))
+
+# Une file par langue ; taille_lot et fenetre_ms de la langue priment sur les réglages globaux
+batchers = {
+    langue: MicroBatcher(
+        partial(transcrire, langue),
+        window_ms=config.get("fenetre_ms", BATCH_WINDOW_MS),
+        max_batch_size=config.get("taille_lot", BATCH_MAX_SIZE), name=langue,
+        max_queue=ASR_MAX_QUEUE, concurrency=max(ASR_WORKERS, 1)
+    )
+    for langue, config in engine.langues.items()
+}
 
-# 🔤 Initialisation des modèles
-print("Chargement des modèles...")
-arabic_processor = ArabicAudioProcessor()
-french_processor = FrenchAudioProcessor()
-print("✅ Modèles chargés.")
+# 🔡 Profils de normalisation des textes comparés (voir normalization.PROFILES),
+# par langue : NORMALISATION_AR, NORMALISATION_FR...
+NORMALISATION = {langue: config["normalisation"] for langue, config in engine.langues.items()}
 
-# 🧠 Génération de feedback multilingue
+# 📚 Textes de lecture enregistrés (index précalculé par texte)
+passages = PassageRegistry(NORMALISATION, path=os.environ.get("PASSAGES_FILE", "passages.json"))
+
+def texte_cible(langue):
+    """
+    Texte cible de la requête : passage_id (texte enregistré, déjà indexé)
+    ou target_text. Renvoie (texte, index) ; index vaut None pour un texte libre.
+    Lève UnknownPassage si passage_id n'est pas un texte de cette langue,
+    KeyError si aucun texte n'est fourni.
+    """
+    passage_id = request.form.get('passage_id')
+    if passage_id:
+        passage = passages.get(passage_id)
+        if passage.langue != langue:
+            raise UnknownPassage(passage_id)
+        return passage.texte, passage
+    return request.form['target_text'], None
+
+# 🧠 Génération de feedback multilingue (messages de chaque langue : speech_engine.LANGUES)
 def generer_feedback(similarite, langue="ar"):
-    if langue == "fr":
-        if similarite >= 90:
-            return f"🌟 Excellente lecture ! 👏 ({similarite:.2f}%)"
-        elif similarite >= 70:
-            return f"👍 Bonne lecture, attention à quelques erreurs. ({similarite:.2f}%)"
-        elif similarite >= 50:
-            return f"🙂 Lecture passable, tu peux mieux faire. ({similarite:.2f}%)"
-        else:
-            return f"🛠️ Lecture difficile, un peu de pratique aidera ! ({similarite:.2f}%)"
-    else:
-        if similarite >= 90:
-            return f"🌟 قراءة ممتازة! 👏 ({similarite:.2f}%)"
-        elif similarite >= 70:
-            return f"👍 قراءة جيدة، لكن بها بعض الأخطاء. ({similarite:.2f}%)"
-        elif similarite >= 50:
-            return f"🙂 قراءة مقبولة، لكن تحتاج إلى تحسين. ({similarite:.2f}%)"
-        else:
-            return f"🛠️ قراءة صعبة. تدرب أكثر لتحسن مستواك! ({similarite:.2f}%)"
+    return engine.feedback(langue, similarite)
 
-# Connexion DB
+# ⏳ Réponse de contre-pression : file d'inférence pleine
+def serveur_occupe():
+    response = jsonify({'error': "Serveur occupé, réessayez dans quelques secondes"})
+    response.status_code = 429
+    response.headers["Retry-After"] = str(ASR_RETRY_AFTER_S)
+    return response
 
-def get_db_connection():
-    return mysql.connector.connect(
+# 💾 Enregistrement des évaluations : pool de connexions + écriture groupée en arrière-plan
+# DB_BACKEND=sqlite (DB_SQLITE_PATH) pour une base locale sans MySQL ;
+# DB_WORD_STATS=1 si les tables MySQL ont les colonnes mots_corrects/manquants/supplementaires.
+# ANALYTICS=1 (défaut) : agrégats par texte et par jour tenus à jour à chaque
+# écriture (voir analytics_store), lus par les routes /analytics.
+DB_BACKEND = os.environ.get("DB_BACKEND", "mysql")
+if DB_BACKEND == "sqlite":
+    db_pool = sqlite_pool(os.environ.get("DB_SQLITE_PATH", "evaluations.db"), tables=tables_of(engine.langues))
+    db_placeholder = "?"
+else:
+    db_pool = mysql_pool(
+        size=int(os.environ.get("DB_POOL_SIZE", 4)),
         host="localhost",
         user="root",
         password="",  # Ajoute le mot de passe si nécessaire
         database="AgentiAi"
     )
+    db_placeholder = "%s"
+analytics = AnalyticsStore(db_pool, DB_BACKEND, db_placeholder) if os.environ.get("ANALYTICS", "1") == "1" else None
+evaluation_writer = EvaluationWriter(db_pool, placeholder=db_placeholder,
+                                     word_stats=DB_BACKEND == "sqlite" or os.environ.get("DB_WORD_STATS", "0") == "1",
+                                     analytics=analytics, tables=tables_of(engine.langues))
+atexit.register(evaluation_writer.close)
+# Tables d'agrégats créées au démarrage du processus principal seulement (pas
+# dans les workers réimportant ce module) ; base injoignable : nouvel essai à
+# la première écriture ou lecture, sans empêcher le serveur de démarrer.
+if analytics is not None and multiprocessing.parent_process() is None:
+    try:
+        analytics.ensure_schema()
+    except Exception as e:
+        logger.warning("⚠️ Tables d'agrégats non créées (base injoignable ?) : %s", e)
+
+# 🗄️ Archive des enregistrements : adressée par contenu, rangée par langue/date/préfixe,
+# réencodée en arrière-plan (ARCHIVE_CODEC : opus, flac ou original ; l'original
+# est gardé si le réencodage est plus gros).
+# ARCHIVE_RETENTION_DAYS / ARCHIVE_MAX_GO : purge des plus anciens (0 = jamais),
+# log-probabilités comprises.
+ARCHIVE_DIR = os.environ.get("ARCHIVE_DIR", "audios")
+
+# Log-probabilités conservées par enregistrement (ASR_LOGITS=1)
+logit_store = LogitStore(os.environ.get("LOGITS_DIR", os.path.join(ARCHIVE_DIR, "logits")))
+
+audio_archive = AudioArchive(
+    root=ARCHIVE_DIR,
+    codec=os.environ.get("ARCHIVE_CODEC", "opus"),
+    retention_days=float(os.environ.get("ARCHIVE_RETENTION_DAYS", 0)),
+    max_bytes=int(float(os.environ.get("ARCHIVE_MAX_GO", 0)) * 2**30),
+    on_purge=logit_store.delete,
+)
+atexit.register(audio_archive.close)
+
+def sauvegarder_evaluation(langue, audio, similarity_score, feedback, report=None, speech_array=None):
+    """
+    Archive l'audio (audio : octets de l'upload ou chemin d'un fichier,
+    speech_array : signal déjà décodé, réutilisé pour le réencodage) et met
+    l'évaluation en file d'écriture : ni l'encodage ni la base ne sont sur
+    le chemin de la réponse. La colonne audio_path reçoit l'identifiant
+    d'archive (voir GET /archives/<id>), qui est renvoyé.
+    """
+    with timed("sauvegarde_audio", langue):
+        audio_id = audio_archive.store(langue, audio, speech_array)
+
+    evaluation_writer.enregistrer(langue, audio_id, similarity_score, feedback, report)
+    return audio_id
+
+# 🎯 Transcription et comparaison au texte cible
+def transcrire_et_comparer(langue, audio, target_text, passage=None, transcription=None):
+    """
+    Transcrit l'audio via le micro-lot de sa langue et compare au texte cible.
+    La note porte toujours sur la transcription du modèle ; en décodage "cible",
+    les confiances de l'alignement forcé sont renvoyées à côté (mots alignés).
+    Une transcription déjà faite (lecture en direct) est comparée telle quelle.
+    Renvoie (transcription, rapport, mots alignés ou None, (log-probabilités, segments) ou None).
+    """
+    profile = NORMALISATION[langue]
+    index = passage if passage is not None else TextComparator.index(target_text, profile)
+
+    mots_alignes = log_probs = None
+    if transcription is not None:
+        with timed("comparaison", langue):
+            report = TextComparator.compare_to_passage(index, transcription)
+        return transcription, report, mots_alignes, log_probs
+
+    batcher = batchers[langue]
+    # Attente dans la file comprise : l'inférence elle-même est mesurée par étapes dans ctc_inference
+    with timed("transcription", langue):
+        if ASR_DECODAGE != "cible" and langue not in CASCADE_LANGUES:
+            result = batcher(audio, timeout=ASR_REQUEST_TIMEOUT_S)
+        else:
+            result = batcher((audio, target_text), timeout=ASR_REQUEST_TIMEOUT_S)
+    # Résultat : transcription, puis mots alignés (décodage cible), puis
+    # log-probabilités et leurs segments (ASR_LOGITS)
+    if not isinstance(result, tuple):
+        result = (result,)
+    transcription = result[0]
+    if ASR_DECODAGE == "cible":
+        mots_alignes = result[1]
+    if ASR_LOGITS:
+        log_probs = result[-2:]
+    with timed("comparaison", langue):
+        report = TextComparator.compare_to_passage(index, transcription)
+    return transcription, report, mots_alignes, log_probs
+
+# ⏱️ Profilage par requête : ?profil=1 ou en-tête X-Profil: 1
+# ajoute à la réponse la durée de chaque étape ("profil").
+@app.before_request
+def activer_profil():
+    if request.args.get("profil") == "1" or request.headers.get("X-Profil") == "1":
+        metrics.start_trace()
+    else:
+        # Les threads du serveur sont réutilisés : pas de trace héritée d'une requête précédente
+        metrics.current_trace.set(None)
+
+def reponse_profilee(payload):
+    trace = metrics.current_trace.get()
+    if trace is not None:
+        payload["profil"] = [{"etape": etape, "ms": round(s * 1000, 2)} for etape, s in trace]
+    return jsonify(payload)
 
 # 🌐 Pages Web
 @app.route('/')
@@ -56,104 +343,337 @@ def index_arabe():
 def index_francais():
     return render_template("french.html")
 
-# 🇦🇪 Évaluation arabe
-@app.route('/evaluate', methods=['POST'])
-def evaluate_arabe():
-    if 'audio' not in request.files or 'target_text' not in request.form:
+# 🗣️ Évaluation d'une lecture (une route pour toutes les langues configurées)
+def evaluer_signal(langue, speech_array, audio, target_text, passage=None, transcription=None):
+    """
+    Transcrit et note un signal décodé (sauf si sa transcription est fournie),
+    puis archive l'audio (octets ou chemin) et enregistre l'évaluation. Chemin
+    commun à /evaluate et à la lecture en direct. Renvoie le dictionnaire de
+    réponse ; QueueFullError et InferenceTimeout remontent à l'appelant.
+    """
+    transcription, report, mots_alignes, log_probs = transcrire_et_comparer(langue, speech_array,
+                                                                            target_text, passage,
+                                                                            transcription)
+    similarity_score = round(report["similarite_pourcentage"], 2)
+    feedback = generer_feedback(similarity_score, langue=langue)
+
+    # Sauvegarde de l'audio et enregistrement dans la BDD
+    audio_id = sauvegarder_evaluation(langue, audio, similarity_score, feedback, report, speech_array)
+    if log_probs is not None:
+        with timed("sauvegarde_logits", langue):
+            logit_store.save(audio_id, engine.model_key(langue), log_probs[0], engine.config(langue)["modele"],
+                             segments=log_probs[1])
+
+    metrics.REQUESTS.inc(langue, "ok")
+    return {
+        "enregistrement": audio_id,
+        "transcription": transcription,
+        "similarite": similarity_score,
+        "feedback": feedback,
+        "mots_corrects": report["mots_communs"],
+        "mots_manquants": report["mots_manquants"],
+        "mots_supplementaires": report["mots_supplementaires"],
+        "mots_alignes": mots_alignes,
+        "lecture_assuree": (min(m["confiance"] for m in mots_alignes) >= ASR_SEUIL_LECTURE
+                            if mots_alignes else None)
+    }
+
+@app.route('/evaluate/<langue>', methods=['POST'])
+def evaluer(langue):
+    if langue not in engine:
+        return jsonify({'error': f"Langue non prise en charge : {langue}"}), 404
+    nom = engine.config(langue)["nom"]
+    if 'audio' not in request.files:
+        return jsonify({'error': 'Fichier audio ou texte manquant'}), 400
+    try:
+        target_text, passage = texte_cible(langue)
+    except UnknownPassage as e:
+        return jsonify({'error': f"Passage inconnu : {e.args[0]}"}), 404
+    except KeyError:
         return jsonify({'error': 'Fichier audio ou texte manquant'}), 400
 
-    audio_file = request.files['audio']
-    target_text = request.form['target_text']
+    upload = request.files['audio']
+    with timed("reception", langue):
+        audio_bytes = upload.read()
 
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".wav") as temp_audio:
-        audio_path = temp_audio.name
-        audio_file.save(audio_path)
+    try:
+        # Décodage direct depuis l'upload (pas de fichier temporaire) ; le PCM 16 kHz
+        # envoyé par les pages (audio/L16) est converti sans décodage
+        with timed("decodage", langue):
+            speech_array = decode_upload(audio_bytes, upload.mimetype, upload.mimetype_params)
+    except ValueError as e:
+        # Upload vide, illisible ou de format non pris en charge : erreur du client, pas du serveur
+        metrics.REQUESTS.inc(langue, "audio_invalide")
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.exception("Audio illisible (%s)", langue)
+        metrics.REQUESTS.inc(langue, "erreur")
+        return jsonify({'error': f"Erreur de traitement ({nom}) : {str(e)}"}), 500
 
     try:
-        transcription = arabic_processor.process_audio(audio_path, remove_diacritics=True)
-        comparator = TextComparator()
-        report = comparator.compare_texts(target_text, transcription, remove_diacritics=True)
-        similarity_score = round(report["similarite_pourcentage"], 2)
-        feedback = generer_feedback(similarity_score, langue="ar")
-
-        # Sauvegarde de l'audio
-        audio_filename = f"ar_{datetime.now().strftime('%Y%m%d%H%M%S')}.wav"
-        audio_save_path = os.path.join("audios", audio_filename)
-        shutil.move(audio_path, audio_save_path)
-
-        # Enregistrement dans la BDD
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute("""
-            INSERT INTO record (language, audio_path, similarity, feedback)
-            VALUES (%s, %s, %s, %s)
-        """, ("ar", audio_save_path, similarity_score, feedback))
-        conn.commit()
-        cursor.close()
-        conn.close()
-
-        return jsonify({
-            "transcription": transcription,
-            "similarite": similarity_score,
-            "feedback": feedback,
-            "mots_corrects": report["mots_communs"],
-            "mots_manquants": report["mots_manquants"],
-            "mots_supplementaires": report["mots_supplementaires"]
-        })
+        return reponse_profilee(evaluer_signal(langue, speech_array, audio_bytes, target_text, passage))
 
+    except QueueFullError:
+        metrics.REQUESTS.inc(langue, "occupe")
+        return serveur_occupe()
+    except InferenceTimeout:
+        metrics.REQUESTS.inc(langue, "delai_depasse")
+        return jsonify({'error': f"Délai de traitement dépassé ({nom})"}), 504
     except Exception as e:
-        return jsonify({'error': f"Erreur de traitement (arabe) : {str(e)}"}), 500
+        logger.exception("Erreur de traitement (%s)", langue)
+        metrics.REQUESTS.inc(langue, "erreur")
+        return jsonify({'error': f"Erreur de traitement ({nom}) : {str(e)}"}), 500
+
+# Routes historiques des pages arabe et française
+@app.route('/evaluate', methods=['POST'])
+def evaluate_arabe():
+    return evaluer("ar")
 
-# 🇫🇷 Évaluation français
 @app.route('/evaluate-fr', methods=['POST'])
 def evaluate_francais():
-    if 'audio' not in request.files or 'target_text' not in request.form:
-        return jsonify({'error': 'Audio ou texte manquant'}), 400
+    return evaluer("fr")
+
+# 📚 Gestion des textes de lecture
+@app.route('/passages', methods=['GET'])
+def lister_passages():
+    return jsonify(passages.list(request.args.get('langue')))
+
+@app.route('/passages', methods=['POST'])
+def enregistrer_passage():
+    data = request.get_json(silent=True) or request.form
+    texte = (data.get('texte') or '').strip()
+    if not texte:
+        return jsonify({'error': 'Texte manquant'}), 400
+    langue = data.get('langue') or "ar"
+    if langue not in engine:
+        return jsonify({'error': f"Langue non prise en charge : {langue}"}), 400
+    passage = passages.register(texte, langue, data.get('titre'))
+    return jsonify({**passage.to_dict(), "mots": len(passage.tokens), "phrases": len(passage.phrases)}), 201
+
+@app.route('/passages/<passage_id>', methods=['DELETE'])
+def supprimer_passage(passage_id):
+    if not passages.remove(passage_id):
+        return jsonify({'error': 'Texte inconnu'}), 404
+    return '', 204
+
+# 📊 Tableaux de bord : agrégats par texte (identifiant de PassageRegistry) et par jour
+def analytics_indisponible():
+    return jsonify({'error': 'Agrégats désactivés (ANALYTICS=0)'}), 404
+
+@app.route('/analytics/passages')
+def analytics_passages():
+    if analytics is None:
+        return analytics_indisponible()
+    return jsonify(analytics.passages(request.args.get('langue'), request.args.get('limite', 100, type=int)))
+
+@app.route('/analytics/passages/<passage_id>')
+def analytics_passage(passage_id):
+    if analytics is None:
+        return analytics_indisponible()
+    resume = analytics.passage(passage_id, request.args.get('top', 10, type=int))
+    if resume is None:
+        return jsonify({'error': 'Aucune évaluation pour ce texte'}), 404
+    return jsonify(resume)
+
+@app.route('/analytics/passages/<passage_id>/jours')
+def analytics_passage_jours(passage_id):
+    if analytics is None:
+        return analytics_indisponible()
+    return jsonify(analytics.passage_days(passage_id, request.args.get('debut'), request.args.get('fin'),
+                                          request.args.get('limite', 31, type=int)))
+
+@app.route('/analytics/passages/<passage_id>/jours/<jour>')
+def analytics_passage_jour(passage_id, jour):
+    if analytics is None:
+        return analytics_indisponible()
+    resume = analytics.passage_day(passage_id, jour, request.args.get('top', 10, type=int))
+    if resume is None:
+        return jsonify({'error': 'Aucune évaluation pour ce texte ce jour-là'}), 404
+    return jsonify(resume)
 
-    audio_file = request.files['audio']
-    target_text = request.form['target_text']
+# 🗄️ Enregistrements archivés
+@app.route('/archives/<audio_id>')
+def lire_archive(audio_id):
+    entry = audio_archive.lookup(audio_id)
+    if entry is None:
+        return jsonify({'error': 'Enregistrement inconnu'}), 404
+    if entry.get("en_attente") or request.args.get("info") == "1":
+        return jsonify(entry), 202 if entry.get("en_attente") else 200
+    return send_file(os.path.abspath(entry["chemin"]), mimetype=AudioArchive.mimetype(entry))
 
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".wav") as temp_audio:
-        audio_path = temp_audio.name
-        audio_file.save(audio_path)
+# 🔴 Lecture en direct (WebSocket) : transcription et score au fil de la lecture.
+# Désactivée par défaut (ASR_LIVE=1 pour l'activer) : les pages se rabattent
+# alors sur l'envoi classique. Fenêtres de ASR_LIVE_WINDOW_S secondes avec
+# ASR_LIVE_STRIDE_S secondes de recouvrement de chaque côté, passées par la
+# file d'inférence de la langue (micro-lots, pool, contre-pression). À l'arrêt,
+# seule la fin de la lecture est décodée : la note porte sur la transcription
+# des fenêtres. La lecture complète n'est repassée dans le modèle que si une
+# fenêtre a échoué, ou si le décodage "cible" ou ASR_LOGITS en ont besoin.
+ASR_LIVE = os.environ.get("ASR_LIVE", "0") == "1"
+LIVE_WINDOW_S = float(os.environ.get("ASR_LIVE_WINDOW_S", 6))
+LIVE_STRIDE_S = float(os.environ.get("ASR_LIVE_STRIDE_S", 1))
 
+def transcrire_fenetre(langue, window):
+    """
+    Transcription d'une LiveWindow via la file de la langue ; None si la file
+    est pleine ou le délai dépassé.
+    """
     try:
-        transcription = french_processor.transcribe(audio_path)
-        comparator = TextComparator()
-        report = comparator.compare_texts(target_text, transcription)
-        similarity_score = round(report["similarite_pourcentage"], 2)
-        feedback = generer_feedback(similarity_score, langue="fr")
-
-        # Sauvegarde de l'audio
-        audio_filename = f"fr_{datetime.now().strftime('%Y%m%d%H%M%S')}.wav"
-        audio_save_path = os.path.join("audios", audio_filename)
-        shutil.move(audio_path, audio_save_path)
-
-        # Enregistrement dans la BDD
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute("""
-            INSERT INTO recorder (langue, audio_path, similarity, feedback)
-            VALUES (%s, %s, %s, %s)
-        """, ("fr", audio_save_path, similarity_score, feedback))
-        conn.commit()
-        cursor.close()
-        conn.close()
-
-        return jsonify({
-            "transcription": transcription,
-            "similarite": similarity_score,
-            "feedback": feedback,
-            "mots_corrects": report["mots_communs"],
-            "mots_manquants": report["mots_manquants"],
-            "mots_supplementaires": report["mots_supplementaires"]
-        })
+        with timed("transcription_directe", langue):
+            return batchers[langue](window, timeout=ASR_REQUEST_TIMEOUT_S)
+    except (QueueFullError, InferenceTimeout):
+        return None
 
+def envoyer_ws(ws, message):
+    """
+    Envoie un message JSON ; sans effet si le client a déjà fermé la connexion.
+    """
+    try:
+        ws.send(json.dumps(message, ensure_ascii=False))
+    except Exception:
+        logger.debug("Connexion directe déjà fermée, message non envoyé")
+
+def evaluate_live(ws):
+    """
+    Protocole :
+    1. le client envoie un message JSON {"target_text": ..., "langue": "ar" | "fr"}
+       (ou "passage_id" à la place de "target_text"), avec "format": "pcm16" et
+       "frequence" si les morceaux sont du PCM 16 bits mono ;
+    2. puis les morceaux audio (PCM ou MediaRecorder) en binaire ;
+       le serveur répond {"type": "partiel", ...} au fil de la transcription ;
+    3. le client envoie {"type": "stop"} ; le serveur répond {"type": "final", ...}
+       avec les mêmes champs que /evaluate, ou {"type": "erreur", ...}
+       ("occupe": true si la file d'inférence est pleine).
+    """
+    try:
+        init = json.loads(ws.receive())
+        passage = None
+        if init.get("passage_id"):
+            passage = passages.get(init["passage_id"])
+            target_text = passage.texte
+        else:
+            target_text = init["target_text"]
+    except UnknownPassage as e:
+        ws.send(json.dumps({"type": "erreur", "error": f"Passage inconnu : {e.args[0]}"}))
+        return
+    except (TypeError, ValueError, KeyError):
+        ws.send(json.dumps({"type": "erreur", "error": "Texte manquant"}))
+        return
+    langue = init.get("langue") or "ar"
+    if langue not in engine or (passage is not None and passage.langue != langue):
+        ws.send(json.dumps({"type": "erreur", "error": f"Langue non prise en charge : {langue}"}))
+        return
+    nom = engine.config(langue)["nom"]
+
+    # "format": "pcm16" : morceaux PCM 16 bits mono à "frequence" Hz (pages en 16 kHz)
+    pcm_rate = int(init.get("frequence", 16000)) if init.get("format") == "pcm16" else None
+    session = LiveReadingSession(partial(transcrire_fenetre, langue), target_text,
+                                 window_s=LIVE_WINDOW_S, stride_s=LIVE_STRIDE_S,
+                                 profile=NORMALISATION[langue], pcm_rate=pcm_rate)
+
+    try:
+        while True:
+            message = ws.receive()
+            if isinstance(message, (bytes, bytearray)):
+                partiel = session.add_chunk(message)
+                if partiel:
+                    ws.send(json.dumps(partiel, ensure_ascii=False))
+                continue
+            if json.loads(message).get("type") == "stop":
+                break
+
+        speech_array = session.finish()
+        if len(speech_array) == 0:
+            ws.send(json.dumps({"type": "erreur", "error": "Audio vide"}))
+            return
+        # Transcription des fenêtres, sauf si la note a besoin d'une passe complète
+        transcription = None
+        if ASR_DECODAGE != "cible" and not ASR_LOGITS:
+            transcription = session.transcription
+        payload = evaluer_signal(langue, speech_array, session.audio_path, target_text, passage, transcription)
+        ws.send(json.dumps({"type": "final", **payload}, ensure_ascii=False))
+    except QueueFullError:
+        metrics.REQUESTS.inc(langue, "occupe")
+        envoyer_ws(ws, {"type": "erreur", "occupe": True,
+                        "error": "Serveur occupé, réessayez dans quelques secondes"})
+    except InferenceTimeout:
+        metrics.REQUESTS.inc(langue, "delai_depasse")
+        envoyer_ws(ws, {"type": "erreur", "error": f"Délai de traitement dépassé ({nom})"})
     except Exception as e:
-        return jsonify({'error': f"Erreur de traitement (français) : {str(e)}"}), 500
+        logger.exception("Erreur de traitement en direct (%s)", langue)
+        metrics.REQUESTS.inc(langue, "erreur")
+        envoyer_ws(ws, {"type": "erreur", "error": f"Erreur de traitement (direct) : {str(e)}"})
+    finally:
+        session.discard()
+
+if sock and ASR_LIVE:
+    sock.route('/ws/evaluate')(evaluate_live)
+elif ASR_LIVE:
+    logger.warning("⚠️ flask-sock non installé : lecture en direct (/ws/evaluate) désactivée.")
+
+# 📈 Statistiques des micro-lots
+@app.route('/stats/batching')
+def stats_batching():
+    return jsonify({
+        langue: batcher.stats() for langue, batcher in batchers.items()
+    })
+
+# 🗃️ Statistiques du cache des transcriptions
+@app.route('/stats/cache')
+def stats_cache():
+    return jsonify(transcription_cache.stats())
+
+# 💾 Statistiques d'écriture des évaluations
+@app.route('/stats/db')
+def stats_db():
+    return jsonify(evaluation_writer.stats())
+
+# 🗄️ Statistiques de l'archive audio
+@app.route('/stats/archive')
+def stats_archive():
+    return jsonify(audio_archive.stats())
+
+# 🧮 Statistiques des log-probabilités conservées
+@app.route('/stats/logits')
+def stats_logits():
+    return jsonify({"actif": ASR_LOGITS, **logit_store.stats()})
+
+# 🔇 Silence ignoré par la détection d'activité vocale
+@app.route('/stats/vad')
+def stats_vad():
+    # Avec un pool de workers, les compteurs sont tenus dans chaque worker et non exposés ici
+    if vad is None or inference_pool is not None:
+        return jsonify({"active": vad is not None})
+    return jsonify({"active": True, "reglages": vad.params(), "signature": vad.signature(), **vad.stats()})
+
+# 🪜 Cascade : taux d'escalade vers le modèle complet et économie estimée, par langue
+@app.route('/stats/cascade')
+def stats_cascade():
+    # Avec un pool de workers, les compteurs sont tenus dans chaque worker et non exposés ici
+    if not ASR_CASCADE or inference_pool is not None:
+        return jsonify({"actif": ASR_CASCADE, "langues": sorted(CASCADE_LANGUES)})
+    return jsonify({"actif": True, "langues": engine.cascade_stats()})
+
+# 🧩 État des modèles (chargement à la demande)
+@app.route('/stats/models')
+def stats_models():
+    return jsonify(engine.stats())
+
+# ⚙️ État du pool de workers d'inférence (redémarrages après un worker tué)
+@app.route('/stats/pool')
+def stats_pool():
+    if inference_pool is None:
+        return jsonify({"actif": False})
+    return jsonify({"actif": True, **inference_pool.stats()})
+
+# 📈 Métriques au format Prometheus (latence par étape et par langue, requêtes par statut)
+# En mode pool (ASR_WORKERS > 0), les étapes internes à l'inférence sont mesurées
+# dans les workers et ne figurent pas ici : seule l'étape "transcription" les couvre.
+@app.route('/metrics')
+def metriques():
+    return metrics.render(), 200, {"Content-Type": "text/plain; version=0.0.4; charset=utf-8"}
 
 # 🚀 Lancement du serveur
 if __name__ == '__main__':
-    if not os.path.exists("audios"):
-        os.makedirs("audios")
-    app.run(host='0.0.0.0', port=5000, debug=True)
+    # Serveur de développement ; en production : gunicorn -c gunicorn.conf.py app:app
+    app.run(host='0.0.0.0', port=5000, debug=os.environ.get("FLASK_DEBUG", "1") == "1", threaded=True)
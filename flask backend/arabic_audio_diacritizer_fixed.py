@@ -1,65 +1,71 @@
-import torch
-import numpy as np
-import librosa
-import os 
-from transformers import Wav2Vec2ForCTC, Wav2Vec2Processor
+from normalization import strip_diacritics
+from speech_engine import LANGUES, SpeechProcessor
 
-class ArabicAudioProcessor:
+class ArabicAudioProcessor(SpeechProcessor):
     """
     Système de reconnaissance vocale arabe sans diacritisation.
-    Optimisé pour intégration avec une API Flask.
+    Interface historique au-dessus de SpeechProcessor (voir speech_engine) :
+    les diacritiques ne sont supprimés que sur demande (remove_diacritics).
     """
     
-    def __init__(self):
-        print("Chargement du modèle de reconnaissance vocale...")
-        self.asr_processor = Wav2Vec2Processor.from_pretrained("jonatasgrosman/wav2vec2-large-xlsr-53-arabic")
-        self.asr_model = Wav2Vec2ForCTC.from_pretrained("jonatasgrosman/wav2vec2-large-xlsr-53-arabic")
-        print("Modèle chargé avec succès")
+    MODEL_ID = LANGUES["ar"]["modele"]
+    
+    def __init__(self, backend=None, cache=None, vad=None):
+        """
+        backend : moteur d'inférence ('torch', 'int8' ou 'onnx'),
+        par défaut la variable d'environnement ASR_BACKEND.
+        cache : TranscriptionCache optionnel consulté avant chaque transcription.
+        vad : VoiceActivityDetector optionnel (silences retirés avant le modèle).
+        """
+        super().__init__(self.MODEL_ID, "ar", postprocess=strip_diacritics,
+                         backend=backend, cache=cache, vad=vad)
+    
+    @property
+    def asr_processor(self):
+        return self.processor
+    
+    @property
+    def asr_model(self):
+        return self.model
     
     @staticmethod
     def remove_diacritics(text):
         """
         Supprime les diacritiques d'un texte arabe.
         """
-        diacritics = [
-            '\u0610', '\u0611', '\u0612', '\u0613', '\u0614', '\u0615', '\u0616', '\u0617', '\u0618', '\u0619', '\u061A',
-            '\u064B', '\u064C', '\u064D', '\u064E', '\u064F', '\u0650', '\u0651', '\u0652', '\u0653', '\u0654', '\u0655',
-            '\u0656', '\u0657', '\u0658', '\u0659', '\u065A', '\u065B', '\u065C', '\u065D', '\u065E', '\u065F'
-        ]
-        for diac in diacritics:
-            text = text.replace(diac, '')
-        return text
+        return strip_diacritics(text)
 
-    def process_audio(self, audio_path, sample_rate=16000, remove_diacritics=False):
+    def transcribe_batch(self, speech_arrays, sample_rate=16000, remove_diacritics=False):
         """
-        Traite un fichier audio pour produire un texte arabe.
-        Option pour supprimer les diacritiques du texte transcrit.
+        Transcrit plusieurs audios déjà chargés en une seule passe du modèle.
         """
-        print(f"Transcription de l'audio: {audio_path}")
-        
-        if not os.path.exists(audio_path):
-            raise FileNotFoundError(f"Le fichier audio {audio_path} n'existe pas")
-        
-        print("Chargement de l'audio...")
         try:
-            speech_array, _ = librosa.load(audio_path, sr=sample_rate)
+            return super().transcribe_batch(speech_arrays, sample_rate, postprocess=remove_diacritics)
         except Exception as e:
-            raise Exception(f"Erreur lors du chargement de l'audio: {str(e)}")
-        
-        print(f"Audio chargé, longueur: {len(speech_array)} échantillons")
-        
-        print("Traitement par le modèle ASR...")
+            raise Exception(f"Erreur lors de la transcription: {str(e)}")
+
+    def transcribe_batch_aligned(self, items, sample_rate=16000, remove_diacritics=False):
+        """
+        Décodage guidé par le texte cible (voir SpeechProcessor.transcribe_batch_aligned).
+        """
         try:
-            inputs = self.asr_processor(speech_array, sampling_rate=sample_rate, return_tensors="pt")
-            with torch.no_grad():
-                logits = self.asr_model(inputs.input_values).logits
-                predicted_ids = torch.argmax(logits, dim=-1)
-                transcription = self.asr_processor.batch_decode(predicted_ids)[0]
+            return super().transcribe_batch_aligned(items, sample_rate, postprocess=remove_diacritics)
         except Exception as e:
             raise Exception(f"Erreur lors de la transcription: {str(e)}")
-        
-        if remove_diacritics:
-            transcription = self.remove_diacritics(transcription)
-        
-        print(f"Transcription: {transcription}")
-        return transcription
\ No newline at end of file
+
+    def process_audio(self, audio_path, sample_rate=16000, remove_diacritics=False, return_log_probs=False):
+        """
+        Traite un fichier audio pour produire un texte arabe.
+        Option pour supprimer les diacritiques du texte transcrit, et pour
+        renvoyer aussi les log-probabilités du modèle (voir SpeechProcessor.transcribe).
+        """
+        return self.transcribe(audio_path, sample_rate, postprocess=remove_diacritics,
+                               return_log_probs=return_log_probs)
+
+    def transcribe_stream(self, audio_path, sample_rate=16000, remove_diacritics=False,
+                          chunk_length_s=20.0, stride_length_s=4.0):
+        """
+        Transcription en flux (voir SpeechProcessor.transcribe_stream).
+        """
+        return super().transcribe_stream(audio_path, sample_rate, remove_diacritics,
+                                         chunk_length_s, stride_length_s)
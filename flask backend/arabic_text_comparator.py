@@ -1,6 +1,6 @@
-import re
-import difflib
-from arabic_audio_diacritizer_fixed import ArabicAudioProcessor
+from normalization import get_profile
+from passage_registry import PassageIndex
+from alignment import align, levenshtein, similarity_ratio, EQUAL, SUBSTITUTE, INSERT, DELETE
 
 class TextComparator:
     """
@@ -14,49 +14,100 @@ class TextComparator:
         Nettoie le texte arabe en supprimant les guillemets et les espaces multiples,
         mais conserve les diacritiques et la ponctuation.
         """
-        text = text.replace('"', '')
-        text = text.replace('\\n', ' ')
-        text = re.sub(r'\s+', ' ', text)
-        return text.strip()
+        return get_profile("base")(text)
     
     @staticmethod
-    def compare_texts(original_text, transcribed_text, remove_diacritics=False):
+    def compare_texts(original_text, transcribed_text, remove_diacritics=False, profile=None):
         """
         Compare le texte original avec la transcription et génère un rapport de différences.
-        Option pour supprimer les diacritiques avant la comparaison.
+        Option pour supprimer les diacritiques avant la comparaison, ou profil de
+        normalisation explicite (voir normalization.PROFILES).
         """
-        # Nettoyer les textes
-        clean_original = TextComparator.clean_arabic_text(original_text)
-        clean_transcribed = TextComparator.clean_arabic_text(transcribed_text)
+        if profile is None:
+            profile = "ar_sans_diacritiques" if remove_diacritics else "base"
+        return TextComparator.compare_to_passage(TextComparator.index(original_text, profile), transcribed_text)
+    
+    _index_cache = {}
+    
+    @staticmethod
+    def index(original_text, profile="base", max_size=256):
+        """
+        Index du texte cible (voir PassageIndex), mémorisé : le même texte
+        est renvoyé à chaque requête.
+        """
+        key = (profile, original_text)
+        passage = TextComparator._index_cache.get(key)
+        if passage is None:
+            if len(TextComparator._index_cache) >= max_size:
+                TextComparator._index_cache.clear()
+            passage = TextComparator._index_cache[key] = PassageIndex(original_text, profile)
+        return passage
+    
+    @staticmethod
+    def compare_to_passage(passage, transcribed_text):
+        """
+        Compare une transcription à un texte déjà indexé : seul le côté
+        transcription est normalisé et découpé.
+        """
+        clean_original = passage.normalized
+        clean_transcribed = get_profile(passage.profile)(transcribed_text)
+        
+        # Similarité au niveau des caractères (2 * LCS / longueur totale, comme difflib)
+        similarity_percentage = similarity_ratio(clean_original, clean_transcribed, passage.char_masks) * 100
         
-        # Supprimer les diacritiques si demandé
-        if remove_diacritics:
-            clean_original = ArabicAudioProcessor.remove_diacritics(clean_original)
-            clean_transcribed = ArabicAudioProcessor.remove_diacritics(clean_transcribed)
+        # Alignement au niveau des mots : une seule passe donne les opérations et le WER
+        original_words = passage.tokens
+        word_distance, operations = align(original_words, clean_transcribed.split(), passage.word_masks)
         
-        # Calculer la similarité
-        similarity_ratio = difflib.SequenceMatcher(None, clean_original, clean_transcribed).ratio()
-        similarity_percentage = similarity_ratio * 100
+        # Compter les erreurs (une substitution compte comme un mot manquant et un mot en trop)
+        substitutions = sum(1 for op in operations if op[0] == SUBSTITUTE)
+        insertions = sum(1 for op in operations if op[0] == INSERT)
+        deletions = sum(1 for op in operations if op[0] == DELETE)
+        common = len(operations) - substitutions - insertions - deletions
         
-        # Générer un diff au niveau des mots
-        d = difflib.Differ()
-        diff = list(d.compare(clean_original.split(), clean_transcribed.split()))
+        # Détail au format de difflib.Differ ("  ", "- ", "+ ")
+        diff = []
+        for kind, original_word, transcribed_word in operations:
+            if kind == EQUAL:
+                diff.append(f"  {original_word}")
+                continue
+            if original_word is not None:
+                diff.append(f"- {original_word}")
+            if transcribed_word is not None:
+                diff.append(f"+ {transcribed_word}")
         
-        # Compter les erreurs
-        additions = len([d for d in diff if d.startswith('+ ')])
-        deletions = len([d for d in diff if d.startswith('- ')])
-        common = len([d for d in diff if d.startswith('  ')])
+        # Mots corrects par phrase du texte cible
+        correct_by_word = []
+        for kind, original_word, _ in operations:
+            if original_word is not None:
+                correct_by_word.append(kind == EQUAL)
+        phrases = []
+        for phrase in passage.phrases:
+            start, end = phrase["mots"]
+            correct = sum(correct_by_word[start:end])
+            phrases.append({
+                "mots": end - start,
+                "mots_corrects": correct,
+                "precision_pourcentage": 100 * correct / (end - start),
+            })
         
         # Préparer le rapport
         report = {
-            "texte_original": original_text,
+            "texte_original": passage.texte,
             "texte_original_nettoye": clean_original,
             "transcription": transcribed_text,
             "transcription_nettoyee": clean_transcribed,
             "similarite_pourcentage": similarity_percentage,
             "mots_communs": common,
-            "mots_manquants": deletions,
-            "mots_supplementaires": additions,
+            "mots_manquants": deletions + substitutions,
+            "mots_supplementaires": insertions + substitutions,
+            "substitutions": substitutions,
+            "insertions": insertions,
+            "suppressions": deletions,
+            "wer": word_distance / max(len(original_words), 1),
+            "cer": levenshtein(clean_original, clean_transcribed, passage.char_masks) / max(len(clean_original), 1),
+            "phrases": phrases,
+            "alignement": operations,
             "diff_details": diff
         }
         
@@ -0,0 +1,326 @@
+import os
+import io
+import queue
+import sqlite3
+import hashlib
+import logging
+import threading
+import time
+from datetime import datetime
+from metrics import timed
+
+logger = logging.getLogger(__name__)
+
+# Format d'archivage : (extension, type MIME, format et sous-type soundfile)
+CODECS = {
+    "flac": ("flac", "audio/flac", "FLAC", "PCM_16"),
+    "opus": ("opus", "audio/ogg", "OGG", "OPUS"),
+    "original": (None, None, None, None),
+}
+
+MIME_ORIGINAL = {
+    "wav": "audio/wav", "ogg": "audio/ogg", "flac": "audio/flac",
+    "webm": "audio/webm", "mp3": "audio/mpeg", "mp4": "audio/mp4",
+}
+
+
+def record_id(data):
+    """
+    Identifiant d'un enregistrement : empreinte de son contenu (un même
+    envoi répété n'est archivé qu'une fois).
+    """
+    return hashlib.sha256(data).hexdigest()[:32]
+
+
+class AudioArchive:
+    """
+    Archive des enregistrements, adressée par contenu.
+    Chemin : <racine>/<langue>/<AAAA>/<MM>/<JJ>/<2 premiers caractères de l'id>/<id>.<ext>,
+    ce qui borne la taille de chaque dossier. La requête ne fait que calculer
+    l'empreinte et mettre l'audio en file : un thread d'arrière-plan le
+    réencode (16 kHz mono, Opus ou FLAC) puis l'indexe dans une base SQLite
+    (recherche par identifiant, purge par ancienneté ou taille totale).
+    Le fichier réencodé n'est conservé que s'il est plus petit que l'envoi
+    d'origine (un envoi déjà compressé en Opus/WebM grossit en FLAC).
+    on_purge(identifiants) est appelée après chaque purge, pour supprimer les
+    données dérivées des enregistrements (ex. LogitStore.delete).
+    """
+
+    def __init__(self, root="audios", codec="opus", retention_days=0, max_bytes=0,
+                 queue_size=256, purge_interval_s=3600, sample_rate=16000, on_purge=None):
+        if codec not in CODECS:
+            raise ValueError(f"Codec d'archivage inconnu : {codec} (choix : {', '.join(CODECS)})")
+        self.root = root
+        self.codec = codec
+        self.retention_days = retention_days
+        self.max_bytes = max_bytes
+        self.sample_rate = sample_rate
+        self.on_purge = on_purge
+        os.makedirs(root, exist_ok=True)
+
+        self._db = sqlite3.connect(os.path.join(root, "index.db"), check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS archive ("
+            "id TEXT PRIMARY KEY, langue TEXT, chemin TEXT, codec TEXT, octets INTEGER, "
+            "octets_origine INTEGER, duree_s REAL, cree_le REAL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS archive_cree_le ON archive (cree_le)")
+        self._db.commit()
+        self._db_lock = threading.Lock()
+
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._stored = 0
+        self._bytes_in = 0
+        self._bytes_out = 0
+        self._synchronous = 0
+        self._errors = 0
+        self._purged = 0
+
+        self._thread = threading.Thread(target=self._loop, name="audio-archive", daemon=True)
+        self._thread.start()
+        if retention_days > 0 or max_bytes > 0:
+            self._purger = threading.Thread(target=self._purge_loop, args=(purge_interval_s,),
+                                            name="audio-archive-purge", daemon=True)
+            self._purger.start()
+
+    def _relative_path(self, rid, langue, ext, when):
+        day = datetime.fromtimestamp(when)
+        return os.path.join(langue, f"{day:%Y}", f"{day:%m}", f"{day:%d}", rid[:2], f"{rid}.{ext}")
+
+    def store(self, langue, data, speech_array=None):
+        """
+        Archive un enregistrement (octets de l'upload, ou chemin d'un fichier
+        lu immédiatement). speech_array : signal déjà décodé à sample_rate,
+        qui évite un second décodage avant réencodage.
+        Renvoie l'identifiant de l'enregistrement sans attendre l'écriture.
+        """
+        if isinstance(data, (str, os.PathLike)):
+            with open(data, "rb") as f:
+                data = f.read()
+        data = bytes(data)
+        rid = record_id(data)
+        with self._lock:
+            if rid in self._pending or self._lookup_index(rid) is not None:
+                return rid
+            self._pending[rid] = langue
+        job = (rid, langue, data, speech_array, time.time())
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            # File pleine : l'audio d'origine est écrit tout de suite, sans réencodage
+            with self._lock:
+                self._synchronous += 1
+            self._archive(*job, codec="original")
+        return rid
+
+    def _encode(self, data, speech_array, codec):
+        from audio_ingest import detect_format
+        if codec == "original":
+            fmt = detect_format(data)
+            return data, (fmt if fmt != "inconnu" else "bin"), None
+
+        import soundfile as sf
+        if speech_array is None:
+            from audio_ingest import decode_audio
+            speech_array = decode_audio(data, self.sample_rate)
+        ext, _, fmt, subtype = CODECS[codec]
+        buffer = io.BytesIO()
+        sf.write(buffer, speech_array, self.sample_rate, format=fmt, subtype=subtype)
+        return buffer.getvalue(), ext, len(speech_array) / self.sample_rate
+
+    def _archive(self, rid, langue, data, speech_array, when, codec=None):
+        codec = codec or self.codec
+        try:
+            with timed("archivage", langue):
+                try:
+                    encoded, ext, duration = self._encode(data, speech_array, codec)
+                except Exception as e:
+                    # Codec indisponible (ex. libsndfile sans Opus) ou audio illisible : original conservé
+                    logger.warning("⚠️ Réencodage %s impossible pour %s : %s", codec, rid, e)
+                    codec = "original"
+                    encoded, ext, duration = self._encode(data, None, codec)
+                if codec != "original" and len(encoded) >= len(data):
+                    # Réencodage plus gros que l'envoi : original conservé
+                    codec = "original"
+                    encoded, ext, _ = self._encode(data, None, codec)
+
+                relative = self._relative_path(rid, langue, ext, when)
+                path = os.path.join(self.root, relative)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                tmp = f"{path}.tmp"
+                with open(tmp, "wb") as f:
+                    f.write(encoded)
+                os.replace(tmp, path)
+
+                with self._db_lock:
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO archive VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                        (rid, langue, relative, codec, len(encoded), len(data), duration, when),
+                    )
+                    self._db.commit()
+            with self._lock:
+                self._stored += 1
+                self._bytes_in += len(data)
+                self._bytes_out += len(encoded)
+        except Exception as e:
+            with self._lock:
+                self._errors += 1
+            logger.error("Échec d'archivage de %s : %s", rid, e)
+        finally:
+            with self._lock:
+                self._pending.pop(rid, None)
+
+    def _loop(self):
+        while True:
+            job = self._queue.get()
+            self._archive(*job)
+            self._queue.task_done()
+
+    def _lookup_index(self, rid):
+        with self._db_lock:
+            row = self._db.execute(
+                "SELECT langue, chemin, codec, octets, octets_origine, duree_s, cree_le FROM archive WHERE id = ?",
+                (rid,),
+            ).fetchone()
+        if row is None:
+            return None
+        langue, chemin, codec, octets, octets_origine, duree_s, cree_le = row
+        return {
+            "id": rid, "langue": langue, "chemin": os.path.join(self.root, chemin), "codec": codec,
+            "octets": octets, "octets_origine": octets_origine, "duree_s": duree_s,
+            "cree_le": datetime.fromtimestamp(cree_le).isoformat(timespec="seconds"),
+        }
+
+    def lookup(self, rid):
+        """
+        Métadonnées d'un enregistrement ({"en_attente": True} s'il n'est pas
+        encore écrit), ou None s'il est inconnu.
+        """
+        with self._lock:
+            if rid in self._pending:
+                return {"id": rid, "langue": self._pending[rid], "en_attente": True}
+        return self._lookup_index(rid)
+
+    @staticmethod
+    def mimetype(entry):
+        if entry["codec"] == "original":
+            return MIME_ORIGINAL.get(os.path.splitext(entry["chemin"])[1][1:], "application/octet-stream")
+        return CODECS[entry["codec"]][1]
+
+    def _delete(self, rows):
+        for rid, chemin in rows:
+            path = os.path.join(self.root, chemin)
+            try:
+                os.remove(path)
+                # Dossiers de jour/préfixe devenus vides
+                os.removedirs(os.path.dirname(path))
+            except OSError:
+                pass
+        with self._db_lock:
+            self._db.executemany("DELETE FROM archive WHERE id = ?", [(rid,) for rid, _ in rows])
+            self._db.commit()
+        with self._lock:
+            self._purged += len(rows)
+        if self.on_purge is not None and rows:
+            self.on_purge([rid for rid, _ in rows])
+        return len(rows)
+
+    def purge(self, retention_days=None, max_bytes=None):
+        """
+        Supprime les enregistrements plus anciens que retention_days jours, puis
+        les plus anciens tant que l'archive dépasse max_bytes octets (0 = sans limite).
+        Renvoie le nombre d'enregistrements supprimés.
+        """
+        retention_days = self.retention_days if retention_days is None else retention_days
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        removed = 0
+        if retention_days > 0:
+            with self._db_lock:
+                rows = self._db.execute("SELECT id, chemin FROM archive WHERE cree_le < ?",
+                                        (time.time() - retention_days * 86400,)).fetchall()
+            removed += self._delete(rows)
+        if max_bytes > 0:
+            with self._db_lock:
+                total = self._db.execute("SELECT COALESCE(SUM(octets), 0) FROM archive").fetchone()[0]
+                rows = []
+                if total > max_bytes:
+                    for rid, chemin, octets in self._db.execute(
+                            "SELECT id, chemin, octets FROM archive ORDER BY cree_le"):
+                        if total <= max_bytes:
+                            break
+                        rows.append((rid, chemin))
+                        total -= octets
+            removed += self._delete(rows)
+        return removed
+
+    def _purge_loop(self, interval_s):
+        while True:
+            try:
+                removed = self.purge()
+                if removed:
+                    logger.info("🧹 %d enregistrement(s) purgé(s) de l'archive.", removed)
+            except Exception as e:
+                logger.error("Échec de la purge de l'archive : %s", e)
+            time.sleep(interval_s)
+
+    def flush(self):
+        """
+        Attend que tous les enregistrements en file soient écrits.
+        """
+        self._queue.join()
+
+    def close(self):
+        self.flush()
+        with self._db_lock:
+            self._db.close()
+
+    def stats(self):
+        with self._db_lock:
+            count, total = self._db.execute("SELECT COUNT(*), COALESCE(SUM(octets), 0) FROM archive").fetchone()
+        with self._lock:
+            return {
+                "codec": self.codec,
+                "enregistrements": count,
+                "octets": total,
+                "archives_depuis_demarrage": self._stored,
+                "taux_compression": (self._bytes_out / self._bytes_in) if self._bytes_in else 0.0,
+                "ecritures_sans_reencodage": self._synchronous,
+                "echecs": self._errors,
+                "purges": self._purged,
+                "en_attente": len(self._pending),
+            }
+
+
+def migrate_flat_directory(archive, directory):
+    """
+    Importe les fichiers de l'ancien dossier plat (ar_AAAAMMJJhhmmss.wav) dans
+    l'archive, en conservant leur date. Renvoie le nombre de fichiers importés.
+    """
+    imported = 0
+    for name in sorted(os.listdir(directory)):
+        path = os.path.join(directory, name)
+        if not os.path.isfile(path) or "_" not in name:
+            continue
+        langue, stamp = os.path.splitext(name)[0].split("_", 1)
+        try:
+            when = datetime.strptime(stamp, "%Y%m%d%H%M%S").timestamp()
+        except ValueError:
+            continue
+        with open(path, "rb") as f:
+            data = f.read()
+        archive._archive(record_id(data), langue, data, None, when)
+        imported += 1
+    return imported
+
+
+if __name__ == "__main__":
+    # Migration de l'ancien dossier plat : python audio_archive.py ancien_dossier [racine_archive]
+    import sys
+    if len(sys.argv) < 2:
+        print("Usage : python audio_archive.py ancien_dossier [racine_archive]")
+        sys.exit(1)
+    archive = AudioArchive(sys.argv[2] if len(sys.argv) > 2 else os.environ.get("ARCHIVE_DIR", "audios"),
+                           codec=os.environ.get("ARCHIVE_CODEC", "opus"))
+    print(f"{migrate_flat_directory(archive, sys.argv[1])} enregistrement(s) importé(s).")
@@ -0,0 +1,255 @@
+import collections
+import io
+import os
+import tempfile
+import threading
+import numpy as np
+import soundfile as sf
+import soxr
+
+try:
+    import av
+except ImportError:
+    av = None
+
+# Qualité du rééchantillonneur soxr ("QQ", "LQ", "MQ", "HQ", "VHQ") : MQ suffit
+# largement pour la reconnaissance vocale et coûte bien moins que librosa.load
+RESAMPLE_QUALITY = os.environ.get("ASR_RESAMPLE_QUALITY", "MQ")
+
+# Formats lisibles directement par soundfile (libsndfile)
+SOUNDFILE_FORMATS = ("wav", "ogg", "flac")
+
+
+def detect_format(data):
+    """
+    Détecte le conteneur d'après les premiers octets (le navigateur envoie
+    souvent du webm/ogg sous un nom de fichier .wav).
+    """
+    head = bytes(data[:12])
+    if head[:4] == b"RIFF" and head[8:12] == b"WAVE":
+        return "wav"
+    if head[:4] == b"OggS":
+        return "ogg"
+    if head[:4] == b"fLaC":
+        return "flac"
+    if head[:4] == b"\x1a\x45\xdf\xa3":
+        return "webm"
+    if head[:3] == b"ID3" or head[:2] in (b"\xff\xfb", b"\xff\xf3", b"\xff\xf2"):
+        return "mp3"
+    if head[4:8] == b"ftyp":
+        return "mp4"
+    return "inconnu"
+
+
+def _to_mono(audio):
+    return audio.mean(axis=1) if audio.ndim > 1 else audio
+
+
+def _resample(audio, source_rate, sample_rate):
+    if source_rate == sample_rate:
+        return audio
+    return soxr.resample(audio, source_rate, sample_rate, quality=RESAMPLE_QUALITY)
+
+
+def _decode_soundfile(data, sample_rate):
+    audio, source_rate = sf.read(io.BytesIO(data), dtype="float32", always_2d=True)
+    return _resample(_to_mono(audio), source_rate, sample_rate)
+
+
+def _decode_av(data, sample_rate):
+    # FFmpeg décode et rééchantillonne directement en mono float32
+    resampler = av.AudioResampler(format="flt", layout="mono", rate=sample_rate)
+    parts = []
+    with av.open(io.BytesIO(data)) as container:
+        for frame in container.decode(audio=0):
+            for out in resampler.resample(frame):
+                parts.append(out.to_ndarray().reshape(-1))
+    for out in resampler.resample(None):
+        parts.append(out.to_ndarray().reshape(-1))
+    return np.concatenate(parts) if parts else np.zeros(0, dtype=np.float32)
+
+
+def _decode_librosa(data, sample_rate, suffix):
+    # Dernier recours (PyAV absent) : passage par un fichier temporaire.
+    # librosa n'est importé qu'ici : lent à charger et inutile avec soundfile/PyAV
+    import librosa
+    with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as temp_audio:
+        temp_audio.write(data)
+        path = temp_audio.name
+    try:
+        audio, _ = librosa.load(path, sr=sample_rate, res_type="soxr_mq")
+    finally:
+        os.remove(path)
+    return audio
+
+
+def decode_audio(data, sample_rate=16000):
+    """
+    Décode un audio en mémoire (octets d'un upload) en signal mono float32
+    à sample_rate, sans aller-retour par un fichier temporaire.
+    Pas de rééchantillonnage si l'audio est déjà à la bonne fréquence.
+    ValueError si l'audio est vide, illisible ou d'un format qu'aucun
+    décodeur disponible ne prend en charge (erreur du client : 400).
+    """
+    data = bytes(data)
+    if not data:
+        raise ValueError("Audio vide")
+
+    fmt = detect_format(data)
+    audio = None
+    if fmt in SOUNDFILE_FORMATS:
+        try:
+            audio = _decode_soundfile(data, sample_rate)
+        except Exception:
+            pass  # ex. ogg/opus non pris en charge par une ancienne libsndfile
+
+    if audio is None:
+        try:
+            if av is not None:
+                audio = _decode_av(data, sample_rate)
+            else:
+                audio = _decode_librosa(data, sample_rate, suffix=f".{fmt}")
+        except ImportError as e:
+            raise ValueError(f"Format audio non pris en charge ({fmt}) : PyAV ou librosa requis") from e
+        except Exception as e:
+            raise ValueError(f"Format audio non pris en charge ou fichier illisible ({fmt})") from e
+    return _non_vide(audio)
+
+
+def _non_vide(audio):
+    # Conteneur valide mais sans échantillon (ex. enregistrement interrompu) : rien à noter
+    if len(audio) == 0:
+        raise ValueError("Audio vide")
+    return np.ascontiguousarray(audio, dtype=np.float32)
+
+
+# Types MIME du PCM brut envoyé par le navigateur (16 bits signés, little-endian)
+PCM_MIMETYPES = ("audio/l16", "audio/pcm")
+
+
+def decode_pcm16(data, source_rate=16000, sample_rate=16000, channels=1):
+    """
+    Signal float32 d'un PCM 16 bits little-endian sans en-tête : aucune
+    décompression, seulement une conversion (et un rééchantillonnage si
+    le client n'a pas envoyé du sample_rate).
+    """
+    pcm = np.frombuffer(data, dtype="<i2", count=len(data) // 2)
+    if channels > 1:
+        pcm = pcm[:len(pcm) - len(pcm) % channels].reshape(-1, channels)
+    audio = _to_mono(pcm.astype(np.float32) / 32768.0)
+    return np.ascontiguousarray(_resample(audio, source_rate, sample_rate), dtype=np.float32)
+
+
+def decode_upload(data, mimetype=None, params=None, sample_rate=16000):
+    """
+    Décode un upload selon son type déclaré : PCM brut (audio/L16;rate=...;channels=...)
+    converti directement, sinon conteneur détecté par decode_audio.
+    """
+    if mimetype and mimetype.lower() in PCM_MIMETYPES:
+        params = params or {}
+        return _non_vide(decode_pcm16(data, int(params.get("rate", sample_rate)), sample_rate,
+                                      int(params.get("channels", 1))))
+    return decode_audio(data, sample_rate)
+
+
+class _Flux:
+    # Fichier non positionnable pour PyAV (pas de seek) : read() attend les octets suivants du flux
+    def __init__(self, read):
+        self._read = read
+
+    def read(self, size=-1):
+        return self._read(size)
+
+
+class StreamingDecoder:
+    """
+    Décodage incrémental d'un conteneur reçu par morceaux (webm/ogg de
+    MediaRecorder, qui ne se décodent pas isolément) : un thread PyAV lit les
+    octets au fil de leur arrivée, chacun n'est décodé qu'une fois.
+    Disponible seulement avec PyAV (voir available()).
+    """
+
+    def __init__(self, sample_rate=16000):
+        self.sample_rate = sample_rate
+        self.error = None
+        self._cond = threading.Condition()
+        self._chunks = collections.deque()
+        self._closed = False
+        self._samples = []
+        self._thread = threading.Thread(target=self._run, name="decodage-direct", daemon=True)
+        self._thread.start()
+
+    @staticmethod
+    def available():
+        return av is not None
+
+    def _read(self, size):
+        with self._cond:
+            while not self._chunks and not self._closed:
+                self._cond.wait()
+            if not self._chunks:
+                return b""  # flux fermé : fin du conteneur
+            data = self._chunks.popleft()
+            if 0 <= size < len(data):
+                self._chunks.appendleft(data[size:])
+                data = data[:size]
+            return data
+
+    def _push(self, frame):
+        with self._cond:
+            self._samples.append(frame.to_ndarray().reshape(-1))
+
+    def _run(self):
+        try:
+            resampler = av.AudioResampler(format="flt", layout="mono", rate=self.sample_rate)
+            with av.open(_Flux(self._read), mode="r") as container:
+                for frame in container.decode(audio=0):
+                    for out in resampler.resample(frame):
+                        self._push(out)
+            for out in resampler.resample(None):
+                self._push(out)
+        except Exception as e:
+            self.error = e
+            with self._cond:
+                self._chunks.clear()
+
+    def feed(self, data):
+        """
+        Ajoute un morceau du conteneur (ignoré si le décodage a échoué).
+        """
+        with self._cond:
+            if self.error is None and not self._closed:
+                self._chunks.append(bytes(data))
+                self._cond.notify()
+
+    def drain(self):
+        """
+        Échantillons décodés depuis le dernier appel (sample_rate, mono float32).
+        """
+        with self._cond:
+            samples, self._samples = self._samples, []
+        if not samples:
+            return np.zeros(0, dtype=np.float32)
+        return np.ascontiguousarray(np.concatenate(samples), dtype=np.float32)
+
+    def close(self, timeout=10.0):
+        """
+        Fin du flux : attend la fin du décodage et renvoie les derniers
+        échantillons. Renvoie None si le décodage a échoué ou n'a pas abouti
+        dans le délai (l'appelant redécode alors le fichier complet).
+        """
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._thread.join(timeout)
+        if self.error is not None or self._thread.is_alive():
+            return None
+        return self.drain()
+
+
+def load_audio_file(audio_path, sample_rate=16000):
+    """
+    Variante de decode_audio pour un fichier sur disque.
+    """
+    with open(audio_path, "rb") as f:
+        return decode_audio(f.read(), sample_rate)
@@ -0,0 +1,381 @@
+import os
+import io
+import sys
+import json
+import time
+import wave
+import random
+import platform
+import argparse
+import resource
+import subprocess
+import tempfile
+from datetime import datetime
+import numpy as np
+
+# Banc d'essai reproductible des chemins critiques : décodage audio, inférence
+# (unitaire et par lots, selon le nombre de threads) et comparaison de textes.
+# Résultats en JSON, pour comparer les exécutions dans le temps :
+#   python benchmark.py --sortie bench.json
+#   python benchmark.py --reference bench.json   (écarts de p50 par rapport à un run précédent)
+# Sans accès aux checkpoints, --modele aleatoire (défaut) utilise un petit
+# Wav2Vec2 initialisé aléatoirement : les temps ne valent que pour comparer
+# deux versions du code, pas pour estimer la production.
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+AUDIOS_FOURNIS = [os.path.join(ROOT, "Audios", name) for name in ("Mahmoud.ogg", "Mahmoudfaux.ogg")]
+TEXTE_ARABE = os.path.join(ROOT, "textes", "Mahmoudfaux.txt")
+
+SECTIONS = ("decodage", "inference", "comparaison")
+
+MOTS_FRANCAIS = (
+    "le petit chat dort sur la chaise pendant que sa mère prépare le repas du soir "
+    "les enfants lisent une histoire dans la bibliothèque de l'école avant de rentrer "
+    "à la maison où leur père répare la vieille bicyclette rouge du voisin"
+).split()
+
+# Vocabulaire du modèle aléatoire : lettres arabes (sans diacritiques) et françaises
+VOCAB_ALEATOIRE = list("ابتثجحخدذرزسشصضطظعغفقكلمنهويءآأإةى") + list("abcdefghijklmnopqrstuvwxyzéèêàçùô'")
+
+
+def rss_mo():
+    # RSS courant (Linux) ; repli sur le pic si /proc est indisponible
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError):
+        return rss_pic_mo()
+
+
+def rss_pic_mo():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2**20 if sys.platform == "darwin" else peak / 1024
+
+
+def mesurer(fn, repetitions, echauffement=1, unites=1.0):
+    """
+    Exécute fn `echauffement` fois sans mesure puis `repetitions` fois.
+    unites : quantité traitée par appel (audios, secondes d'audio, mots...)
+    pour le débit. Renvoie les percentiles de latence en millisecondes.
+    """
+    for _ in range(echauffement):
+        fn()
+    durees = []
+    for _ in range(repetitions):
+        started = time.perf_counter()
+        fn()
+        durees.append(time.perf_counter() - started)
+    durees = np.asarray(durees)
+    return {
+        "repetitions": repetitions,
+        "moyenne_ms": round(float(durees.mean()) * 1000, 3),
+        "p50_ms": round(float(np.percentile(durees, 50)) * 1000, 3),
+        "p90_ms": round(float(np.percentile(durees, 90)) * 1000, 3),
+        "p99_ms": round(float(np.percentile(durees, 99)) * 1000, 3),
+        "min_ms": round(float(durees.min()) * 1000, 3),
+        "max_ms": round(float(durees.max()) * 1000, 3),
+        "debit_par_s": round(unites / float(durees.mean()), 3),
+    }
+
+
+# 🎙️ Données synthétiques (déterministes pour une graine donnée)
+def audio_synthetique(duree_s, sample_rate=16000, seed=0):
+    """
+    Signal proche d'une lecture : syllabes voisées (harmoniques modulées)
+    séparées de pauses, plus un bruit de fond faible.
+    """
+    rng = np.random.default_rng(seed)
+    n = int(duree_s * sample_rate)
+    t = np.arange(n) / sample_rate
+    signal = np.zeros(n, dtype=np.float32)
+    position = 0
+    while position < n:
+        syllabe = int(rng.uniform(0.12, 0.3) * sample_rate)
+        end = min(n, position + syllabe)
+        f0 = rng.uniform(100, 220)
+        seg = t[position:end]
+        voix = sum(np.sin(2 * np.pi * f0 * k * seg) / k for k in range(1, 6))
+        signal[position:end] = 0.3 * voix * np.hanning(end - position)
+        # Pause courte entre syllabes, longue de temps en temps (fin de phrase)
+        position = end + int(rng.choice([0.05, 0.1, 0.9], p=[0.6, 0.3, 0.1]) * sample_rate)
+    signal += rng.normal(0, 0.003, n).astype(np.float32)
+    return signal
+
+
+def wav_pcm16(signal, sample_rate):
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(sample_rate)
+        w.writeframes((np.clip(signal, -1, 1) * 32767).astype("<i2").tobytes())
+    return buffer.getvalue()
+
+
+def texte_synthetique(mots, n_mots, seed=0):
+    rng = random.Random(seed)
+    lignes = []
+    for start in range(0, n_mots, 12):
+        lignes.append(" ".join(rng.choice(mots) for _ in range(min(12, n_mots - start))) + ".")
+    return "\n".join(lignes)
+
+
+def lecture_bruitee(texte, mots, taux=0.1, seed=0):
+    """
+    Simule une transcription imparfaite : mots omis, remplacés ou ajoutés
+    (chacun avec une probabilité proportionnelle à taux).
+    """
+    rng = random.Random(seed)
+    sortie = []
+    for mot in texte.replace(".", "").split():
+        tirage = rng.random()
+        if tirage < taux / 2:
+            continue
+        if tirage < taux:
+            sortie.append(rng.choice(mots))
+        else:
+            sortie.append(mot)
+        if rng.random() < taux / 3:
+            sortie.append(rng.choice(mots))
+    return " ".join(sortie)
+
+
+def mots_arabes():
+    with open(TEXTE_ARABE, encoding="utf-8") as f:
+        return f.read().replace('"', " ").replace("\\n", " ").replace(".", " ").split()
+
+
+# 🔤 Modèles
+def modele_aleatoire(seed=0):
+    """
+    Petit Wav2Vec2ForCTC initialisé aléatoirement (même extracteur convolutif
+    que le modèle réel, encodeur réduit) et son processeur, sans téléchargement.
+    """
+    import torch
+    from transformers import (Wav2Vec2Config, Wav2Vec2ForCTC, Wav2Vec2CTCTokenizer,
+                              Wav2Vec2FeatureExtractor, Wav2Vec2Processor)
+
+    vocab = {"<pad>": 0, "<unk>": 1, "|": 2}
+    for char in VOCAB_ALEATOIRE:
+        vocab.setdefault(char, len(vocab))
+    with tempfile.TemporaryDirectory() as tmp:
+        vocab_path = os.path.join(tmp, "vocab.json")
+        with open(vocab_path, "w", encoding="utf-8") as f:
+            json.dump(vocab, f, ensure_ascii=False)
+        tokenizer = Wav2Vec2CTCTokenizer(vocab_path, unk_token="<unk>", pad_token="<pad>",
+                                         word_delimiter_token="|")
+    feature_extractor = Wav2Vec2FeatureExtractor(feature_size=1, sampling_rate=16000, padding_value=0.0,
+                                                 do_normalize=True, return_attention_mask=True)
+    processor = Wav2Vec2Processor(feature_extractor=feature_extractor, tokenizer=tokenizer)
+
+    torch.manual_seed(seed)
+    config = Wav2Vec2Config(
+        vocab_size=len(vocab), hidden_size=64, num_hidden_layers=2, num_attention_heads=2,
+        intermediate_size=128, conv_dim=(32,) * 7, num_conv_pos_embeddings=16,
+        num_conv_pos_embedding_groups=4, feat_extract_norm="layer", do_stable_layer_norm=True,
+        pad_token_id=0,
+    )
+    model = Wav2Vec2ForCTC(config)
+    model.eval()
+    return processor, model
+
+
+def modele_reel(langue, backend=None):
+    from speech_engine import SpeechEngine
+    p = SpeechEngine(backend=backend).get(langue)
+    return p.processor, p.model
+
+
+# ⏱️ Sections
+def bench_decodage(args, durees):
+    from audio_ingest import decode_audio
+
+    resultats = {}
+    for path in AUDIOS_FOURNIS:
+        if not os.path.exists(path):
+            continue
+        with open(path, "rb") as f:
+            data = f.read()
+        duree_s = len(decode_audio(data)) / 16000
+        resultats[os.path.basename(path)] = {
+            "octets": len(data),
+            "duree_audio_s": round(duree_s, 2),
+            **mesurer(lambda: decode_audio(data), args.repetitions, unites=duree_s),
+        }
+    # WAV 48 kHz (fréquence native du navigateur) : décodage + rééchantillonnage
+    for duree_s in durees:
+        data = wav_pcm16(audio_synthetique(duree_s, 48000, seed=args.graine), 48000)
+        resultats[f"synthetique_{duree_s:g}s_48k.wav"] = {
+            "octets": len(data),
+            "duree_audio_s": duree_s,
+            **mesurer(lambda: decode_audio(data), args.repetitions, unites=duree_s),
+        }
+    return resultats
+
+
+def bench_inference(args, durees):
+    import torch
+    from ctc_inference import transcribe_batch
+
+    if args.modele == "aleatoire":
+        processor, model = modele_aleatoire(args.graine)
+    else:
+        processor, model = modele_reel(args.modele, args.backend)
+
+    audios = [audio_synthetique(d, seed=args.graine + i) for i, d in enumerate(durees)]
+    try:
+        from audio_ingest import load_audio_file
+        audios += [load_audio_file(path) for path in AUDIOS_FOURNIS if os.path.exists(path)]
+    except ImportError:
+        pass  # décodeurs absents : audios synthétiques seulement
+    duree_totale = sum(len(a) for a in audios) / 16000
+
+    resultats = {"modele": args.modele, "audios": len(audios), "duree_audio_s": round(duree_totale, 2),
+                 "par_threads": {}}
+    threads_initial = torch.get_num_threads()
+    for threads in args.threads:
+        torch.set_num_threads(threads)
+        par_threads = {}
+        # Unitaire : un audio par passe, latence par audio selon sa durée
+        for audio in audios:
+            duree_s = len(audio) / 16000
+            par_threads[f"unitaire_{duree_s:.1f}s"] = mesurer(
+                lambda: transcribe_batch(processor, model, [audio]), args.repetitions, unites=duree_s)
+        # Par lots : tous les audios, regroupés par lots de taille donnée
+        for taille in args.tailles_lot:
+            lots = [audios[i:i + taille] for i in range(0, len(audios), taille)]
+            par_threads[f"lots_de_{taille}"] = mesurer(
+                lambda: [transcribe_batch(processor, model, lot) for lot in lots],
+                args.repetitions, unites=duree_totale)
+        resultats["par_threads"][str(threads)] = par_threads
+    torch.set_num_threads(threads_initial)
+    # debit_par_s = secondes d'audio transcrites par seconde (inverse du facteur temps réel)
+    return resultats
+
+
+def bench_comparaison(args):
+    from arabic_text_comparator import TextComparator
+
+    langues = {
+        "ar": (mots_arabes(), "ar_sans_diacritiques"),
+        "fr": (MOTS_FRANCAIS, "fr_normalise"),
+    }
+    resultats = {}
+    for langue, (mots, profil) in langues.items():
+        for n_mots in args.tailles_texte:
+            cible = texte_synthetique(mots, n_mots, seed=args.graine)
+            lu = lecture_bruitee(cible, mots, seed=args.graine)
+
+            def a_froid():
+                # Texte jamais vu : normalisation et index du texte cible compris
+                TextComparator._index_cache.clear()
+                TextComparator.compare_texts(cible, lu, profile=profil)
+
+            index = TextComparator.index(cible, profil)
+            resultats[f"{langue}_{n_mots}_mots"] = {
+                "compare_texts": mesurer(a_froid, args.repetitions, unites=n_mots),
+                "compare_to_passage": mesurer(lambda: TextComparator.compare_to_passage(index, lu),
+                                              args.repetitions, unites=n_mots),
+            }
+    # debit_par_s = mots du texte cible comparés par seconde
+    return resultats
+
+
+def environnement():
+    info = {
+        "date": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "plateforme": platform.platform(),
+        "processeurs": os.cpu_count(),
+        "numpy": np.__version__,
+    }
+    for module in ("torch", "transformers"):
+        try:
+            info[module] = __import__(module).__version__
+        except ImportError:
+            info[module] = None
+    try:
+        info["commit"] = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                                        capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        info["commit"] = None
+    return info
+
+
+def comparer_reference(resultats, reference, chemin=()):
+    """
+    Écarts de p50 (en %) entre ce run et un run précédent, pour chaque mesure commune.
+    """
+    ecarts = {}
+    for key, value in resultats.items():
+        ref = reference.get(key) if isinstance(reference, dict) else None
+        if not isinstance(value, dict) or ref is None:
+            continue
+        if "p50_ms" in value and "p50_ms" in ref and ref["p50_ms"] > 0:
+            ecarts["/".join(chemin + (key,))] = round(100 * (value["p50_ms"] - ref["p50_ms"]) / ref["p50_ms"], 1)
+        else:
+            ecarts.update(comparer_reference(value, ref, chemin + (key,)))
+    return ecarts
+
+
+def liste_entiers(text):
+    return [int(x) for x in text.split(",") if x.strip()]
+
+
+def liste_reels(text):
+    return [float(x) for x in text.split(",") if x.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Banc d'essai du décodage, de l'inférence et de la comparaison.")
+    parser.add_argument("--sections", default=",".join(SECTIONS), help=f"sections à exécuter ({', '.join(SECTIONS)})")
+    parser.add_argument("--modele", default="aleatoire",
+                        help="modèle d'inférence : petit modèle aléatoire (hors ligne) ou code de langue du checkpoint réel")
+    parser.add_argument("--backend", default=None, help="moteur d'inférence du modèle réel (torch, int8, onnx)")
+    parser.add_argument("--durees", type=liste_reels, default=[2, 5, 10, 30], help="durées des audios synthétiques (s)")
+    parser.add_argument("--threads", type=liste_entiers, default=[1, os.cpu_count() or 1])
+    parser.add_argument("--tailles-lot", type=liste_entiers, default=[1, 4])
+    parser.add_argument("--tailles-texte", type=liste_entiers, default=[50, 500, 5000], help="nombre de mots des textes synthétiques")
+    parser.add_argument("--repetitions", type=int, default=10)
+    parser.add_argument("--graine", type=int, default=0)
+    parser.add_argument("--sortie", help="fichier JSON de résultats (sinon sortie standard)")
+    parser.add_argument("--reference", help="résultats JSON d'un run précédent à comparer")
+    args = parser.parse_args()
+
+    sections = [s.strip() for s in args.sections.split(",") if s.strip()]
+    resultats = {"environnement": environnement(), "parametres": vars(args), "sections": {}}
+    for section in sections:
+        if section not in SECTIONS:
+            parser.error(f"section inconnue : {section}")
+        print(f"⏱️ {section}...", file=sys.stderr)
+        rss_avant = rss_mo()
+        if section == "decodage":
+            mesures = bench_decodage(args, args.durees)
+        elif section == "inference":
+            mesures = bench_inference(args, args.durees)
+        else:
+            mesures = bench_comparaison(args)
+        # Le pic de RSS est celui du processus depuis son lancement (monotone)
+        resultats["sections"][section] = {
+            "mesures": mesures,
+            "rss_avant_mo": round(rss_avant, 1),
+            "rss_apres_mo": round(rss_mo(), 1),
+            "rss_pic_mo": round(rss_pic_mo(), 1),
+        }
+
+    if args.reference:
+        with open(args.reference, encoding="utf-8") as f:
+            reference = json.load(f)
+        resultats["ecarts_p50_pourcentage"] = comparer_reference(resultats["sections"], reference.get("sections", {}))
+
+    sortie = json.dumps(resultats, ensure_ascii=False, indent=2)
+    if args.sortie:
+        with open(args.sortie, "w", encoding="utf-8") as f:
+            f.write(sortie)
+        print(f"✅ Résultats écrits dans {args.sortie}", file=sys.stderr)
+    else:
+        print(sortie)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,146 @@
+import numpy as np
+import torch
+from metrics import timed
+
+
+def batch_log_probs(processor, model, speech_arrays, sample_rate=16000):
+    """
+    Passe un lot d'audios (tableaux numpy 16 kHz) dans le modèle en une seule fois.
+    Les audios sont complétés (padding) à la même longueur avec un masque d'attention,
+    puis chaque sortie est recoupée à sa longueur réelle.
+    Renvoie la liste des log-probabilités (trames x vocabulaire) de chaque audio.
+    """
+    if len(speech_arrays) == 0:
+        return []
+
+    with timed("extraction"):
+        inputs = processor(
+            list(speech_arrays),
+            sampling_rate=sample_rate,
+            padding=True,
+            return_attention_mask=True,
+            return_tensors="pt",
+        )
+    attention_mask = inputs.get("attention_mask")
+
+    with timed("inference"), torch.no_grad():
+        logits = model(inputs.input_values, attention_mask=attention_mask).logits
+
+    # Longueur utile (en trames) de chaque audio, pour ignorer les trames de padding
+    if attention_mask is not None and len(speech_arrays) > 1:
+        frame_lengths = model._get_feat_extract_output_lengths(attention_mask.sum(-1)).tolist()
+    else:
+        frame_lengths = [logits.shape[1]] * logits.shape[0]
+
+    log_probs = torch.log_softmax(logits.float(), dim=-1)
+    return [lp[:length] for lp, length in zip(log_probs, frame_lengths)]
+
+
+def transcribe_batch(processor, model, speech_arrays, sample_rate=16000):
+    """
+    Transcrit un lot d'audios en une seule passe du modèle (décodage CTC glouton).
+    """
+    batch = batch_log_probs(processor, model, speech_arrays, sample_rate)
+    with timed("decodage_ctc"):
+        return [processor.decode(torch.argmax(log_probs, dim=-1)) for log_probs in batch]
+
+
+def transcribe_batch_vad(processor, model, speech_arrays, sample_rate=16000, vad=None):
+    """
+    Comme transcribe_batch, mais seuls les segments de parole détectés par vad
+    (voir VoiceActivityDetector) passent par le modèle, tous dans le même lot ;
+    les transcriptions des segments d'un même audio sont ensuite réunies.
+    """
+    if vad is None:
+        return transcribe_batch(processor, model, speech_arrays, sample_rate)
+
+    segments, owners = [], []
+    for i, speech_array in enumerate(speech_arrays):
+        for segment in vad.segments(speech_array, sample_rate):
+            segments.append(segment)
+            owners.append(i)
+
+    parts = [[] for _ in speech_arrays]
+    for owner, text in zip(owners, transcribe_batch(processor, model, segments, sample_rate)):
+        if text.strip():
+            parts[owner].append(text.strip())
+    return [" ".join(p) for p in parts]
+
+
+def transcribe_batch_log_probs(processor, model, speech_arrays, sample_rate=16000, vad=None):
+    """
+    Comme transcribe_batch_vad, mais renvoie aussi les log-probabilités de
+    chaque audio (float16, trames x vocabulaire ; segments de parole mis bout
+    à bout avec un VAD), pour re-décoder ou re-noter plus tard sans le modèle.
+    Renvoie une liste de (transcription, log-probabilités, segments), où
+    segments donne pour chaque segment [première trame, début (s), fin (s)]
+    dans l'audio d'origine (voir LogitStore.save).
+    """
+    pieces = []  # (audio, début en échantillons, segment)
+    for i, speech_array in enumerate(speech_arrays):
+        if vad is None:
+            pieces.append((i, 0, speech_array))
+        else:
+            pieces.extend((i, start, segment) for start, segment in vad.segments_with_offsets(speech_array, sample_rate))
+
+    batch = batch_log_probs(processor, model, [segment for _, _, segment in pieces], sample_rate)
+    with timed("decodage_ctc"):
+        texts = [processor.decode(torch.argmax(log_probs, dim=-1)) for log_probs in batch]
+
+    vocab_size = batch[0].shape[-1] if batch else model.config.vocab_size
+    parts = [[] for _ in speech_arrays]
+    frames = [[] for _ in speech_arrays]
+    segments = [[] for _ in speech_arrays]
+    for (owner, start, segment), text, log_probs in zip(pieces, texts, batch):
+        if vad is None:
+            parts[owner].append(text)
+        elif text.strip():
+            parts[owner].append(text.strip())
+        segments[owner].append(segment_bounds(sum(len(f) for f in frames[owner]), start, len(segment), sample_rate))
+        frames[owner].append(log_probs.numpy().astype(np.float16))
+    return [
+        (" ".join(p), np.concatenate(f) if f else np.zeros((0, vocab_size), dtype=np.float16), b)
+        for p, f, b in zip(parts, frames, segments)
+    ]
+
+
+def segment_bounds(first_frame, start, length, sample_rate=16000):
+    """
+    [première trame, début (s), fin (s)] d'un segment dont les trames suivent
+    celles des segments précédents du même audio (start, length : échantillons).
+    """
+    return [int(first_frame), start / sample_rate, (start + length) / sample_rate]
+
+
+def ctc_confidence(log_probs, blank_id=0):
+    """
+    Confiance d'une transcription CTC gloutonne : probabilité moyenne du
+    symbole retenu sur les trames non blanches (0 si tout est blanc).
+    """
+    log_probs = np.asarray(log_probs, dtype=np.float32)
+    if len(log_probs) == 0:
+        return 0.0
+    speech = log_probs.argmax(-1) != blank_id
+    if not speech.any():
+        return 0.0
+    return float(np.exp(log_probs.max(-1)[speech]).mean())
+
+
+def transcribe_batch_cached(processor, model, speech_arrays, sample_rate=16000, cache=None, model_key="", vad=None):
+    """
+    Comme transcribe_batch, mais consulte d'abord le cache des transcriptions
+    (voir TranscriptionCache) : seuls les audios absents du cache passent par le modèle.
+    """
+    if cache is None:
+        return transcribe_batch_vad(processor, model, speech_arrays, sample_rate, vad)
+
+    keys = [cache.key(speech_array, model_key, sample_rate) for speech_array in speech_arrays]
+    transcriptions = [cache.get(key) for key in keys]
+    missing = [i for i, transcription in enumerate(transcriptions) if transcription is None]
+
+    if missing:
+        computed = transcribe_batch_vad(processor, model, [speech_arrays[i] for i in missing], sample_rate, vad)
+        for i, transcription in zip(missing, computed):
+            cache.put(keys[i], transcription)
+            transcriptions[i] = transcription
+    return transcriptions
@@ -0,0 +1,266 @@
+import queue
+import logging
+import sqlite3
+import threading
+import time
+from metrics import timed
+
+logger = logging.getLogger(__name__)
+
+# Tables d'origine : "record" pour l'arabe, "recorder" pour le français.
+# Table et colonne de langue de chaque langue : clés "table" et "colonne_langue"
+# de speech_engine.LANGUES (voir tables_of) ; TABLES sert par défaut.
+TABLES = {
+    "ar": ("record", "language"),
+    "fr": ("recorder", "langue"),
+}
+
+WORD_STATS_COLUMNS = ("mots_corrects", "mots_manquants", "mots_supplementaires")
+
+
+def tables_of(langues):
+    """
+    Table et colonne de langue de chaque langue configurée (voir load_languages).
+    """
+    return {code: (config["table"], config["colonne_langue"]) for code, config in langues.items()}
+
+
+class ConnectionPool:
+    """
+    Pool de connexions réutilisables (MySQL ou SQLite) : une connexion est
+    empruntée le temps d'une transaction au lieu d'être ouverte à chaque requête.
+    validate(conn) est appelée à chaque emprunt d'une connexion déjà ouverte :
+    si elle échoue (connexion coupée par le serveur, wait_timeout), la
+    connexion est fermée et remplacée par une nouvelle.
+    """
+
+    def __init__(self, connect, size=4, validate=None):
+        self._connect = connect
+        self._validate = validate
+        self._pool = queue.LifoQueue(maxsize=size)
+        for _ in range(size):
+            self._pool.put(None)  # connexions ouvertes à la première utilisation
+
+    def acquire(self):
+        conn = self._pool.get()
+        if conn is not None and self._validate is not None:
+            try:
+                self._validate(conn)
+            except Exception as e:
+                logger.info("Connexion invalide remplacée : %s", e)
+                try:
+                    conn.close()
+                except Exception:
+                    pass
+                conn = None
+        if conn is None:
+            try:
+                conn = self._connect()
+            except Exception:
+                self._pool.put(None)  # la place reste disponible pour un prochain essai
+                raise
+        return conn
+
+    def release(self, conn, broken=False):
+        if broken and conn is not None:
+            # Annulation explicite : fermer une connexion dont un curseur est
+            # encore ouvert ne libère pas toujours ses verrous (SQLite)
+            for cleanup in (conn.rollback, conn.close):
+                try:
+                    cleanup()
+                except Exception:
+                    pass
+            conn = None
+        self._pool.put(conn)
+
+    def close(self):
+        while not self._pool.empty():
+            conn = self._pool.get_nowait()
+            if conn is not None:
+                conn.close()
+
+
+def mysql_pool(size=4, **kwargs):
+    import mysql.connector
+    # ping(reconnect=True) rouvre sur place une connexion coupée par le serveur
+    return ConnectionPool(lambda: mysql.connector.connect(**kwargs), size,
+                          validate=lambda conn: conn.ping(reconnect=True, attempts=1, delay=0))
+
+
+def sqlite_pool(path, size=1, tables=TABLES):
+    """
+    Base SQLite locale (développement, tests) avec les mêmes tables que MySQL.
+    """
+    def connect():
+        conn = sqlite3.connect(path, check_same_thread=False)
+        for table, lang_column in set(tables.values()):
+            conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {table} ("
+                f"id INTEGER PRIMARY KEY AUTOINCREMENT, {lang_column} TEXT, audio_path TEXT, "
+                f"similarity REAL, feedback TEXT, mots_corrects INTEGER, "
+                f"mots_manquants INTEGER, mots_supplementaires INTEGER)"
+            )
+        conn.commit()
+        return conn
+    return ConnectionPool(connect, size, validate=lambda conn: conn.execute("SELECT 1"))
+
+
+class EvaluationWriter:
+    """
+    Enregistrement asynchrone des évaluations.
+    Les requêtes déposent leur enregistrement dans une file et répondent
+    immédiatement ; un thread d'arrière-plan regroupe les enregistrements
+    (jusqu'à max_batch, ou toutes les flush_interval_s secondes) et les insère
+    en une seule transaction multi-lignes. Un lot dont la transaction échoue
+    est réessayé jusqu'à max_retries fois, après retry_backoff_s secondes
+    doublées à chaque essai ; il n'est abandonné (et compté comme perdu)
+    qu'ensuite.
+    """
+
+    def __init__(self, pool, placeholder="%s", word_stats=True, max_batch=50, flush_interval_s=0.5, analytics=None,
+                 max_retries=5, retry_backoff_s=0.5, tables=TABLES):
+        """
+        analytics : AnalyticsStore optionnel, dont les agrégats sont mis à jour
+        dans la même transaction que les évaluations.
+        tables : {langue: (table, colonne de langue)} (voir tables_of).
+        """
+        self.pool = pool
+        self.tables = dict(tables)
+        self.placeholder = placeholder
+        self.word_stats = word_stats
+        self.analytics = analytics
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval_s
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff_s
+
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._written = 0
+        self._batches = 0
+        self._errors = 0
+        self._retries = 0
+        self._lost = 0
+        self._last_error = None
+
+        self._thread = threading.Thread(target=self._loop, name="evaluation-writer", daemon=True)
+        self._thread.start()
+
+    def enregistrer(self, langue, audio_path, similarity, feedback, report=None):
+        """
+        Ajoute une évaluation à la file d'écriture (non bloquant).
+        ValueError si la langue n'a pas de table d'enregistrement.
+        """
+        if langue not in self.tables:
+            raise ValueError(f"Langue sans table d'enregistrement : {langue}")
+        report = report or {}
+        # Agrégats par texte : seulement si le rapport porte le texte cible
+        aggregate = None
+        if self.analytics is not None and "texte_original" in report:
+            aggregate = self.analytics.row(None, langue, report["texte_original"], similarity, report)
+        self._queue.put((
+            langue, audio_path, similarity, feedback,
+            report.get("mots_communs"), report.get("mots_manquants"), report.get("mots_supplementaires"),
+            aggregate,
+        ))
+
+    def _query(self, langue):
+        table, lang_column = self.tables[langue]
+        columns = [lang_column, "audio_path", "similarity", "feedback"]
+        if self.word_stats:
+            columns += WORD_STATS_COLUMNS
+        values = ", ".join([self.placeholder] * len(columns))
+        return f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({values})", len(columns)
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, rows):
+        """
+        Insère un lot en une transaction. Renvoie False en cas d'échec : la
+        transaction n'est pas validée et la connexion est écartée, le lot
+        peut donc être réessayé sans doublon.
+        """
+        conn = None
+        try:
+            with timed("insertion_bd", langue="tous"):
+                if self.analytics is not None:
+                    self.analytics.ensure_schema()
+                conn = self.pool.acquire()
+                cursor = conn.cursor()
+                for langue in self.tables:
+                    query, n_columns = self._query(langue)
+                    values = [r[:n_columns] for r in rows if r[0] == langue]
+                    if values:
+                        cursor.executemany(query, values)
+                if self.analytics is not None:
+                    aggregates = [r[7] for r in rows if r[7] is not None]
+                    if aggregates:
+                        self.analytics.apply(cursor, aggregates)
+                conn.commit()
+                cursor.close()
+        except Exception as e:
+            if conn is not None:
+                self.pool.release(conn, broken=True)
+            with self._lock:
+                self._errors += 1
+                self._last_error = str(e)
+            logger.warning("⚠️ Échec d'écriture de %d évaluation(s) : %s", len(rows), e)
+            return False
+        self.pool.release(conn)
+        with self._lock:
+            self._written += len(rows)
+            self._batches += 1
+        return True
+
+    def _write_with_retry(self, rows):
+        for attempt in range(self.max_retries + 1):
+            if self._write(rows):
+                return
+            if attempt < self.max_retries:
+                with self._lock:
+                    self._retries += 1
+                time.sleep(self.retry_backoff * 2 ** attempt)
+        with self._lock:
+            self._lost += len(rows)
+        logger.error("❌ %d évaluation(s) abandonnée(s) après %d essais", len(rows), self.max_retries + 1)
+
+    def _loop(self):
+        while True:
+            batch = self._collect()
+            self._write_with_retry(batch)
+            for _ in batch:
+                self._queue.task_done()
+
+    def flush(self):
+        """
+        Attend que toutes les évaluations en file soient écrites.
+        """
+        self._queue.join()
+
+    def close(self):
+        self.flush()
+        self.pool.close()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "ecrites": self._written,
+                "transactions": self._batches,
+                "lignes_par_transaction": (self._written / self._batches) if self._batches else 0.0,
+                "echecs": self._errors,
+                "reessais": self._retries,
+                "perdues": self._lost,
+                "derniere_erreur": self._last_error,
+                "en_attente": self._queue.qsize(),
+            }
@@ -0,0 +1,171 @@
+import numpy as np
+import torch
+from ctc_inference import batch_log_probs, segment_bounds
+from metrics import timed
+
+NEG_INF = -1e30
+
+
+def target_tokens(tokenizer, target_text, lowercase=False):
+    """
+    Découpe le texte cible en mots et en identifiants du vocabulaire CTC.
+    Les caractères absents du vocabulaire (ponctuation, diacritiques) sont ignorés.
+    Renvoie (mots, identifiants, index du mot de chaque identifiant).
+    """
+    vocab = tokenizer.get_vocab()
+    delimiter = vocab.get(tokenizer.word_delimiter_token)
+
+    words, ids, owners = [], [], []
+    for word in target_text.split():
+        if lowercase:
+            word = word.lower()
+        word_ids = [vocab[c] for c in word if c in vocab]
+        if not word_ids:
+            continue
+        if words and delimiter is not None:
+            ids.append(delimiter)
+            owners.append(-1)
+        ids.extend(word_ids)
+        owners.extend([len(words)] * len(word_ids))
+        words.append(word)
+    return words, ids, owners
+
+
+def viterbi_align(log_probs, tokens, blank_id):
+    """
+    Alignement forcé CTC : chemin le plus probable qui émet exactement `tokens`.
+    log_probs : tableau (trames x vocabulaire). Renvoie, pour chaque trame,
+    l'indice du token émis (ou -1 pour un blank), ou None si l'audio est trop court.
+    """
+    num_frames = log_probs.shape[0]
+    # Séquence étendue : blank, t1, blank, t2, ..., blank
+    extended = np.full(2 * len(tokens) + 1, blank_id, dtype=np.int64)
+    extended[1::2] = tokens
+    num_states = len(extended)
+
+    # Saut de deux états autorisé entre deux tokens différents (pas de blank obligatoire)
+    can_skip = np.zeros(num_states, dtype=bool)
+    can_skip[2:] = (extended[2:] != blank_id) & (extended[2:] != extended[:-2])
+
+    emissions = log_probs[:, extended]
+    scores = np.full(num_states, NEG_INF)
+    scores[:2] = emissions[0, :2]
+    backpointers = np.zeros((num_frames, num_states), dtype=np.int8)
+
+    for t in range(1, num_frames):
+        stay = scores
+        step = np.concatenate(([NEG_INF], scores[:-1]))
+        skip = np.where(can_skip, np.concatenate(([NEG_INF, NEG_INF], scores[:-2])), NEG_INF)
+        candidates = np.stack([stay, step, skip])
+        choice = candidates.argmax(axis=0)
+        backpointers[t] = choice
+        scores = candidates[choice, np.arange(num_states)] + emissions[t]
+
+    # Le chemin se termine sur le dernier token ou le blank final
+    last = num_states - 1 if num_states == 1 or scores[-1] >= scores[-2] else num_states - 2
+    if scores[last] <= NEG_INF / 2:
+        return None
+
+    path = np.empty(num_frames, dtype=np.int64)
+    state = last
+    for t in range(num_frames - 1, -1, -1):
+        path[t] = state
+        state -= backpointers[t, state]
+    if state < 0 or path[0] > 1:
+        return None
+    # État étendu -> indice du token (les états impairs sont les tokens)
+    return np.where(path % 2 == 1, path // 2, -1)
+
+
+def align_words(log_probs, tokenizer, target_text, frame_s, lowercase=False, frame_starts=None):
+    """
+    Aligne le texte cible sur l'audio et renvoie, pour chaque mot,
+    son début et sa fin (secondes) et une confiance (probabilité moyenne
+    des trames où ses caractères sont émis). None si l'alignement est impossible.
+    frame_starts : début de chaque trame dans l'audio d'origine (secondes), quand
+    les trames viennent de segments mis bout à bout ; sinon trame t = t * frame_s.
+    """
+    words, ids, owners = target_tokens(tokenizer, target_text, lowercase)
+    if not words:
+        return None
+
+    log_probs = log_probs.cpu().numpy() if isinstance(log_probs, torch.Tensor) else np.asarray(log_probs)
+    token_of_frame = viterbi_align(log_probs, np.asarray(ids), tokenizer.pad_token_id)
+    if token_of_frame is None:
+        return None
+
+    frames = [[] for _ in words]
+    frame_scores = [[] for _ in words]
+    for t, token in enumerate(token_of_frame):
+        if token < 0 or owners[token] < 0:
+            continue
+        frames[owners[token]].append(t)
+        frame_scores[owners[token]].append(log_probs[t, ids[token]])
+
+    if frame_starts is None:
+        frame_starts = np.arange(len(log_probs)) * frame_s
+    return [
+        {
+            "mot": word,
+            "debut": round(float(frame_starts[f[0]]), 2),
+            "fin": round(float(frame_starts[f[-1]] + frame_s), 2),
+            "confiance": round(float(np.exp(np.mean(scores))), 3),
+        }
+        for word, f, scores in zip(words, frames, frame_scores)
+    ]
+
+
+def transcribe_batch_aligned(processor, model, items, sample_rate=16000, lowercase=False, return_log_probs=False,
+                             vad=None):
+    """
+    Décodage guidé par le texte cible, pour un lot de (audio, texte cible) :
+    une seule passe du modèle donne la transcription gloutonne et
+    l'alignement forcé mot à mot (voir align_words) de chaque audio.
+    vad : comme transcribe_batch_vad, seuls les segments de parole passent par
+    le modèle ; transcription et alignement portent alors sur les mêmes trames
+    (segments mis bout à bout), les temps restant ceux de l'audio d'origine.
+    return_log_probs : ajoute à chaque résultat les log-probabilités (float16)
+    et leurs segments (voir ctc_inference.transcribe_batch_log_probs).
+    """
+    pieces = []  # (audio, début en échantillons, segment)
+    for i, (speech_array, _) in enumerate(items):
+        if vad is None:
+            pieces.append((i, 0, speech_array))
+        else:
+            pieces.extend((i, start, segment) for start, segment in vad.segments_with_offsets(speech_array, sample_rate))
+
+    batch = batch_log_probs(processor, model, [segment for _, _, segment in pieces], sample_rate)
+    parts = [[] for _ in items]
+    frames = [[] for _ in items]
+    frame_starts = [[] for _ in items]
+    segments = [[] for _ in items]
+    durations = [0] * len(items)
+    for (owner, start, segment), log_probs in zip(pieces, batch):
+        with timed("decodage_ctc"):
+            text = processor.decode(torch.argmax(log_probs, dim=-1))
+        if vad is None:
+            parts[owner].append(text)
+        elif text.strip():
+            parts[owner].append(text.strip())
+        frame_s = len(segment) / sample_rate / max(log_probs.shape[0], 1)
+        segments[owner].append(segment_bounds(sum(len(f) for f in frames[owner]), start, len(segment), sample_rate))
+        frames[owner].append(log_probs)
+        durations[owner] += len(segment)
+        frame_starts[owner].append(start / sample_rate + np.arange(log_probs.shape[0]) * frame_s)
+
+    vocab_size = batch[0].shape[-1] if batch else model.config.vocab_size
+    results = []
+    for (_, target_text), p, f, starts, duration, bounds in zip(items, parts, frames, frame_starts, durations,
+                                                                segments):
+        log_probs = torch.cat(f) if f else torch.zeros((0, vocab_size))
+        words = None
+        if len(log_probs):
+            frame_s = duration / sample_rate / len(log_probs)
+            with timed("alignement_force"):
+                words = align_words(log_probs, processor.tokenizer, target_text, frame_s, lowercase,
+                                    np.concatenate(starts))
+        if return_log_probs:
+            results.append((" ".join(p), words, log_probs.numpy().astype(np.float16), bounds))
+        else:
+            results.append((" ".join(p), words))
+    return results
@@ -1,25 +1,20 @@
-import torch
-import librosa
-import os
-from transformers import Wav2Vec2ForCTC, Wav2Vec2Processor
+from speech_engine import LANGUES, SpeechProcessor
 
-class FrenchAudioProcessor:
-    def __init__(self):
-        print("🔤 Chargement du modèle français...")
-        self.processor = Wav2Vec2Processor.from_pretrained("jonatasgrosman/wav2vec2-large-xlsr-53-french")
-        self.model = Wav2Vec2ForCTC.from_pretrained("jonatasgrosman/wav2vec2-large-xlsr-53-french")
-        print("✅ Modèle chargé.")
+class FrenchAudioProcessor(SpeechProcessor):
+    """
+    Reconnaissance vocale française : interface historique au-dessus de
+    SpeechProcessor (voir speech_engine).
+    """
 
-    def transcribe(self, audio_path, sample_rate=16000):
-        if not os.path.exists(audio_path):
-            raise FileNotFoundError(f"Fichier non trouvé : {audio_path}")
+    MODEL_ID = LANGUES["fr"]["modele"]
 
-        audio, _ = librosa.load(audio_path, sr=sample_rate)
-        inputs = self.processor(audio, sampling_rate=sample_rate, return_tensors="pt")
+    def __init__(self, backend=None, cache=None, vad=None):
+        super().__init__(self.MODEL_ID, "fr", postprocess=str.strip, lowercase_alignment=True,
+                         backend=backend, cache=cache, vad=vad)
 
-        with torch.no_grad():
-            logits = self.model(inputs.input_values).logits
-
-        predicted_ids = torch.argmax(logits, dim=-1)
-        transcription = self.processor.batch_decode(predicted_ids)[0]
-        return transcription.strip()
+    def transcribe_stream(self, audio_path, sample_rate=16000, chunk_length_s=20.0, stride_length_s=4.0):
+        """
+        Transcription en flux par fenêtres avec recouvrement (mémoire bornée).
+        Génère les transcriptions partielles, la dernière étant complète.
+        """
+        return super().transcribe_stream(audio_path, sample_rate, True, chunk_length_s, stride_length_s)
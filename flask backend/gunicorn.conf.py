@@ -0,0 +1,26 @@
+# Configuration de production : gunicorn -c gunicorn.conf.py app:app
+# Un seul processus HTTP à threads (gthread) : les threads ne font qu'attendre
+# les résultats du pool d'inférence (ASR_WORKERS processus), ils ne bloquent
+# donc pas le serveur pendant une passe du modèle. gthread gère aussi /ws/evaluate.
+import os
+
+bind = os.environ.get("BIND", "0.0.0.0:5000")
+workers = 1
+worker_class = "gthread"
+threads = int(os.environ.get("HTTP_THREADS", 32))
+timeout = int(float(os.environ.get("ASR_REQUEST_TIMEOUT_S", 60))) + 30
+graceful_timeout = 30
+
+# Le pool d'inférence est créé dans le worker HTTP, pas dans le maître. Les
+# modèles ne sont chargés que dans les workers d'inférence (spawn, une copie
+# des poids par worker) : précharger l'application ne partagerait rien.
+preload_app = False
+
+raw_env = [
+    f"ASR_WORKERS={os.environ.get('ASR_WORKERS', 2)}",
+    "FLASK_DEBUG=0",
+]
+
+
+def on_starting(server):
+    os.makedirs("audios", exist_ok=True)
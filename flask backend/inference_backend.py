@@ -0,0 +1,165 @@
+import os
+import logging
+import sys
+import difflib
+from types import SimpleNamespace
+import numpy as np
+import torch
+from transformers import Wav2Vec2Config, Wav2Vec2ForCTC
+
+logger = logging.getLogger(__name__)
+
+try:
+    import onnxruntime
+except ImportError:
+    onnxruntime = None
+
+# Moteurs d'inférence disponibles :
+# - torch : PyTorch fp32 (comportement d'origine)
+# - int8  : PyTorch avec quantification dynamique int8 des couches linéaires
+# - onnx  : graphe exporté une fois puis exécuté par ONNX Runtime
+BACKENDS = ("torch", "int8", "onnx")
+DEFAULT_BACKEND = os.environ.get("ASR_BACKEND", "torch")
+ONNX_CACHE_DIR = os.environ.get("ASR_ONNX_DIR", "onnx_models")
+
+
+class _LogitsOnly(torch.nn.Module):
+    # Export ONNX : le graphe ne renvoie que les logits (pas de ModelOutput)
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def forward(self, input_values, attention_mask):
+        return self.model(input_values, attention_mask=attention_mask).logits
+
+
+class OnnxCTCModel:
+    """
+    Modèle CTC exécuté par ONNX Runtime, utilisable à la place de
+    Wav2Vec2ForCTC dans transcribe_batch et ChunkedCTCDecoder :
+    model(input_values, attention_mask=...).logits renvoie un tenseur torch.
+    """
+
+    def __init__(self, onnx_path, config, num_threads=None):
+        if onnxruntime is None:
+            raise ImportError("onnxruntime n'est pas installé (moteur 'onnx' indisponible)")
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self.session = onnxruntime.InferenceSession(onnx_path, options, providers=["CPUExecutionProvider"])
+        self.config = config
+
+    def __call__(self, input_values, attention_mask=None):
+        if attention_mask is None:
+            attention_mask = torch.ones(input_values.shape, dtype=torch.long)
+        logits = self.session.run(["logits"], {
+            "input_values": input_values.numpy().astype(np.float32),
+            "attention_mask": attention_mask.numpy().astype(np.int64),
+        })[0]
+        return SimpleNamespace(logits=torch.from_numpy(logits))
+
+    def _get_feat_extract_output_lengths(self, input_lengths):
+        # Même calcul que Wav2Vec2PreTrainedModel : une couche conv après l'autre
+        for kernel, stride in zip(self.config.conv_kernel, self.config.conv_stride):
+            input_lengths = torch.div(input_lengths - kernel, stride, rounding_mode="floor") + 1
+        return input_lengths
+
+
+def onnx_path_for(model_id, cache_dir=ONNX_CACHE_DIR):
+    return os.path.join(cache_dir, model_id.replace("/", "__") + ".onnx")
+
+
+def export_onnx(model, onnx_path, sample_rate=16000):
+    """
+    Exporte le modèle en ONNX (axes dynamiques : lot et durée).
+    """
+    os.makedirs(os.path.dirname(onnx_path) or ".", exist_ok=True)
+    model.eval()
+    dummy = torch.zeros(1, sample_rate, dtype=torch.float32)
+    mask = torch.ones(1, sample_rate, dtype=torch.long)
+    torch.onnx.export(
+        _LogitsOnly(model), (dummy, mask), onnx_path,
+        input_names=["input_values", "attention_mask"],
+        output_names=["logits"],
+        dynamic_axes={
+            "input_values": {0: "batch", 1: "samples"},
+            "attention_mask": {0: "batch", 1: "samples"},
+            "logits": {0: "batch", 1: "frames"},
+        },
+        opset_version=14,
+    )
+
+
+def load_ctc_model(model_id, backend=None):
+    """
+    Charge un modèle CTC avec le moteur demandé.
+    Pour 'onnx', l'export n'a lieu qu'une fois : les chargements suivants
+    lisent le graphe en cache sans charger les poids PyTorch.
+    """
+    backend = backend or DEFAULT_BACKEND
+    if backend not in BACKENDS:
+        raise ValueError(f"Moteur d'inférence inconnu : {backend} (choix : {', '.join(BACKENDS)})")
+
+    if backend == "onnx":
+        onnx_path = onnx_path_for(model_id)
+        if not os.path.exists(onnx_path):
+            logger.info("Export ONNX de %s vers %s...", model_id, onnx_path)
+            export_onnx(Wav2Vec2ForCTC.from_pretrained(model_id), onnx_path)
+        return OnnxCTCModel(onnx_path, Wav2Vec2Config.from_pretrained(model_id))
+
+    model = Wav2Vec2ForCTC.from_pretrained(model_id)
+    model.eval()
+    if backend == "int8":
+        model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    return model
+
+
+def parity_report(processor, reference_model, candidate_model, speech_arrays, sample_rate=16000):
+    """
+    Compare les transcriptions d'un moteur à celles du modèle fp32 de référence.
+    Renvoie la similarité (difflib, en %) par audio et la moyenne.
+    """
+    from ctc_inference import transcribe_batch
+
+    details = []
+    for speech_array in speech_arrays:
+        reference = transcribe_batch(processor, reference_model, [speech_array], sample_rate)[0]
+        candidate = transcribe_batch(processor, candidate_model, [speech_array], sample_rate)[0]
+        details.append({
+            "reference": reference,
+            "candidat": candidate,
+            "similarite_pourcentage": difflib.SequenceMatcher(None, reference, candidate).ratio() * 100,
+            "identique": reference == candidate,
+        })
+
+    scores = [d["similarite_pourcentage"] for d in details]
+    return {
+        "similarite_moyenne": (sum(scores) / len(scores)) if scores else 100.0,
+        "identiques": sum(d["identique"] for d in details),
+        "total": len(details),
+        "details": details,
+    }
+
+
+if __name__ == "__main__":
+    # Vérification de parité : python inference_backend.py ar|fr int8|onnx audio1 [audio2 ...]
+    from speech_engine import SpeechEngine
+
+    if len(sys.argv) < 4:
+        print("Usage : python inference_backend.py ar|fr int8|onnx audio1 [audio2 ...]")
+        sys.exit(1)
+
+    langue, backend, audio_paths = sys.argv[1], sys.argv[2], sys.argv[3:]
+    reference = SpeechEngine(backend="torch").get(langue)
+    candidate = load_ctc_model(reference.model_id, backend)
+    speech_arrays = [reference.load_audio(path) for path in audio_paths]
+    report = parity_report(reference.processor, reference.model, candidate, speech_arrays)
+
+    for path, detail in zip(audio_paths, report["details"]):
+        print(f"{path} : {detail['similarite_pourcentage']:.2f}%")
+        if not detail["identique"]:
+            print(f"  fp32    : {detail['reference']}")
+            print(f"  {backend:<7} : {detail['candidat']}")
+    print(f"Similarité moyenne : {report['similarite_moyenne']:.2f}% "
+          f"({report['identiques']}/{report['total']} identiques)")
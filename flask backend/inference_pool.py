@@ -0,0 +1,186 @@
+import os
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from metrics import current_trace, start_trace
+from transcription_cache import TranscriptionCache
+from vad import VoiceActivityDetector
+
+logger = logging.getLogger(__name__)
+
+# Moteur de reconnaissance propre à chaque processus worker
+_worker_engine = None
+
+
+def _core_groups(num_workers):
+    """
+    Répartit les cœurs disponibles en blocs contigus, un par worker.
+    """
+    if hasattr(os, "sched_getaffinity"):
+        cores = sorted(os.sched_getaffinity(0))
+    else:
+        cores = list(range(os.cpu_count() or 1))
+    size = max(1, len(cores) // num_workers)
+    return [cores[(i * size) % len(cores):(i * size) % len(cores) + size] for i in range(num_workers)]
+
+
+def _init_worker(core_groups, num_threads, counter, cache_kwargs, preload, vad_kwargs=None,
+                 shared=None, engine_kwargs=None):
+    global _worker_engine
+    import torch
+    from speech_engine import SpeechEngine
+
+    # Chaque worker prend le bloc de cœurs suivant
+    with counter.get_lock():
+        index = counter.value
+        counter.value += 1
+    cores = core_groups[index % len(core_groups)]
+    if hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cores)
+    torch.set_num_threads(num_threads or len(cores))
+    torch.set_num_interop_threads(1)
+
+    cache = TranscriptionCache(**cache_kwargs) if cache_kwargs is not None else None
+    vad = VoiceActivityDetector(**vad_kwargs) if vad_kwargs is not None else None
+    _worker_engine = SpeechEngine(cache=cache, vad=vad, **(engine_kwargs or {}))
+    # Modèles dont les poids sont en mémoire partagée avec le processus HTTP : aucune copie
+    _worker_engine.adopt(shared or {})
+    _worker_engine.preload(preload)
+
+
+def _traced(fn, *args):
+    # Étapes mesurées dans le worker, renvoyées avec le résultat pour la trace de profilage
+    trace = start_trace()
+    return fn(*args), trace
+
+
+def _transcribe_batch(langue, speech_arrays):
+    return _worker_engine.transcribe_batch(langue, speech_arrays)
+
+
+def _transcribe_batch_aligned(langue, items, return_log_probs=False):
+    return _worker_engine.transcribe_batch_aligned(langue, items, return_log_probs)
+
+
+def _transcribe_batch_log_probs(langue, speech_arrays):
+    return _worker_engine.transcribe_batch_log_probs(langue, speech_arrays)
+
+
+def _transcribe_batch_cascade(langue, items, aligned=False):
+    return _worker_engine.transcribe_batch_cascade(langue, items, aligned)
+
+
+def _transcribe_windows(langue, windows):
+    return _worker_engine.transcribe_windows(langue, windows)
+
+
+class InferencePool:
+    """
+    Pool borné de processus d'inférence.
+    Chaque worker est épinglé sur son propre bloc de cœurs avec un nombre de
+    threads torch adapté. Les modèles de shared (voir
+    SpeechEngine.share_weights) sont transmis avec leurs poids en mémoire
+    partagée : une seule copie pour tous les workers. Les autres sont chargés
+    par chaque worker. Le processus HTTP ne fait qu'attendre les résultats :
+    une longue passe du modèle ne bloque plus les autres requêtes.
+    """
+
+    def __init__(self, num_workers=2, threads_per_worker=None, cache_kwargs=None, preload=(), vad_kwargs=None,
+                 shared=None, engine_kwargs=None, timeout_s=None):
+        """
+        timeout_s : attente maximale du résultat d'un lot (None = illimitée) ;
+        au-delà, concurrent.futures.TimeoutError remonte à l'appelant.
+        """
+        self.num_workers = num_workers
+        self.timeout_s = timeout_s
+        # spawn : pas de fork d'un processus qui a déjà des threads (batchers, torch).
+        # Le contexte de torch.multiprocessing transmet les tenseurs partagés
+        # par descripteur de fichier au lieu de les copier.
+        if shared:
+            import torch.multiprocessing
+            self._ctx = torch.multiprocessing.get_context("spawn")
+        else:
+            self._ctx = multiprocessing.get_context("spawn")
+        self._initargs = (_core_groups(num_workers), threads_per_worker, self._ctx.Value("i", 0),
+                          cache_kwargs, list(preload), vad_kwargs, shared or {}, engine_kwargs)
+        self._lock = threading.Lock()
+        self._restarts = 0
+        self._executor = self._start()
+
+    def _start(self):
+        return ProcessPoolExecutor(
+            max_workers=self.num_workers,
+            mp_context=self._ctx,
+            initializer=_init_worker,
+            initargs=self._initargs,
+        )
+
+    def _restart(self, broken):
+        # Un seul appelant recrée le pool ; les autres reprennent le nouveau
+        with self._lock:
+            if self._executor is broken:
+                broken.shutdown(wait=False, cancel_futures=True)
+                self._executor = self._start()
+                self._restarts += 1
+                logger.warning("⚠️ Pool d'inférence recréé (worker arrêté brutalement).")
+
+    def _call(self, fn, *args):
+        """
+        Exécute fn dans un worker (bloquant pour l'appelant uniquement). Si le
+        pool est cassé (worker tué, ex. par le noyau faute de mémoire), il est
+        recréé et le lot réessayé une fois ; un second échec remonte
+        (BrokenProcessPool) et fait échouer le lot. Si une trace de profilage
+        est active, les étapes mesurées dans le worker y sont ajoutées.
+        """
+        trace = current_trace.get()
+        for attempt in range(2):
+            executor = self._executor
+            try:
+                if trace is None:
+                    return executor.submit(fn, *args).result(timeout=self.timeout_s)
+                result, stages = executor.submit(_traced, fn, *args).result(timeout=self.timeout_s)
+                trace.extend(stages)
+                return result
+            except BrokenProcessPool:
+                if attempt:
+                    raise
+                self._restart(executor)
+
+    def transcribe_batch(self, langue, speech_arrays):
+        """
+        Transcrit un lot dans un worker.
+        """
+        return self._call(_transcribe_batch, langue, list(speech_arrays))
+
+    def transcribe_batch_aligned(self, langue, items, return_log_probs=False):
+        """
+        Décodage guidé par le texte cible dans un worker (voir forced_alignment).
+        """
+        return self._call(_transcribe_batch_aligned, langue, list(items), return_log_probs)
+
+    def transcribe_batch_log_probs(self, langue, speech_arrays):
+        """
+        Transcription avec log-probabilités (float16) dans un worker.
+        """
+        return self._call(_transcribe_batch_log_probs, langue, list(speech_arrays))
+
+    def transcribe_batch_cascade(self, langue, items, aligned=False):
+        """
+        Cascade modèle rapide / modèle complet dans un worker (voir SpeechEngine).
+        """
+        return self._call(_transcribe_batch_cascade, langue, list(items), aligned)
+
+    def transcribe_windows(self, langue, windows):
+        """
+        Fenêtres de lecture en direct dans un worker (voir SpeechProcessor.transcribe_windows).
+        """
+        return self._call(_transcribe_windows, langue, list(windows))
+
+    def stats(self):
+        with self._lock:
+            return {"workers": self.num_workers, "redemarrages": self._restarts}
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,204 @@
+import os
+import tempfile
+import numpy as np
+from audio_ingest import load_audio_file, decode_pcm16, StreamingDecoder
+from arabic_text_comparator import TextComparator
+from vad import MIN_SEGMENT_SAMPLES
+
+
+class LiveWindow:
+    """
+    Fenêtre de lecture en direct soumise à la file d'inférence : recouvrements
+    gauche et droit (en échantillons) dont les trames sont écartées, et
+    identifiants CTC déjà retenus pour la lecture (prefix), pour renvoyer la
+    transcription de toute la lecture jusqu'à cette fenêtre. Décodage glouton,
+    quel que soit le mode de décodage des lectures complètes.
+    """
+
+    __slots__ = ("audio", "left", "right", "prefix")
+
+    def __init__(self, audio, left=0, right=0, prefix=()):
+        self.audio = audio
+        self.left = left
+        self.right = right
+        self.prefix = prefix
+
+
+class LiveReadingSession:
+    """
+    Session de lecture en direct (WebSocket).
+    Le signal reçu est découpé comme par ChunkedCTCDecoder en fenêtres de
+    window_s secondes qui se recouvrent de stride_s secondes de chaque côté :
+    chaque fenêtre passe par transcribe_window (en pratique la file
+    d'inférence de la langue, voir app.py), qui ne garde que les trames hors
+    recouvrement ; un mot coupé au bord d'une fenêtre est lu entier dans la
+    voisine. Les identifiants retenus s'accumulent : à l'arrêt, seule la fin
+    du signal reste à décoder et la transcription finale est celle des
+    fenêtres (voir finish et transcription).
+    Avec pcm_rate, les morceaux sont du PCM 16 bits mono à cette fréquence
+    (pages en 16 kHz), convertis directement ; sinon ce sont des morceaux de
+    conteneur (MediaRecorder), décodés au fil de l'eau par StreamingDecoder
+    si PyAV est installé, en une fois à l'arrêt sinon.
+    """
+
+    def __init__(self, transcribe_window, target_text, remove_diacritics=False, suffix=".webm",
+                 sample_rate=16000, window_s=6.0, stride_s=1.0, profile=None, pcm_rate=None):
+        """
+        transcribe_window : fonction qui reçoit une LiveWindow et renvoie
+        (identifiants retenus, transcription), ou None si elle n'a pas pu être
+        traitée (file pleine, délai dépassé) ; la lecture devra alors être
+        réévaluée en entier à l'arrêt.
+        """
+        self.transcribe_window = transcribe_window
+        self.target_text = target_text
+        self.remove_diacritics = remove_diacritics
+        self.profile = profile
+        self.sample_rate = sample_rate
+        self.chunk_len = int(window_s * sample_rate)
+        self.stride = int(stride_s * sample_rate)
+        if self.chunk_len <= 2 * self.stride:
+            raise ValueError("window_s doit être supérieur à 2 * stride_s")
+        self.step = self.chunk_len - 2 * self.stride
+
+        # Mots du texte cible, pour comparer la transcription partielle au début du texte
+        default_profile = "ar_sans_diacritiques" if remove_diacritics else "base"
+        self.target_words = TextComparator.index(target_text, profile or default_profile).tokens
+
+        self.pcm_rate = pcm_rate
+        with tempfile.NamedTemporaryFile(delete=False, suffix=".pcm" if pcm_rate else suffix) as temp_audio:
+            self.audio_path = temp_audio.name
+        self._samples = []
+        self._received = 0
+        self._pcm_rest = b""
+        self._stream = None
+        if not pcm_rate and StreamingDecoder.available():
+            self._stream = StreamingDecoder(sample_rate)
+
+        # Début de la prochaine fenêtre, identifiants retenus et transcription courante
+        self._offset = 0
+        self._first = True
+        self._ids = []
+        self._text = ""
+        self.complete = True
+
+    def _append(self, samples):
+        if len(samples):
+            self._samples.append(samples)
+            self._received += len(samples)
+
+    def _append_pcm(self, data):
+        # Un échantillon peut être coupé entre deux morceaux : l'octet restant attend le suivant
+        data = self._pcm_rest + bytes(data)
+        usable = len(data) - len(data) % 2
+        self._pcm_rest = data[usable:]
+        if usable:
+            self._append(decode_pcm16(data[:usable], self.pcm_rate, self.sample_rate))
+
+    def _append_container(self, data):
+        # Sans PyAV, pas de partiels : le conteneur est décodé une fois, à l'arrêt
+        if self._stream is not None:
+            self._stream.feed(data)
+            self._append(self._stream.drain())
+
+    def _finish_container(self):
+        if self._stream is not None:
+            rest = self._stream.close()
+            self._stream = None
+            if rest is not None:
+                self._append(rest)
+                return
+        # Décodage incrémental indisponible ou en échec : fichier complet
+        try:
+            speech_array = load_audio_file(self.audio_path, self.sample_rate)
+        except Exception:
+            return  # conteneur illisible : signal vide ou partiel
+        self._samples = [speech_array]
+        self._received = len(speech_array)
+
+    def _run(self, window, left, right):
+        result = self.transcribe_window(LiveWindow(window, left, right, tuple(self._ids)))
+        if result is None:
+            self.complete = False
+            return False
+        ids, self._text = result
+        self._ids.extend(ids)
+        return True
+
+    @property
+    def speech_array(self):
+        """
+        Signal reçu jusqu'ici (sample_rate, mono).
+        """
+        if not self._samples:
+            return np.zeros(0, dtype=np.float32)
+        if len(self._samples) > 1:
+            self._samples = [np.concatenate(self._samples)]
+        return self._samples[0]
+
+    def add_chunk(self, data):
+        """
+        Ajoute un morceau audio et transcrit les fenêtres complètes. Renvoie un
+        message partiel (dict) si la transcription a progressé, sinon None.
+        """
+        with open(self.audio_path, "ab") as f:
+            f.write(data)
+        if self.pcm_rate:
+            self._append_pcm(data)
+        else:
+            self._append_container(data)
+
+        produced = False
+        while self._received - self._offset >= self.chunk_len:
+            window = self.speech_array[self._offset:self._offset + self.chunk_len]
+            produced |= self._run(window, 0 if self._first else self.stride, self.stride)
+            # La fenêtre suivante commence stride échantillons avant la fin de la zone conservée
+            self._offset += self.step
+            self._first = False
+
+        transcription = self._text.strip()
+        if not produced or not transcription:
+            return None
+        n_words = len(transcription.split())
+        target_prefix = " ".join(self.target_words[:max(n_words, 1)])
+        report = TextComparator.compare_texts(target_prefix, transcription,
+                                              remove_diacritics=self.remove_diacritics,
+                                              profile=self.profile)
+        return {
+            "type": "partiel",
+            "transcription": transcription,
+            "similarite": round(report["similarite_pourcentage"], 2),
+            "progression": round(100 * min(n_words, len(self.target_words)) / max(len(self.target_words), 1), 2),
+        }
+
+    def finish(self):
+        """
+        Termine la session : décode seulement la fin du signal (dernière
+        fenêtre, sans recouvrement à droite) et renvoie le signal complet.
+        """
+        if not self.pcm_rate:
+            self._finish_container()
+        speech_array = self.speech_array
+        tail = speech_array[self._offset:]
+        left = 0 if self._first else self.stride
+        if len(tail) > left and len(tail) >= MIN_SEGMENT_SAMPLES:
+            self._run(tail, left, 0)
+        self._offset = len(speech_array)
+        return speech_array
+
+    @property
+    def transcription(self):
+        """
+        Transcription de la lecture par ses fenêtres (après finish), ou None
+        si une fenêtre n'a pas pu être transcrite.
+        """
+        return self._text.strip() if self.complete else None
+
+    def discard(self):
+        """
+        Supprime le fichier temporaire.
+        """
+        if self._stream is not None:
+            self._stream.close(timeout=0)
+            self._stream = None
+        if os.path.exists(self.audio_path):
+            os.remove(self.audio_path)
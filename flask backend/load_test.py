@@ -0,0 +1,414 @@
+import os
+import sys
+import glob
+import json
+import time
+import logging
+import random
+import argparse
+import tempfile
+import threading
+import urllib.error
+import urllib.request
+import uuid
+import numpy as np
+from benchmark import ROOT, environnement, liste_entiers
+from audio_archive import MIME_ORIGINAL
+
+# Test de charge : une classe d'élèves virtuels lit en même temps les
+# enregistrements fournis (Audios/*.ogg, textes cibles de textes/) et les
+# envoie à /evaluate. Pour chaque niveau de concurrence : débit, latences
+# p50/p95/p99, taux d'erreur, puis le point de saturation.
+#   python load_test.py --etudiants 1,2,4,8,16,32 --arrivees rafale
+#   python load_test.py --url http://serveur:5000 --etudiants 8,16   (serveur déjà lancé)
+#   python load_test.py --mode direct --etudiants 4,8,16   (lecture en direct, /ws/evaluate)
+# Sans --url, l'application Flask est lancée dans ce processus avec un modèle
+# factice (latence simulée, voir ModeleFactice) et une base SQLite temporaire
+# à la place des tables MySQL record/recorder : la mesure porte sur tout le
+# reste du chemin (réception, décodage, micro-lots, comparaison, archive, base).
+# Ce chemin n'importe ni torch ni transformers (voir speech_engine).
+# Le mode direct envoie le PCM par morceaux au rythme de la lecture, comme les
+# pages : les fenêtres passent par ModeleFactice.transcribe_windows. Il demande
+# flask-sock (serveur) et simple-websocket (client).
+
+ARRIVEES = ("rafale", "etalee", "poisson")
+MODES = ("envoi", "direct")
+
+
+# 📂 Lectures rejouées
+def lectures_fournies(motif_audios, dossier_textes):
+    """
+    Triplets (nom de fichier, octets audio, texte cible) : texte de même nom que l'audio
+    dans dossier_textes, sinon le premier texte disponible.
+    """
+    textes = {}
+    for path in sorted(glob.glob(os.path.join(dossier_textes, "*.txt"))):
+        with open(path, encoding="utf-8") as f:
+            textes[os.path.splitext(os.path.basename(path))[0]] = f.read().strip()
+    if not textes:
+        raise FileNotFoundError(f"Aucun texte cible dans {dossier_textes}")
+
+    lectures = []
+    for path in sorted(glob.glob(motif_audios)):
+        nom = os.path.basename(path)
+        with open(path, "rb") as f:
+            lectures.append((nom, f.read(), textes.get(os.path.splitext(nom)[0], next(iter(textes.values())))))
+    if not lectures:
+        raise FileNotFoundError(f"Aucun audio : {motif_audios}")
+    return lectures
+
+
+def en_pcm(lectures):
+    # Même conversion que les pages : PCM 16 bits mono à 16 kHz (audio/L16)
+    from audio_ingest import decode_audio
+    return [(nom, (np.clip(decode_audio(data), -1, 1) * 32767).astype("<i2").tobytes(), texte)
+            for nom, data, texte in lectures]
+
+
+def multipart(audio, nom_fichier, type_audio, target_text):
+    boundary = uuid.uuid4().hex
+    body = (
+        f"--{boundary}\r\nContent-Disposition: form-data; name=\"target_text\"\r\n\r\n{target_text}\r\n"
+        f"--{boundary}\r\nContent-Disposition: form-data; name=\"audio\"; filename=\"{nom_fichier}\"\r\n"
+        f"Content-Type: {type_audio}\r\n\r\n"
+    ).encode("utf-8") + audio + f"\r\n--{boundary}--\r\n".encode("utf-8")
+    return body, f"multipart/form-data; boundary={boundary}"
+
+
+def langue_de_route(route):
+    # /evaluate (arabe), /evaluate-fr, /evaluate/<langue>
+    if route.rstrip("/").endswith("-fr"):
+        return "fr"
+    if route.startswith("/evaluate/"):
+        return route.rstrip("/").rsplit("/", 1)[1]
+    return "ar"
+
+
+# 🤖 Modèle factice
+class ModeleFactice:
+    """
+    Remplace un SpeechProcessor : pas de modèle chargé, une passe coûte
+    cout_lot_ms + cout_ms_par_s par seconde d'audio du lot, et une seule
+    passe s'exécute à la fois (comme un modèle occupant tous ses cœurs).
+    La transcription renvoyée est le texte de référence (celui de la première lecture).
+    """
+
+    def __init__(self, langue, reference, cout_ms_par_s, cout_lot_ms, postprocess=None):
+        self.langue = langue
+        self.model_id = f"factice-{langue}"
+        self.reference = reference
+        self.postprocess = postprocess
+        self.cout_ms_par_s = cout_ms_par_s
+        self.cout_lot_ms = cout_lot_ms
+        self._lock = threading.Lock()
+
+    def _passe(self, echantillons, sample_rate):
+        duree_s = echantillons / sample_rate
+        with self._lock:
+            time.sleep((self.cout_lot_ms + self.cout_ms_par_s * duree_s) / 1000)
+
+    def transcribe_batch(self, speech_arrays, sample_rate=16000, postprocess=True):
+        self._passe(sum(len(a) for a in speech_arrays), sample_rate)
+        return [self.reference] * len(speech_arrays)
+
+    def transcribe_batch_aligned(self, items, sample_rate=16000, postprocess=True, return_log_probs=False):
+        # Décodage cible : le texte lu est le texte cible, sans mots alignés
+        self._passe(sum(len(audio) for audio, _ in items), sample_rate)
+        return [(texte, None) for _, texte in items]
+
+    def transcribe_windows(self, windows, sample_rate=16000, postprocess=True):
+        # Lecture en direct : une trame retenue toutes les 20 ms, transcription de référence
+        self._passe(sum(len(w[0]) for w in windows), sample_rate)
+        return [([0] * (len(w[0]) // 320), self.reference) for w in windows]
+
+
+def lancer_application(lectures, args):
+    """
+    Importe app.py avec une configuration isolée (base SQLite, archive et
+    cache temporaires, pas de pool de workers, lecture en direct active en
+    mode direct), remplace les modèles par ModeleFactice et sert
+    l'application sur un port libre.
+    Renvoie (url, module app, serveur).
+    """
+    from werkzeug.serving import make_server
+
+    dossier = tempfile.mkdtemp(prefix="charge_")
+    os.environ.update({
+        "DB_BACKEND": "sqlite",
+        "DB_SQLITE_PATH": os.path.join(dossier, "evaluations.db"),
+        "ARCHIVE_DIR": os.path.join(dossier, "audios"),
+        "ASR_CACHE_DIR": "",
+        "ASR_WORKERS": "0",
+        "ASR_PRELOAD": "",
+        "ASR_LOGITS": "0",
+        "ASR_CASCADE": "0",
+        "ASR_LIVE": "1" if args.mode == "direct" else "0",
+        "PASSAGES_FILE": os.path.join(dossier, "passages.json"),
+        "LOG_LEVEL": os.environ.get("LOG_LEVEL", "WARNING"),
+    })
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import app as application
+    from speech_engine import POST_TRAITEMENTS
+    if args.mode == "direct" and application.sock is None:
+        raise SystemExit("Mode direct : flask-sock n'est pas installé (route /ws/evaluate absente)")
+
+    reference = lectures[0][2]
+    for langue, config in application.engine.langues.items():
+        modele = ModeleFactice(langue, reference, args.cout_ms_par_s, args.cout_lot_ms,
+                               POST_TRAITEMENTS[config.get("post_traitement", "aucun")])
+        application.engine.models.register(langue, lambda modele=modele: modele)
+
+    # Une ligne de journal par requête fausserait la mesure
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    serveur = make_server("127.0.0.1", 0, application.app, threaded=True)
+    threading.Thread(target=serveur.serve_forever, name="serveur-charge", daemon=True).start()
+    return f"http://127.0.0.1:{serveur.server_port}", application, serveur
+
+
+# 🧑‍🎓 Élèves virtuels
+def envoyer(url, requete, timeout_s):
+    """
+    Envoie une lecture ; renvoie (statut HTTP ou 0 si échec réseau, latence en s).
+    """
+    body, content_type = requete
+    req = urllib.request.Request(url, data=body, headers={"Content-Type": content_type})
+    started = time.perf_counter()
+    try:
+        with urllib.request.urlopen(req, timeout=timeout_s) as res:
+            res.read()
+            statut = res.status
+    except urllib.error.HTTPError as e:
+        statut = e.code
+    except (urllib.error.URLError, OSError):
+        statut = 0
+    return statut, time.perf_counter() - started
+
+
+def lire_en_direct(url, requete, args):
+    """
+    Lecture en direct (/ws/evaluate) : le PCM est envoyé par morceaux de
+    args.morceau_s secondes au rythme de la lecture (accéléré par args.cadence,
+    0 = sans attente), puis "stop". Renvoie (statut, latence en s), la latence
+    allant de "stop" au résultat final ; statut 200 (final), 429 (serveur
+    occupé), 500 (autre erreur) ou 0 (échec réseau ou délai dépassé).
+    """
+    import simple_websocket
+
+    pcm, texte = requete
+    taille = int(args.morceau_s * 16000) * 2
+    started = time.perf_counter()
+    try:
+        connect = getattr(simple_websocket.Client, "connect", simple_websocket.Client)
+        ws = connect(url)
+    except Exception:
+        return 0, time.perf_counter() - started
+    try:
+        ws.send(json.dumps({"target_text": texte, "langue": args.langue, "format": "pcm16", "frequence": 16000},
+                           ensure_ascii=False))
+        debut = time.perf_counter()
+        for i, offset in enumerate(range(0, len(pcm), taille)):
+            if args.cadence > 0:
+                # Un morceau n'existe qu'une fois sa durée enregistrée
+                time.sleep(max(0, debut + (i + 1) * args.morceau_s / args.cadence - time.perf_counter()))
+            ws.send(pcm[offset:offset + taille])
+        started = time.perf_counter()
+        ws.send(json.dumps({"type": "stop"}))
+        limite = started + args.timeout_s
+        while True:
+            # Les messages partiels reçus pendant l'envoi sont ignorés
+            message = ws.receive(timeout=max(0.0, limite - time.perf_counter()))
+            if message is None:
+                return 0, time.perf_counter() - started
+            reponse = json.loads(message)
+            if reponse.get("type") == "final":
+                return 200, time.perf_counter() - started
+            if reponse.get("type") == "erreur":
+                return (429 if reponse.get("occupe") else 500), time.perf_counter() - started
+    except (simple_websocket.ConnectionClosed, OSError):
+        return 0, time.perf_counter() - started
+    finally:
+        ws.close()
+
+
+def eleve(numero, etudiants, url, requetes, args, debut, fin, resultats, lock):
+    """
+    Boucle d'un élève : attend son arrivée, lit (envoie une lecture), fait une
+    pause, recommence jusqu'à la fin du palier. Les arrivées suivent args.arrivees :
+    rafale (toute la classe en même temps), etalee (arrivées régulières pendant
+    args.montee_s) ou poisson (arrivées et pauses de durée exponentielle).
+    """
+    rng = random.Random(args.graine * 1000 + numero)
+    if args.arrivees == "etalee":
+        arrivee = args.montee_s * numero / etudiants
+    elif args.arrivees == "poisson":
+        arrivee = rng.expovariate(1 / args.pause_s) if args.pause_s > 0 else 0
+    else:
+        arrivee = 0
+    time.sleep(max(0, debut + arrivee - time.perf_counter()))
+
+    while time.perf_counter() < fin:
+        requete = requetes[rng.randrange(len(requetes))]
+        if args.mode == "direct":
+            statut, latence = lire_en_direct(url, requete, args)
+        else:
+            statut, latence = envoyer(url, requete, args.timeout_s)
+        with lock:
+            resultats.append((statut, latence, time.perf_counter()))
+        if args.arrivees == "poisson" and args.pause_s > 0:
+            pause = rng.expovariate(1 / args.pause_s)
+        else:
+            pause = args.pause_s
+        time.sleep(pause)
+
+
+def attendre_files_vides(application, timeout_s):
+    # Lectures abandonnées (délai dépassé) encore en file : le palier suivant doit partir d'une file vide
+    limite = time.monotonic() + timeout_s
+    while time.monotonic() < limite and any(b.stats()["en_attente"] for b in application.batchers.values()):
+        time.sleep(0.1)
+
+
+def percentile_ms(latences, q):
+    return round(float(np.percentile(latences, q)) * 1000, 1) if len(latences) else None
+
+
+def palier(url, requetes, etudiants, args):
+    """
+    Fait lire `etudiants` élèves pendant args.duree_s secondes.
+    Les requêtes en cours à la fin du palier sont attendues et comptées.
+    """
+    resultats, lock = [], threading.Lock()
+    debut = time.perf_counter()
+    fin = debut + args.duree_s
+    threads = [threading.Thread(target=eleve, args=(i, etudiants, url, requetes, args, debut, fin, resultats, lock), daemon=True)
+               for i in range(etudiants)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    duree = max(max((t for _, _, t in resultats), default=fin), fin) - debut
+
+    ok = np.asarray([latence for statut, latence, _ in resultats if statut == 200])
+    statuts = {}
+    for statut, _, _ in resultats:
+        statuts[str(statut)] = statuts.get(str(statut), 0) + 1
+    return {
+        "etudiants": etudiants,
+        "requetes": len(resultats),
+        "reussies": int(len(ok)),
+        "taux_erreur": round(1 - len(ok) / len(resultats), 4) if resultats else 0.0,
+        "debit_par_s": round(len(ok) / duree, 3),
+        "p50_ms": percentile_ms(ok, 50),
+        "p95_ms": percentile_ms(ok, 95),
+        "p99_ms": percentile_ms(ok, 99),
+        "max_ms": round(float(ok.max()) * 1000, 1) if len(ok) else None,
+        "statuts": statuts,
+    }
+
+
+def point_de_saturation(paliers, slo_p95_ms, erreur_max, gain_min=0.05):
+    """
+    Dernier niveau de concurrence sain : au palier suivant, le débit ne
+    progresse plus d'au moins gain_min, le p95 dépasse slo_p95_ms ou le taux
+    d'erreur dépasse erreur_max. None si le premier palier est déjà saturé,
+    le dernier palier si aucun ne l'est.
+    """
+    sain = None
+    for mesure in paliers:
+        if mesure["taux_erreur"] > erreur_max:
+            raison = f"taux d'erreur {mesure['taux_erreur']:.1%} > {erreur_max:.1%}"
+        elif mesure["p95_ms"] is None or mesure["p95_ms"] > slo_p95_ms:
+            raison = f"p95 {mesure['p95_ms']} ms > {slo_p95_ms:g} ms"
+        elif sain is not None and mesure["debit_par_s"] < sain["debit_par_s"] * (1 + gain_min):
+            raison = f"débit plafonné ({mesure['debit_par_s']}/s contre {sain['debit_par_s']}/s)"
+        else:
+            sain = mesure
+            continue
+        return {"etudiants": sain["etudiants"] if sain else None, "debit_par_s": sain["debit_par_s"] if sain else None,
+                "sature_a": mesure["etudiants"], "raison": raison}
+    return {"etudiants": sain["etudiants"] if sain else None, "debit_par_s": sain["debit_par_s"] if sain else None,
+            "sature_a": None, "raison": "non atteint"}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Test de charge de /evaluate : une classe d'élèves virtuels.")
+    parser.add_argument("--url", help="serveur déjà lancé (sinon application locale avec modèle factice)")
+    parser.add_argument("--route", default="/evaluate", help="route d'évaluation (/evaluate, /evaluate-fr, /evaluate/<langue>)")
+    parser.add_argument("--mode", choices=MODES, default="envoi",
+                        help="envoi : lecture complète postée à --route ; direct : lecture en direct (/ws/evaluate)")
+    parser.add_argument("--langue", help="langue des lectures en direct (par défaut celle de --route)")
+    parser.add_argument("--morceau-s", type=float, default=1.0, help="mode direct : durée de chaque morceau envoyé")
+    parser.add_argument("--cadence", type=float, default=1.0,
+                        help="mode direct : vitesse d'envoi par rapport à la lecture (0 = sans attente)")
+    parser.add_argument("--etudiants", type=liste_entiers, default=[1, 2, 4, 8, 16, 32],
+                        help="niveaux de concurrence, un palier par niveau")
+    parser.add_argument("--arrivees", choices=ARRIVEES, default="rafale")
+    parser.add_argument("--duree-s", type=float, default=20, help="durée de chaque palier")
+    parser.add_argument("--montee-s", type=float, default=5, help="étalement des arrivées (arrivees=etalee)")
+    parser.add_argument("--pause-s", type=float, default=1.0, help="pause entre deux lectures d'un élève (moyenne pour poisson)")
+    parser.add_argument("--format", choices=("fichier", "pcm"), default="fichier",
+                        help="upload du fichier d'origine ou PCM 16 kHz comme les pages")
+    parser.add_argument("--audios", default=os.path.join(ROOT, "Audios", "*.ogg"))
+    parser.add_argument("--textes", default=os.path.join(ROOT, "textes"))
+    parser.add_argument("--cout-ms-par-s", type=float, default=150,
+                        help="modèle factice : calcul par seconde d'audio (ms)")
+    parser.add_argument("--cout-lot-ms", type=float, default=20, help="modèle factice : coût fixe d'une passe (ms)")
+    parser.add_argument("--slo-p95-ms", type=float, default=15000, help="p95 au-delà duquel le palier est saturé")
+    parser.add_argument("--erreur-max", type=float, default=0.01, help="taux d'erreur au-delà duquel le palier est saturé")
+    parser.add_argument("--timeout-s", type=float, default=120)
+    parser.add_argument("--graine", type=int, default=0)
+    parser.add_argument("--sortie", help="fichier JSON de résultats (sinon sortie standard)")
+    args = parser.parse_args()
+
+    lectures = lectures_fournies(args.audios, args.textes)
+    args.langue = args.langue or langue_de_route(args.route)
+    if args.mode == "direct":
+        # Comme les pages : PCM 16 kHz envoyé au fil de l'enregistrement
+        requetes = [(data, texte) for _, data, texte in en_pcm(lectures)]
+    elif args.format == "pcm":
+        requetes = [multipart(data, "recording.pcm", "audio/L16;rate=16000;channels=1", texte)
+                    for _, data, texte in en_pcm(lectures)]
+    else:
+        requetes = [multipart(data, nom, MIME_ORIGINAL.get(os.path.splitext(nom)[1][1:], "application/octet-stream"), texte)
+                    for nom, data, texte in lectures]
+
+    application = serveur = None
+    if args.url:
+        base = args.url.rstrip("/")
+    else:
+        base, application, serveur = lancer_application(lectures, args)
+    url = base.replace("http", "ws", 1) + "/ws/evaluate" if args.mode == "direct" else base + args.route
+
+    resultats = {"environnement": environnement(), "parametres": vars(args),
+                 "lectures": [nom for nom, _, _ in lectures], "paliers": []}
+    try:
+        for etudiants in args.etudiants:
+            print(f"🧑‍🎓 {etudiants} élève(s)...", file=sys.stderr)
+            mesure = palier(url, requetes, etudiants, args)
+            resultats["paliers"].append(mesure)
+            if application is not None:
+                attendre_files_vides(application, args.timeout_s)
+            print(f"   {mesure['debit_par_s']}/s, p50 {mesure['p50_ms']} ms, p95 {mesure['p95_ms']} ms, "
+                  f"p99 {mesure['p99_ms']} ms, erreurs {mesure['taux_erreur']:.1%}", file=sys.stderr)
+        resultats["point_de_saturation"] = point_de_saturation(resultats["paliers"], args.slo_p95_ms, args.erreur_max)
+
+        if application is not None:
+            # Évaluations effectivement écrites dans la base SQLite de remplacement
+            application.evaluation_writer.flush()
+            resultats["base"] = application.evaluation_writer.stats()
+            resultats["micro_lots"] = {langue: batcher.stats() for langue, batcher in application.batchers.items()}
+    finally:
+        if serveur is not None:
+            serveur.shutdown()
+
+    sortie = json.dumps(resultats, ensure_ascii=False, indent=2)
+    if args.sortie:
+        with open(args.sortie, "w", encoding="utf-8") as f:
+            f.write(sortie)
+        print(f"✅ Résultats écrits dans {args.sortie}", file=sys.stderr)
+    else:
+        print(sortie)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,149 @@
+import os
+import json
+import threading
+import numpy as np
+
+
+def model_slug(model_key):
+    return model_key.replace("/", "__").replace(":", "--")
+
+
+class LogitStore:
+    """
+    Log-probabilités CTC (trames x vocabulaire, float16) de chaque enregistrement,
+    un fichier .npy par enregistrement : <racine>/<modèle>/<id[:2]>/<id>.npy.
+    Les relectures se font en mmap (sans copie ni passage par le modèle) :
+    re-décodage, alignement sur un autre texte cible, autre normalisation...
+    Avec un VAD, les trames sont celles des segments de parole mis bout à
+    bout : leurs bornes ([première trame, début (s), fin (s)] dans l'audio
+    d'origine) sont écrites à côté, dans <id>.segments.json.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self._known_models = set()
+        self._lock = threading.Lock()
+        self._saved = 0
+        self._bytes = 0
+
+    def _model_dir(self, model_key, model_id=None):
+        directory = os.path.join(self.root, model_slug(model_key))
+        if model_key not in self._known_models:
+            os.makedirs(directory, exist_ok=True)
+            meta_path = os.path.join(directory, "modele.json")
+            if not os.path.exists(meta_path):
+                with open(meta_path, "w", encoding="utf-8") as f:
+                    json.dump({"model_key": model_key, "model_id": model_id or model_key.split(":")[0]}, f)
+            self._known_models.add(model_key)
+        return directory
+
+    def path(self, record_id, model_key):
+        return os.path.join(self.root, model_slug(model_key), record_id[:2], f"{record_id}.npy")
+
+    def segments_path(self, record_id, model_key):
+        return self.path(record_id, model_key)[:-len(".npy")] + ".segments.json"
+
+    def save(self, record_id, model_key, log_probs, model_id=None, segments=None):
+        """
+        Écrit les log-probabilités d'un enregistrement (remplacement atomique),
+        et les bornes de ses segments si elles sont données.
+        """
+        self._model_dir(model_key, model_id)
+        path = self.path(record_id, model_key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        array = np.ascontiguousarray(log_probs, dtype=np.float16)
+        tmp = f"{path}.tmp"
+        with open(tmp, "wb") as f:
+            np.save(f, array)
+        os.replace(tmp, path)
+        if segments is not None:
+            segments_path = self.segments_path(record_id, model_key)
+            with open(f"{segments_path}.tmp", "w", encoding="utf-8") as f:
+                json.dump([[int(first), float(start), float(end)] for first, start, end in segments], f)
+            os.replace(f"{segments_path}.tmp", segments_path)
+        with self._lock:
+            self._saved += 1
+            self._bytes += array.nbytes
+        return path
+
+    def load(self, record_id, model_key):
+        """
+        Log-probabilités d'un enregistrement en lecture seule (mmap), ou None.
+        """
+        path = self.path(record_id, model_key)
+        if not os.path.exists(path):
+            return None
+        return np.load(path, mmap_mode="r")
+
+    def load_segments(self, record_id, model_key):
+        """
+        Bornes des segments d'un enregistrement ([première trame, début (s),
+        fin (s)] par segment), ou None si elles n'ont pas été conservées.
+        """
+        path = self.segments_path(record_id, model_key)
+        if not os.path.exists(path):
+            return None
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+
+    def delete(self, record_ids):
+        """
+        Supprime les log-probabilités des enregistrements donnés, pour tous les
+        modèles (purge de l'archive audio). Renvoie le nombre de fichiers supprimés.
+        """
+        if not os.path.isdir(self.root):
+            return 0
+        removed = 0
+        for name in os.listdir(self.root):
+            model_dir = os.path.join(self.root, name)
+            if not os.path.isdir(model_dir):
+                continue
+            for record_id in record_ids:
+                path = os.path.join(model_dir, record_id[:2], f"{record_id}.npy")
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    continue
+                removed += 1
+                try:
+                    os.remove(os.path.join(model_dir, record_id[:2], f"{record_id}.segments.json"))
+                except FileNotFoundError:
+                    pass
+                try:
+                    os.rmdir(os.path.dirname(path))  # préfixe devenu vide
+                except OSError:
+                    pass
+        return removed
+
+    def models(self):
+        """
+        Modèles présents dans le stockage : liste de {"model_key", "model_id"}.
+        """
+        if not os.path.isdir(self.root):
+            return []
+        found = []
+        for name in sorted(os.listdir(self.root)):
+            meta_path = os.path.join(self.root, name, "modele.json")
+            if os.path.exists(meta_path):
+                with open(meta_path, encoding="utf-8") as f:
+                    found.append(json.load(f))
+        return found
+
+    def records(self, model_key):
+        """
+        Identifiants des enregistrements conservés pour un modèle.
+        """
+        directory = os.path.join(self.root, model_slug(model_key))
+        if not os.path.isdir(directory):
+            return
+        for shard in sorted(os.listdir(directory)):
+            shard_dir = os.path.join(directory, shard)
+            if not os.path.isdir(shard_dir):
+                continue
+            for name in sorted(os.listdir(shard_dir)):
+                if name.endswith(".npy"):
+                    yield name[:-4]
+
+    def stats(self):
+        with self._lock:
+            return {"ecrits": self._saved, "octets_ecrits": self._bytes, "modeles": len(self.models())}
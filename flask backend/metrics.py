@@ -0,0 +1,128 @@
+import time
+import bisect
+import threading
+import contextvars
+from contextlib import contextmanager
+
+# Bornes des histogrammes de latence (secondes)
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Langue de l'opération en cours (étiquette des mesures faites en profondeur, ex. ctc_inference)
+current_language = contextvars.ContextVar("current_language", default="")
+# Trace de profilage de la requête en cours (liste de (étape, secondes)) ou None
+current_trace = contextvars.ContextVar("current_trace", default=None)
+
+
+class Histogram:
+    """
+    Histogramme cumulatif au format Prometheus, une série par jeu d'étiquettes.
+    """
+
+    def __init__(self, name, help_text, label_names, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.label_names = label_names
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][bisect.bisect_left(self.buckets, value)] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = sorted(self._series.items())
+        for labels, (counts, total, count) in series:
+            base = ",".join(f'{k}="{v}"' for k, v in zip(self.label_names, labels))
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                cumulative += n
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f'{self.name}_bucket{{{base},le="{le}"}} {cumulative}')
+            lines.append(f"{self.name}_sum{{{base}}} {total}")
+            lines.append(f"{self.name}_count{{{base}}} {count}")
+        return "\n".join(lines)
+
+
+class Counter:
+    """
+    Compteur au format Prometheus.
+    """
+
+    def __init__(self, name, help_text, label_names):
+        self.name = name
+        self.help = help_text
+        self.label_names = label_names
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            values = sorted(self._values.items())
+        for labels, value in values:
+            base = ",".join(f'{k}="{v}"' for k, v in zip(self.label_names, labels))
+            lines.append(f"{self.name}{{{base}}} {value}")
+        return "\n".join(lines)
+
+
+STAGE_SECONDS = Histogram(
+    "asr_stage_seconds",
+    "Durée de chaque étape du traitement d'une évaluation",
+    ("stage", "langue"),
+)
+REQUESTS = Counter("asr_requests_total", "Évaluations traitées", ("langue", "statut"))
+CASCADE = Counter("asr_cascade_total", "Audios transcrits par la cascade, par modèle retenu", ("langue", "niveau"))
+
+
+@contextmanager
+def timed(stage, langue=None):
+    """
+    Mesure la durée du bloc dans l'histogramme des étapes (et dans la trace
+    de profilage de la requête si elle est active).
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        STAGE_SECONDS.observe(elapsed, stage, langue if langue is not None else current_language.get())
+        trace = current_trace.get()
+        if trace is not None:
+            trace.append((stage, elapsed))
+
+
+@contextmanager
+def language(langue):
+    """
+    Étiquette de langue des mesures faites dans le bloc.
+    """
+    token = current_language.set(langue)
+    try:
+        yield
+    finally:
+        current_language.reset(token)
+
+
+def start_trace():
+    trace = []
+    current_trace.set(trace)
+    return trace
+
+
+def render(*extra):
+    """
+    Toutes les métriques au format texte Prometheus.
+    """
+    return "\n".join([STAGE_SECONDS.render(), REQUESTS.render(), CASCADE.render(), *extra]) + "\n"
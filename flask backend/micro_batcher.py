@@ -0,0 +1,162 @@
+import queue
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from metrics import current_trace
+
+
+class QueueFullError(Exception):
+    """
+    La file d'attente a atteint sa taille maximale (contre-pression : réessayer plus tard).
+    """
+
+
+class MicroBatcher:
+    """
+    File d'attente d'inférence par micro-lots.
+    Les requêtes arrivant pendant une courte fenêtre (ex. 20 ms) sont regroupées
+    en un seul lot, traité par une seule passe du modèle, puis chaque résultat
+    est renvoyé à la requête qui l'attend. Les étapes mesurées pendant le lot
+    (timed) sont ajoutées à la trace de profilage de chaque requête du lot
+    qui en a une (voir metrics.start_trace).
+    """
+
+    def __init__(self, run_batch, window_ms=20, max_batch_size=8, name="asr",
+                 max_queue=0, concurrency=1):
+        """
+        run_batch : fonction qui reçoit une liste d'éléments et renvoie
+        la liste des résultats dans le même ordre.
+        max_queue : nombre maximal d'éléments en attente (0 = illimité) ;
+        au-delà, submit() lève QueueFullError.
+        concurrency : nombre de lots traités en parallèle (ex. un par worker d'inférence).
+        """
+        self.run_batch = run_batch
+        self.window = window_ms / 1000.0
+        self.max_batch_size = max_batch_size
+        self.name = name
+        self.max_queue = max_queue
+        self.concurrency = concurrency
+
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._batch_sizes = Counter()
+        self._waits = deque(maxlen=1000)
+        self._total_batches = 0
+        self._total_items = 0
+        self._rejected = 0
+
+        self._slots = threading.Semaphore(concurrency)
+        self._executor = ThreadPoolExecutor(concurrency, thread_name_prefix=f"batch-{name}") if concurrency > 1 else None
+
+        self._thread = threading.Thread(target=self._loop, name=f"batcher-{name}", daemon=True)
+        self._thread.start()
+
+    def submit(self, item):
+        """
+        Ajoute un élément à la file et renvoie un Future contenant son résultat.
+        """
+        if self.max_queue and self._queue.qsize() >= self.max_queue:
+            with self._lock:
+                self._rejected += 1
+            raise QueueFullError(f"File '{self.name}' pleine ({self.max_queue} en attente)")
+        future = Future()
+        self._queue.put((item, future, time.monotonic(), current_trace.get()))
+        return future
+
+    def __call__(self, item, timeout=None):
+        """
+        Version bloquante de submit().
+        """
+        return self.submit(item).result(timeout=timeout)
+
+    def _collect(self):
+        # Bloque jusqu'au premier élément, puis attend la fin de la fenêtre
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _loop(self):
+        while True:
+            # Un lot n'est constitué que lorsqu'un emplacement de traitement est libre
+            self._slots.acquire()
+            batch = self._collect()
+            started = time.monotonic()
+            self._record(len(batch), [started - enqueued for _, _, enqueued, _ in batch])
+
+            if self._executor is None:
+                self._run(batch)
+            else:
+                self._executor.submit(self._run, batch)
+
+    def _run_traced(self, items, traces):
+        stages = [] if traces else None
+        token = current_trace.set(stages)
+        try:
+            return self.run_batch(items)
+        finally:
+            current_trace.reset(token)
+            # Avant la remise des résultats : la requête lit sa trace dès qu'elle reprend la main
+            for trace in traces:
+                trace.extend(stages)
+
+    def _run(self, batch):
+        items = [item for item, _, _, _ in batch]
+        traces = [trace for _, _, _, trace in batch if trace is not None]
+        try:
+            results = self._run_traced(items, traces)
+            for (_, future, _, _), result in zip(batch, results):
+                future.set_result(result)
+        except Exception as e:
+            for _, future, _, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+        finally:
+            self._slots.release()
+
+    def _record(self, size, waits):
+        with self._lock:
+            self._batch_sizes[size] += 1
+            self._total_batches += 1
+            self._total_items += size
+            self._waits.extend(waits)
+
+    def stats(self):
+        """
+        Statistiques sur la taille des lots et le temps d'attente dans la file (ms).
+        """
+        with self._lock:
+            waits = sorted(self._waits)
+            sizes = dict(sorted(self._batch_sizes.items()))
+            total_batches = self._total_batches
+            total_items = self._total_items
+            rejected = self._rejected
+
+        def percentile(p):
+            if not waits:
+                return 0.0
+            return waits[min(len(waits) - 1, int(p / 100 * len(waits)))] * 1000
+
+        return {
+            "file": self.name,
+            "lots_traites": total_batches,
+            "elements_traites": total_items,
+            "taille_moyenne_lot": (total_items / total_batches) if total_batches else 0.0,
+            "repartition_tailles_lot": sizes,
+            "attente_file_ms": {
+                "moyenne": (sum(waits) / len(waits) * 1000) if waits else 0.0,
+                "p50": percentile(50),
+                "p95": percentile(95),
+                "max": (waits[-1] * 1000) if waits else 0.0,
+            },
+            "en_attente": self._queue.qsize(),
+            "rejets_file_pleine": rejected,
+        }
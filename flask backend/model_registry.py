@@ -0,0 +1,183 @@
+import gc
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+def available_memory_mb():
+    """
+    Mémoire disponible du système (MemAvailable de /proc/meminfo, en Mo),
+    ou None si elle n'est pas lisible (hors Linux).
+    """
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+class ModelRegistry:
+    """
+    Registre partagé des modèles ASR, chargés à la demande.
+    Chaque langue est enregistrée avec une fonction de construction ; le modèle
+    n'est chargé qu'à sa première utilisation (ou au préchargement), puis
+    partagé par toutes les requêtes. Deux déchargements automatiques, vérifiés
+    toutes les check_interval_s secondes :
+    - inactivité : modèles inutilisés depuis idle_unload_s secondes ;
+    - pression mémoire : tant que la mémoire disponible du système est sous
+      min_available_mb, le modèle utilisé le moins récemment est déchargé.
+
+    Chaque processus a son propre registre. Avec le pool d'inférence
+    (ASR_WORKERS > 0), les workers reçoivent les poids partagés par le
+    processus HTTP quand c'est possible (voir SpeechEngine.share_weights) ;
+    sinon chacun charge sa copie.
+    """
+
+    def __init__(self, idle_unload_s=0, check_interval_s=60, min_available_mb=0):
+        self._factories = {}
+        self._models = {}
+        self._load_locks = {}
+        self._last_used = {}
+        self._load_times = {}
+        self._load_counts = {}
+        self._unload_counts = {}
+        self._lock = threading.Lock()
+        self._loading_disabled = None
+
+        self.idle_unload_s = idle_unload_s
+        self.min_available_mb = min_available_mb
+        if idle_unload_s > 0 or min_available_mb > 0:
+            self._reaper = threading.Thread(target=self._reap_loop, args=(check_interval_s,),
+                                            name="model-reaper", daemon=True)
+            self._reaper.start()
+
+    def register(self, name, factory):
+        """
+        Enregistre une fonction sans argument qui construit le modèle `name`.
+        """
+        with self._lock:
+            self._factories[name] = factory
+            self._load_locks[name] = threading.Lock()
+            self._load_counts[name] = 0
+            self._unload_counts[name] = 0
+
+    def disable_loading(self, reason):
+        """
+        Interdit tout chargement dans ce processus : get() lève RuntimeError
+        au lieu de charger un modèle (ex. processus HTTP devant le pool d'inférence).
+        """
+        self._loading_disabled = reason
+
+    def get(self, name):
+        """
+        Renvoie le modèle `name`, en le chargeant s'il ne l'est pas encore.
+        Un seul thread charge un modèle donné ; les autres attendent le résultat.
+        """
+        if name not in self._factories:
+            raise KeyError(f"Modèle inconnu : {name}")
+
+        model = self._models.get(name)
+        if model is None:
+            if self._loading_disabled:
+                raise RuntimeError(f"Chargement du modèle '{name}' interdit dans ce processus : {self._loading_disabled}")
+            with self._load_locks[name]:
+                model = self._models.get(name)
+                if model is None:
+                    started = time.monotonic()
+                    model = self._factories[name]()
+                    elapsed = time.monotonic() - started
+                    logger.info("Modèle '%s' chargé en %.1f s", name, elapsed)
+                    with self._lock:
+                        self._models[name] = model
+                        self._load_times[name] = elapsed
+                        self._load_counts[name] += 1
+        self._last_used[name] = time.monotonic()
+        return model
+
+    def preload(self, names):
+        """
+        Charge immédiatement les modèles listés (préchauffage au démarrage).
+        """
+        for name in names:
+            self.get(name)
+
+    def unload(self, name):
+        """
+        Décharge un modèle. Les requêtes en cours gardent leur référence ;
+        la mémoire est libérée quand elles se terminent.
+        """
+        with self._load_locks[name]:
+            with self._lock:
+                model = self._models.pop(name, None)
+                if model is None:
+                    return False
+                self._unload_counts[name] += 1
+        del model
+        gc.collect()
+        return True
+
+    def unload_idle(self, idle_s=None):
+        """
+        Décharge les modèles inutilisés depuis plus de idle_s secondes.
+        Renvoie la liste des modèles déchargés.
+        """
+        idle_s = self.idle_unload_s if idle_s is None else idle_s
+        now = time.monotonic()
+        unloaded = []
+        for name in list(self._models):
+            if now - self._last_used.get(name, now) >= idle_s and self.unload(name):
+                unloaded.append(name)
+        return unloaded
+
+    def unload_under_pressure(self, min_available_mb=None, available_mb=available_memory_mb):
+        """
+        Décharge les modèles du moins au plus récemment utilisé tant que la
+        mémoire disponible reste sous min_available_mb. Renvoie la liste des
+        modèles déchargés.
+        """
+        min_available_mb = self.min_available_mb if min_available_mb is None else min_available_mb
+        unloaded = []
+        if min_available_mb <= 0:
+            return unloaded
+        for name in sorted(self._models, key=lambda n: self._last_used.get(n, 0)):
+            available = available_mb()
+            if available is None or available >= min_available_mb:
+                break
+            if self.unload(name):
+                unloaded.append(name)
+        return unloaded
+
+    def _reap_loop(self, check_interval_s):
+        while True:
+            time.sleep(check_interval_s)
+            for name in (self.unload_idle() if self.idle_unload_s > 0 else ()):
+                logger.info("💤 Modèle '%s' déchargé (inactif).", name)
+            for name in self.unload_under_pressure():
+                logger.warning("⚠️ Modèle '%s' déchargé (mémoire disponible sous %d Mo).",
+                               name, self.min_available_mb)
+
+    def is_loaded(self, name):
+        return name in self._models
+
+    def stats(self):
+        """
+        État de chaque modèle : chargé ou non, temps du dernier chargement (s),
+        inactivité (s), nombre de chargements et de déchargements.
+        """
+        now = time.monotonic()
+        with self._lock:
+            return {
+                name: {
+                    "charge": name in self._models,
+                    "temps_chargement_s": round(self._load_times[name], 2) if name in self._load_times else None,
+                    "inactif_depuis_s": round(now - self._last_used[name], 1) if name in self._last_used else None,
+                    "chargements": self._load_counts[name],
+                    "dechargements": self._unload_counts[name],
+                }
+                for name in self._factories
+            }
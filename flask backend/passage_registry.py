@@ -0,0 +1,126 @@
+import os
+import re
+import json
+import hashlib
+import threading
+from normalization import get_profile
+from alignment import symbol_masks
+
+# Fin de phrase : ponctuation finale ou retour à la ligne (y compris "\n" littéral)
+SENTENCE_END = re.compile(r'(?<=[.!?؟])\s+|\\n|\n')
+
+
+class UnknownPassage(KeyError):
+    """
+    Identifiant de texte absent du registre (ou d'une autre langue que celle demandée).
+    """
+
+
+class PassageIndex:
+    """
+    Index précalculé d'un texte de lecture : texte normalisé, mots, masques
+    de bits (caractères et mots) utilisés par l'alignement, et position de
+    chaque phrase. La comparaison n'a plus à traiter que la transcription.
+    """
+
+    def __init__(self, texte, profile="base", langue="ar", passage_id=None, titre=None):
+        self.texte = texte
+        self.profile = profile
+        self.langue = langue
+        self.id = passage_id or passage_key(texte, langue)
+        self.titre = titre
+
+        normalize = get_profile(profile)
+        tokens, phrases = [], []
+        for sentence in SENTENCE_END.split(texte):
+            words = normalize(sentence).split()
+            if words:
+                phrases.append((len(tokens), len(tokens) + len(words)))
+                tokens.extend(words)
+
+        self.tokens = tokens
+        self.normalized = " ".join(tokens)
+        # phrases : (premier mot, fin exclue) et (premier caractère, fin exclue) dans le texte normalisé
+        self.phrases = []
+        for start, end in phrases:
+            char_start = len(" ".join(tokens[:start])) + (1 if start else 0)
+            self.phrases.append({
+                "mots": (start, end),
+                "caracteres": (char_start, char_start + len(" ".join(tokens[start:end]))),
+            })
+
+        self.char_masks = symbol_masks(self.normalized)
+        self.word_masks = symbol_masks(tokens)
+
+    def to_dict(self):
+        return {"id": self.id, "titre": self.titre, "langue": self.langue, "texte": self.texte}
+
+
+def passage_key(texte, langue):
+    return hashlib.sha1(f"{langue}|{texte}".encode("utf-8")).hexdigest()[:12]
+
+
+class PassageRegistry:
+    """
+    Textes de lecture enregistrés une fois par les enseignants.
+    Les requêtes y font référence par identifiant (empreinte du texte) ;
+    l'index de chaque texte est construit à l'enregistrement, avec le profil
+    de normalisation de sa langue, et les textes sont conservés dans un fichier JSON.
+    """
+
+    def __init__(self, profiles, path=None):
+        """
+        profiles : profil de normalisation par langue, ex. {"ar": "ar_sans_diacritiques", "fr": "base"}.
+        """
+        self.profiles = profiles
+        self.path = path
+        self._passages = {}
+        self._lock = threading.Lock()
+
+        if path and os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for entry in json.load(f):
+                    self._add(entry["texte"], entry["langue"], entry.get("titre"), entry.get("id"))
+
+    def _add(self, texte, langue, titre=None, passage_id=None):
+        index = PassageIndex(texte, self.profiles.get(langue, "base"), langue, passage_id, titre)
+        with self._lock:
+            self._passages[index.id] = index
+        return index
+
+    def register(self, texte, langue="ar", titre=None):
+        """
+        Enregistre un texte (idempotent : un même texte garde le même identifiant).
+        """
+        passage_id = passage_key(texte, langue)
+        existing = self._passages.get(passage_id)
+        if existing is not None:
+            return existing
+        index = self._add(texte, langue, titre, passage_id)
+        self._save()
+        return index
+
+    def get(self, passage_id):
+        if passage_id not in self._passages:
+            raise UnknownPassage(passage_id)
+        return self._passages[passage_id]
+
+    def remove(self, passage_id):
+        with self._lock:
+            removed = self._passages.pop(passage_id, None) is not None
+        if removed:
+            self._save()
+        return removed
+
+    def list(self, langue=None):
+        return [p.to_dict() for p in self._passages.values() if langue is None or p.langue == langue]
+
+    def _save(self):
+        if not self.path:
+            return
+        with self._lock:
+            entries = [p.to_dict() for p in self._passages.values()]
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(entries, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,118 @@
+import os
+import sys
+import json
+import argparse
+import numpy as np
+from logit_store import LogitStore
+from arabic_text_comparator import TextComparator
+
+# Re-notation à partir des log-probabilités conservées (ASR_LOGITS=1), sans
+# repasser par le modèle : seul le tokenizer est chargé.
+#   python rescore.py --langue ar --texte cible.txt [--aligner] [id1 id2 ...]
+
+# Durée d'une trame wav2vec2 : pas total de l'extracteur convolutif (320 échantillons à 16 kHz)
+FRAME_S = 320 / 16000
+
+
+def split_segments(log_probs, segments=None):
+    """
+    Découpe les log-probabilités conservées selon leurs segments (voir
+    LogitStore.load_segments) : liste de (log-probabilités du segment,
+    début de chaque trame dans l'audio d'origine en secondes). Sans segments
+    (enregistrement sans VAD ou antérieur), un seul segment depuis 0 s.
+    """
+    if not segments:
+        return [(log_probs, np.arange(len(log_probs)) * FRAME_S)]
+    pieces = []
+    bounds = [int(first) for first, _, _ in segments] + [len(log_probs)]
+    for (first, start, end), last in zip(segments, bounds[1:]):
+        frames = log_probs[int(first):last]
+        frame_s = (end - start) / max(len(frames), 1)
+        pieces.append((frames, start + np.arange(len(frames)) * frame_s))
+    return pieces
+
+
+def rescorer(log_probs, processor, target_text, profile, postprocess=None, align=False, lowercase=False,
+             segments=None):
+    """
+    Re-décode (CTC glouton) des log-probabilités lues en mmap et compare au
+    texte cible ; avec align, ajoute l'alignement forcé mot à mot.
+    Chaque segment (voir split_segments) est décodé séparément, comme par le
+    modèle : le CTC ne fusionne pas de répétition d'un segment au suivant, et
+    les temps de l'alignement sont ceux de l'audio d'origine.
+    """
+    pieces = split_segments(log_probs, segments)
+    texts = [processor.decode(np.argmax(frames, axis=-1)) for frames, _ in pieces]
+    transcription = " ".join(t.strip() for t in texts if t.strip()) if segments else texts[0]
+    if postprocess:
+        transcription = postprocess(transcription)
+    report = TextComparator.compare_texts(target_text, transcription, profile=profile)
+    result = {
+        "transcription": transcription,
+        "similarite": round(report["similarite_pourcentage"], 2),
+        "wer": round(report["wer"], 4),
+        "cer": round(report["cer"], 4),
+        "mots_corrects": report["mots_communs"],
+        "mots_manquants": report["mots_manquants"],
+        "mots_supplementaires": report["mots_supplementaires"],
+    }
+    if align:
+        from forced_alignment import align_words
+        # Durée moyenne d'une trame, pour la fin du dernier mot d'un segment
+        frame_s = FRAME_S
+        if segments:
+            frame_s = sum(end - start for _, start, end in segments) / max(len(log_probs), 1)
+        result["mots_alignes"] = align_words(np.asarray(log_probs, dtype=np.float32), processor.tokenizer,
+                                             target_text, frame_s, lowercase,
+                                             np.concatenate([starts for _, starts in pieces]))
+    return result
+
+
+def main():
+    from transformers import Wav2Vec2Processor
+    from speech_engine import POST_TRAITEMENTS, load_languages
+
+    parser = argparse.ArgumentParser(description="Re-notation des enregistrements à partir de leurs log-probabilités.")
+    parser.add_argument("ids", nargs="*", help="identifiants d'enregistrements (défaut : tous)")
+    parser.add_argument("--langue", default="ar")
+    parser.add_argument("--texte", required=True, help="fichier du texte cible")
+    parser.add_argument("--normalisation", help="profil de normalisation (défaut : celui de la langue)")
+    parser.add_argument("--aligner", action="store_true", help="ajouter l'alignement forcé mot à mot")
+    parser.add_argument("--racine", default=os.environ.get("LOGITS_DIR", os.path.join("audios", "logits")))
+    parser.add_argument("--sortie", help="fichier JSON Lines (sinon sortie standard)")
+    args = parser.parse_args()
+
+    langues = load_languages()
+    if args.langue not in langues:
+        parser.error(f"langue non configurée : {args.langue}")
+    config = langues[args.langue]
+    with open(args.texte, encoding="utf-8") as f:
+        target_text = f.read()
+
+    store = LogitStore(args.racine)
+    model_keys = [m["model_key"] for m in store.models() if m["model_id"] == config["modele"]]
+    if not model_keys:
+        parser.error(f"aucune log-probabilité conservée pour {config['modele']} dans {args.racine}")
+
+    processor = Wav2Vec2Processor.from_pretrained(config["modele"])
+    postprocess = POST_TRAITEMENTS[config.get("post_traitement", "aucun")]
+    profile = args.normalisation or config["normalisation"]
+
+    out = open(args.sortie, "w", encoding="utf-8") if args.sortie else sys.stdout
+    try:
+        for model_key in model_keys:
+            for record_id in (args.ids or store.records(model_key)):
+                log_probs = store.load(record_id, model_key)
+                if log_probs is None:
+                    continue
+                result = rescorer(log_probs, processor, target_text, profile, postprocess,
+                                  args.aligner, config["alignement_minuscules"],
+                                  store.load_segments(record_id, model_key))
+                out.write(json.dumps({"id": record_id, "modele": model_key, **result}, ensure_ascii=False) + "\n")
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,217 @@
+import os
+import sys
+import csv
+import json
+import argparse
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from audio_ingest import load_audio_file
+from arabic_text_comparator import TextComparator
+
+AUDIO_EXTENSIONS = (".wav", ".ogg", ".webm", ".mp3", ".flac", ".m4a")
+
+COLUMNS = ["audio", "similarite", "wer", "cer", "mots_corrects", "mots_manquants",
+           "mots_supplementaires", "transcription", "erreur"]
+
+
+def lire_texte(path):
+    with open(path, encoding="utf-8") as f:
+        return f.read()
+
+
+def lister_elements(source, texte_commun=None):
+    """
+    Liste les couples (audio, texte cible).
+    source : dossier (chaque audio accompagné d'un .txt de même nom, ou texte_commun
+    pour tous) ou manifeste CSV avec les colonnes audio et target_text (ou target_file).
+    """
+    if os.path.isdir(source):
+        items = []
+        for name in sorted(os.listdir(source)):
+            stem, ext = os.path.splitext(name)
+            if ext.lower() not in AUDIO_EXTENSIONS:
+                continue
+            text_path = os.path.join(source, stem + ".txt")
+            if texte_commun is not None:
+                items.append((os.path.join(source, name), texte_commun))
+            elif os.path.exists(text_path):
+                items.append((os.path.join(source, name), lire_texte(text_path)))
+            else:
+                print(f"⚠️ Pas de texte cible pour {name}, ignoré.")
+        return items
+
+    base = os.path.dirname(os.path.abspath(source))
+    items = []
+    with open(source, encoding="utf-8", newline="") as f:
+        for row in csv.DictReader(f):
+            audio = os.path.join(base, row["audio"])
+            if row.get("target_text"):
+                items.append((audio, row["target_text"]))
+            elif row.get("target_file"):
+                items.append((audio, lire_texte(os.path.join(base, row["target_file"]))))
+            elif texte_commun is not None:
+                items.append((audio, texte_commun))
+    return items
+
+
+def deja_traites(output_path):
+    """
+    Point de reprise : audios déjà présents (sans erreur) dans le fichier de résultats.
+    """
+    if not os.path.exists(output_path):
+        return set()
+    with open(output_path, encoding="utf-8", newline="") as f:
+        return {row["audio"] for row in csv.DictReader(f) if not row.get("erreur")}
+
+
+def comparer(args):
+    # Exécuté dans le pool de processus
+    audio, target_text, transcription, profile = args
+    report = TextComparator.compare_texts(target_text, transcription, profile=profile)
+    return {
+        "audio": audio,
+        "similarite": round(report["similarite_pourcentage"], 2),
+        "wer": round(report["wer"], 4),
+        "cer": round(report["cer"], 4),
+        "mots_corrects": report["mots_communs"],
+        "mots_manquants": report["mots_manquants"],
+        "mots_supplementaires": report["mots_supplementaires"],
+        "transcription": transcription,
+        "erreur": "",
+    }
+
+
+def decoder(item):
+    # Exécuté dans le pool de préchargement
+    audio, target_text = item
+    try:
+        return audio, target_text, load_audio_file(audio), None
+    except Exception as e:
+        return audio, target_text, None, str(e)
+
+
+def precharger(pool, items, profondeur):
+    """
+    Décode les audios dans le pool avec au plus `profondeur` audios d'avance
+    (mémoire bornée), en conservant l'ordre.
+    """
+    futures = deque()
+    for item in items:
+        futures.append(pool.submit(decoder, item))
+        if len(futures) >= profondeur:
+            yield futures.popleft().result()
+    while futures:
+        yield futures.popleft().result()
+
+
+def rapport_agrege(output_path):
+    # Après une reprise, seule la dernière ligne de chaque audio compte
+    with open(output_path, encoding="utf-8", newline="") as f:
+        rows = list({row["audio"]: row for row in csv.DictReader(f)}.values())
+    ok = [row for row in rows if not row["erreur"]]
+
+    def moyenne(column):
+        return round(sum(float(row[column]) for row in ok) / len(ok), 4) if ok else 0.0
+
+    return {
+        "elements": len(rows),
+        "reussis": len(ok),
+        "erreurs": len(rows) - len(ok),
+        "similarite_moyenne": moyenne("similarite"),
+        "wer_moyen": moyenne("wer"),
+        "cer_moyen": moyenne("cer"),
+        "similarite_min": min((float(row["similarite"]) for row in ok), default=0.0),
+        "similarite_max": max((float(row["similarite"]) for row in ok), default=0.0),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Évaluation hors ligne d'un lot d'enregistrements.")
+    parser.add_argument("source", help="dossier d'audios ou manifeste CSV (audio, target_text | target_file)")
+    parser.add_argument("--langue", default="ar", help="code de langue configuré (voir speech_engine.LANGUES)")
+    parser.add_argument("--texte", help="fichier texte cible commun à tous les audios")
+    parser.add_argument("--sortie", default="resultats.csv", help="fichier de résultats (CSV, sert aussi de point de reprise)")
+    parser.add_argument("--parquet", action="store_true", help="écrire aussi une copie Parquet (pyarrow)")
+    parser.add_argument("--taille-lot", type=int, default=8)
+    parser.add_argument("--prechargement", type=int, default=4, help="threads de décodage audio")
+    parser.add_argument("--processus", type=int, default=os.cpu_count(), help="processus de comparaison")
+    parser.add_argument("--backend", default=None, help="moteur d'inférence (torch, int8, onnx)")
+    args = parser.parse_args()
+
+    texte_commun = lire_texte(args.texte) if args.texte else None
+    items = lister_elements(args.source, texte_commun)
+    done = deja_traites(args.sortie)
+    todo = [item for item in items if item[0] not in done]
+    print(f"{len(items)} enregistrements, {len(items) - len(todo)} déjà traités, {len(todo)} à traiter.")
+
+    if todo:
+        from speech_engine import SpeechEngine
+        engine = SpeechEngine(backend=args.backend)
+        if args.langue not in engine:
+            parser.error(f"langue non configurée : {args.langue}")
+        transcrire = engine.get(args.langue).transcribe_batch
+        profile = engine.config(args.langue)["normalisation"]
+
+        new_file = not os.path.exists(args.sortie)
+        with open(args.sortie, "a", encoding="utf-8", newline="") as out, \
+                ThreadPoolExecutor(args.prechargement) as prefetch, \
+                ProcessPoolExecutor(args.processus) as comparators:
+            writer = csv.DictWriter(out, fieldnames=COLUMNS)
+            if new_file:
+                writer.writeheader()
+
+            # Le décodage des audios suivants se fait pendant l'inférence du lot courant
+            decoded = precharger(prefetch, todo, 2 * args.taille_lot)
+            batch, traites = [], 0
+            for entry in decoded:
+                if entry[3] is not None:
+                    writer.writerow({"audio": entry[0], "erreur": entry[3]})
+                    continue
+                batch.append(entry)
+                if len(batch) == args.taille_lot:
+                    traites += traiter_lot(batch, transcrire, profile, comparators, writer, out)
+                    print(f"  {traites}/{len(todo)}")
+                    batch = []
+            if batch:
+                traites += traiter_lot(batch, transcrire, profile, comparators, writer, out)
+                print(f"  {traites}/{len(todo)}")
+
+    report = rapport_agrege(args.sortie)
+    report_path = os.path.splitext(args.sortie)[0] + "_rapport.json"
+    with open(report_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+    if args.parquet:
+        try:
+            import pyarrow.csv as pa_csv
+            import pyarrow.parquet as pq
+        except ImportError:
+            print("⚠️ pyarrow non installé : pas de copie Parquet.")
+        else:
+            pq.write_table(pa_csv.read_csv(args.sortie), os.path.splitext(args.sortie)[0] + ".parquet")
+
+
+def traiter_lot(batch, transcrire, profile, comparators, writer, out):
+    """
+    Transcrit un lot en une passe du modèle, compare dans le pool de processus
+    et écrit les résultats (flush : chaque lot terminé est un point de reprise).
+    """
+    try:
+        transcriptions = transcrire([speech for _, _, speech, _ in batch])
+    except Exception as e:
+        for audio, _, _, _ in batch:
+            writer.writerow({"audio": audio, "erreur": str(e)})
+        out.flush()
+        return len(batch)
+
+    jobs = [(audio, target, transcription, profile)
+            for (audio, target, _, _), transcription in zip(batch, transcriptions)]
+    for row in comparators.map(comparer, jobs):
+        writer.writerow(row)
+    out.flush()
+    return len(batch)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,442 @@
+import os
+import json
+import time
+import logging
+import threading
+from functools import partial
+from audio_ingest import load_audio_file
+from normalization import strip_diacritics
+from model_registry import ModelRegistry
+from arabic_text_comparator import TextComparator
+from metrics import language, CASCADE
+
+logger = logging.getLogger(__name__)
+
+# Langues prises en charge. Ajouter une langue = ajouter une entrée ici ou dans
+# le fichier JSON ASR_LANGUES_FILE (mêmes clés, fusionné avec celles-ci) :
+# - modele : checkpoint CTC (surcharge : ASR_MODELE_<CODE>)
+# - post_traitement : voir POST_TRAITEMENTS
+# - alignement_minuscules : texte cible en minuscules pour l'alignement forcé
+# - normalisation : profil de comparaison (surcharge : NORMALISATION_<CODE>)
+# - taille_lot, fenetre_ms : micro-lots propres à la langue (sinon réglages globaux)
+# - modele_rapide : petit checkpoint CTC essayé en premier en mode cascade
+#   (surcharge : ASR_MODELE_RAPIDE_<CODE>) ; cascade_confiance (0-1) et
+#   cascade_similarite (%) : seuils sous lesquels le modèle complet reprend l'audio
+#   (par défaut ASR_CASCADE_CONFIANCE et ASR_CASCADE_SIMILARITE)
+# - feedback : messages pour >= 90 %, >= 70 %, >= 50 % et en dessous
+# - table, colonne_langue : table des évaluations et colonne où le code de la
+#   langue est enregistré (obligatoires, voir evaluation_store)
+LANGUES = {
+    "ar": {
+        "nom": "arabe",
+        "table": "record",
+        "colonne_langue": "language",
+        "modele": "jonatasgrosman/wav2vec2-large-xlsr-53-arabic",
+        "post_traitement": "sans_diacritiques",
+        "alignement_minuscules": False,
+        "normalisation": "ar_sans_diacritiques",
+        "feedback": [
+            "🌟 قراءة ممتازة! 👏 ({similarite:.2f}%)",
+            "👍 قراءة جيدة، لكن بها بعض الأخطاء. ({similarite:.2f}%)",
+            "🙂 قراءة مقبولة، لكن تحتاج إلى تحسين. ({similarite:.2f}%)",
+            "🛠️ قراءة صعبة. تدرب أكثر لتحسن مستواك! ({similarite:.2f}%)",
+        ],
+    },
+    "fr": {
+        "nom": "français",
+        "table": "recorder",
+        "colonne_langue": "langue",
+        "modele": "jonatasgrosman/wav2vec2-large-xlsr-53-french",
+        "post_traitement": "espaces",
+        "alignement_minuscules": True,
+        "normalisation": "base",
+        "feedback": [
+            "🌟 Excellente lecture ! 👏 ({similarite:.2f}%)",
+            "👍 Bonne lecture, attention à quelques erreurs. ({similarite:.2f}%)",
+            "🙂 Lecture passable, tu peux mieux faire. ({similarite:.2f}%)",
+            "🛠️ Lecture difficile, un peu de pratique aidera ! ({similarite:.2f}%)",
+        ],
+    },
+}
+
+# Post-traitement des transcriptions brutes du modèle
+POST_TRAITEMENTS = {
+    "aucun": None,
+    "espaces": str.strip,
+    "sans_diacritiques": strip_diacritics,
+}
+
+SEUILS_FEEDBACK = (90, 70, 50)
+
+
+# torch et transformers (ctc_inference, forced_alignment, streaming_ctc,
+# inference_backend) ne sont importés que par les méthodes qui passent par un
+# vrai modèle : le moteur se construit et sert des modèles enregistrés à la
+# main (ex. modèles factices de load_test.py) sans ces dépendances.
+
+
+def model_key(model_id, backend=None, vad=None):
+    from inference_backend import DEFAULT_BACKEND
+    # Identifiant de cache : modèle, moteur et découpage éventuel par VAD (empreinte de ses réglages)
+    return f"{model_id}:{backend or DEFAULT_BACKEND}" + (f":vad-{vad.signature()}" if vad is not None else "")
+
+
+def load_languages(path=None):
+    """
+    Configuration des langues : LANGUES, complétée par le fichier JSON
+    ASR_LANGUES_FILE et les variables ASR_MODELE_<CODE> / NORMALISATION_<CODE>.
+    """
+    langues = {code: dict(config) for code, config in LANGUES.items()}
+    path = path or os.environ.get("ASR_LANGUES_FILE")
+    if path:
+        with open(path, encoding="utf-8") as f:
+            for code, config in json.load(f).items():
+                langues.setdefault(code, {}).update(config)
+
+    for code, config in langues.items():
+        if "modele" not in config:
+            raise ValueError(f"Langue '{code}' : checkpoint ('modele') manquant")
+        if not config.get("table") or not config.get("colonne_langue"):
+            raise ValueError(f"Langue '{code}' : table d'enregistrement ('table', 'colonne_langue') manquante")
+        if config.get("post_traitement", "aucun") not in POST_TRAITEMENTS:
+            raise ValueError(f"Langue '{code}' : post-traitement inconnu : {config['post_traitement']}")
+        config["modele"] = os.environ.get(f"ASR_MODELE_{code.upper()}", config["modele"])
+        config["normalisation"] = os.environ.get(f"NORMALISATION_{code.upper()}", config.get("normalisation", "base"))
+        config["modele_rapide"] = os.environ.get(f"ASR_MODELE_RAPIDE_{code.upper()}", config.get("modele_rapide")) or None
+        config.setdefault("cascade_confiance", float(os.environ.get("ASR_CASCADE_CONFIANCE", 0.8)))
+        config.setdefault("cascade_similarite", float(os.environ.get("ASR_CASCADE_SIMILARITE", 85)))
+        config.setdefault("nom", code)
+        config.setdefault("alignement_minuscules", False)
+        config.setdefault("feedback", LANGUES["fr"]["feedback"])
+    return langues
+
+
+class SpeechProcessor:
+    """
+    Reconnaissance vocale CTC pour une langue : chargement du modèle, passe
+    par lots (cache et VAD compris), décodage guidé par le texte cible et
+    transcription en flux. Le même code sert à toutes les langues ; seuls
+    le checkpoint et le post-traitement changent.
+    """
+
+    def __init__(self, model_id, langue="", postprocess=None, lowercase_alignment=False,
+                 backend=None, cache=None, vad=None, shared=None):
+        """
+        backend : moteur d'inférence ('torch', 'int8' ou 'onnx'),
+        par défaut la variable d'environnement ASR_BACKEND.
+        postprocess : fonction appliquée à chaque transcription brute.
+        cache : TranscriptionCache optionnel consulté avant chaque transcription.
+        vad : VoiceActivityDetector optionnel (silences retirés avant le modèle).
+        shared : (processor, modèle) déjà chargés par un autre processus, poids
+        en mémoire partagée (voir SpeechEngine.share_weights) : rien n'est chargé.
+        """
+        from inference_backend import DEFAULT_BACKEND
+
+        self.model_id = model_id
+        self.langue = langue
+        self.postprocess = postprocess
+        self.lowercase_alignment = lowercase_alignment
+        self.backend = backend or DEFAULT_BACKEND
+        self.cache = cache
+        self.vad = vad
+        if shared is not None:
+            self.processor, self.model = shared
+            logger.info("✅ Modèle %s repris en mémoire partagée.", model_id)
+            return
+
+        from transformers import Wav2Vec2Processor
+        from inference_backend import load_ctc_model
+        logger.info("🔤 Chargement du modèle %s (%s)...", model_id, langue or "?")
+        self.processor = Wav2Vec2Processor.from_pretrained(model_id)
+        self.model = load_ctc_model(model_id, self.backend)
+        logger.info("✅ Modèle %s chargé.", model_id)
+
+    @property
+    def model_key(self):
+        return model_key(self.model_id, self.backend, self.vad)
+
+    def _postprocess(self, text, enabled=True):
+        return self.postprocess(text) if enabled and self.postprocess else text
+
+    def load_audio(self, audio_path, sample_rate=16000):
+        """
+        Charge un fichier audio et le rééchantillonne à la fréquence du modèle.
+        """
+        if not os.path.exists(audio_path):
+            raise FileNotFoundError(f"Le fichier audio {audio_path} n'existe pas")
+        return load_audio_file(audio_path, sample_rate)
+
+    def transcribe_batch(self, speech_arrays, sample_rate=16000, postprocess=True):
+        """
+        Transcrit plusieurs audios déjà chargés en une seule passe du modèle.
+        """
+        from ctc_inference import transcribe_batch_cached
+        with language(self.langue):
+            transcriptions = transcribe_batch_cached(self.processor, self.model, speech_arrays, sample_rate,
+                                                     self.cache, self.model_key, self.vad)
+        return [self._postprocess(t, postprocess) for t in transcriptions]
+
+    def transcribe_batch_log_probs(self, speech_arrays, sample_rate=16000, postprocess=True):
+        """
+        Transcrit un lot et renvoie aussi les log-probabilités (float16) de chaque
+        audio et leurs segments : liste de (transcription, log-probabilités,
+        segments), voir ctc_inference.transcribe_batch_log_probs. Pas de cache.
+        """
+        from ctc_inference import transcribe_batch_log_probs
+        with language(self.langue):
+            results = transcribe_batch_log_probs(self.processor, self.model, speech_arrays, sample_rate, self.vad)
+        return [(self._postprocess(t, postprocess),) + tuple(r) for t, *r in results]
+
+    def transcribe_batch_aligned(self, items, sample_rate=16000, postprocess=True, return_log_probs=False):
+        """
+        Décodage guidé par le texte cible : items est une liste de (audio, texte cible).
+        Renvoie pour chaque audio (transcription, mots alignés avec début, fin et
+        confiance), les mots alignés valant None si l'alignement est impossible,
+        suivis des log-probabilités et de leurs segments si return_log_probs.
+        """
+        from forced_alignment import transcribe_batch_aligned
+        with language(self.langue):
+            results = transcribe_batch_aligned(self.processor, self.model, items, sample_rate,
+                                               lowercase=self.lowercase_alignment,
+                                               return_log_probs=return_log_probs, vad=self.vad)
+        return [(self._postprocess(r[0], postprocess),) + tuple(r[1:]) for r in results]
+
+    def transcribe(self, audio_path, sample_rate=16000, postprocess=True, return_log_probs=False):
+        """
+        Transcrit un fichier audio. Avec return_log_probs, renvoie
+        (transcription, log-probabilités, segments) pour les conserver (voir LogitStore).
+        """
+        logger.debug("Transcription de l'audio: %s", audio_path)
+        speech_array = self.load_audio(audio_path, sample_rate)
+        logger.debug("Audio chargé, longueur: %d échantillons", len(speech_array))
+        if return_log_probs:
+            return self.transcribe_batch_log_probs([speech_array], sample_rate, postprocess)[0]
+        transcription = self.transcribe_batch([speech_array], sample_rate, postprocess)[0]
+        logger.debug("Transcription: %s", transcription)
+        return transcription
+
+    def stream_decoder(self, sample_rate=16000, chunk_length_s=20.0, stride_length_s=4.0):
+        """
+        Crée un décodeur CTC incrémental alimenté bloc par bloc (voir ChunkedCTCDecoder).
+        """
+        from streaming_ctc import ChunkedCTCDecoder
+        return ChunkedCTCDecoder(self.processor, self.model, sample_rate, chunk_length_s, stride_length_s)
+
+    def transcribe_windows(self, windows, sample_rate=16000, postprocess=True):
+        """
+        Lecture en direct : windows est une liste de (audio, recouvrement gauche,
+        recouvrement droit, identifiants déjà retenus pour cette lecture), passées
+        au modèle en un seul lot (voir decode_windows). Renvoie pour chacune
+        (identifiants retenus, transcription de la lecture jusqu'à cette fenêtre).
+        """
+        from streaming_ctc import decode_windows
+        with language(self.langue):
+            ids = decode_windows(self.processor, self.model, [w[:3] for w in windows], sample_rate)
+        return [(new, self._postprocess(self.processor.decode(list(w[3]) + new), postprocess))
+                for w, new in zip(windows, ids)]
+
+    def transcribe_stream(self, audio_path, sample_rate=16000, postprocess=True,
+                          chunk_length_s=20.0, stride_length_s=4.0):
+        """
+        Transcription en flux pour les longs enregistrements.
+        L'audio est lu par blocs et découpé en fenêtres avec recouvrement, ce qui
+        borne la mémoire utilisée. Génère la transcription partielle après chaque
+        fenêtre traitée ; la dernière valeur générée est la transcription complète.
+        """
+        from streaming_ctc import iter_audio_blocks
+        if not os.path.exists(audio_path):
+            raise FileNotFoundError(f"Le fichier audio {audio_path} n'existe pas")
+
+        decoder = self.stream_decoder(sample_rate, chunk_length_s, stride_length_s)
+        for block in iter_audio_blocks(audio_path, sample_rate):
+            if decoder.feed(block):
+                yield self._postprocess(decoder.transcription(), postprocess)
+        yield self._postprocess(decoder.finish(), postprocess)
+
+
+class SpeechEngine:
+    """
+    Moteur de reconnaissance multilingue : un SpeechProcessor par langue
+    configurée, chargé à la demande (voir ModelRegistry), avec le même moteur
+    d'inférence, le même cache et le même VAD pour toutes les langues.
+    Une langue avec un modele_rapide peut être transcrite en cascade (voir
+    transcribe_batch_cascade) ; ce modèle est enregistré sous "<code>:rapide".
+    """
+
+    def __init__(self, langues=None, backend=None, cache=None, vad=None, idle_unload_s=0, min_available_mb=0):
+        self.langues = langues if langues is not None else load_languages()
+        self.backend = backend
+        self.cache = cache
+        self.vad = vad
+        self.models = ModelRegistry(idle_unload_s=idle_unload_s, min_available_mb=min_available_mb)
+        for code, config in self.langues.items():
+            self.models.register(code, partial(self._build, code))
+            if config.get("modele_rapide"):
+                self.models.register(f"{code}:rapide", partial(self._build, code, rapide=True))
+        self._cascade = {}
+        self._cascade_lock = threading.Lock()
+
+    def _build(self, code, rapide=False, shared=None):
+        config = self.langues[code]
+        return SpeechProcessor(config["modele_rapide"] if rapide else config["modele"], code,
+                               postprocess=POST_TRAITEMENTS[config.get("post_traitement", "aucun")],
+                               lowercase_alignment=config["alignement_minuscules"],
+                               backend=self.backend, cache=self.cache, vad=self.vad, shared=shared)
+
+    def share_weights(self, names):
+        """
+        Charge les modèles listés dans ce processus et place leurs poids en
+        mémoire partagée ; renvoie {nom: (processor, modèle)} à transmettre aux
+        workers du pool (voir adopt), qui s'en servent sans charger de copie.
+        Seuls les modèles PyTorch fp32 se partagent : ceux des moteurs int8
+        et onnx restent chargés par chaque worker.
+        """
+        import torch
+        shared = {}
+        for name in names:
+            processor = self.get(name)
+            if processor.backend != "torch" or not isinstance(processor.model, torch.nn.Module):
+                logger.warning("⚠️ Modèle '%s' (%s) non partageable : chargé par chaque worker.",
+                               name, processor.backend)
+                continue
+            processor.model.share_memory()
+            shared[name] = (processor.processor, processor.model)
+        return shared
+
+    def adopt(self, shared):
+        """
+        Enregistre les modèles partagés par un autre processus (voir share_weights).
+        """
+        for name, parts in shared.items():
+            code, _, variante = name.partition(":")
+            self.models.register(name, partial(self._build, code, rapide=variante == "rapide", shared=parts))
+
+    def __contains__(self, code):
+        return code in self.langues
+
+    def config(self, code):
+        return self.langues[code]
+
+    def get(self, code):
+        """
+        SpeechProcessor de la langue `code` (KeyError si la langue est inconnue).
+        """
+        return self.models.get(code)
+
+    def preload(self, codes):
+        self.models.preload(codes)
+
+    def transcribe_batch(self, code, speech_arrays):
+        return self.get(code).transcribe_batch(speech_arrays)
+
+    def transcribe_batch_aligned(self, code, items, return_log_probs=False):
+        return self.get(code).transcribe_batch_aligned(items, return_log_probs=return_log_probs)
+
+    def transcribe_batch_log_probs(self, code, speech_arrays):
+        return self.get(code).transcribe_batch_log_probs(speech_arrays)
+
+    def transcribe_windows(self, code, windows):
+        return self.get(code).transcribe_windows(windows)
+
+    def has_cascade(self, code):
+        return bool(self.langues[code].get("modele_rapide"))
+
+    def transcribe_batch_cascade(self, code, items, aligned=False):
+        """
+        Cascade : le modèle rapide transcrit tout le lot, et seuls les audios
+        dont la confiance CTC ou la similarité au texte cible est sous les
+        seuils de la langue repassent par le modèle complet (décodage guidé
+        par le texte cible si aligned). items est une liste de (audio, texte cible).
+        Renvoie pour chaque audio (transcription, mots alignés ou None).
+        """
+        config = self.langues[code]
+        speech_arrays = [audio for audio, _ in items]
+        fast = self.get(f"{code}:rapide")
+
+        started = time.perf_counter()
+        if config["cascade_confiance"] > 0:
+            from ctc_inference import ctc_confidence
+            blank_id = fast.processor.tokenizer.pad_token_id
+            fast_results = [(text, ctc_confidence(log_probs, blank_id))
+                            for text, log_probs, _ in fast.transcribe_batch_log_probs(speech_arrays)]
+        else:
+            # Sans seuil de confiance, les log-probabilités sont inutiles : le cache reste consulté
+            fast_results = [(text, 1.0) for text in fast.transcribe_batch(speech_arrays)]
+        fast_s = time.perf_counter() - started
+
+        results, escalated = [], []
+        for i, ((text, confidence), (_, target_text)) in enumerate(zip(fast_results, items)):
+            similarity = TextComparator.compare_texts(target_text, text, profile=config["normalisation"])
+            if confidence < config["cascade_confiance"] or similarity["similarite_pourcentage"] < config["cascade_similarite"]:
+                escalated.append(i)
+            results.append((text, None))
+
+        full_s = 0.0
+        if escalated:
+            started = time.perf_counter()
+            if aligned:
+                full_results = self.transcribe_batch_aligned(code, [items[i] for i in escalated])
+            else:
+                full_results = [(text, None) for text in
+                                self.transcribe_batch(code, [speech_arrays[i] for i in escalated])]
+            full_s = time.perf_counter() - started
+            for i, result in zip(escalated, full_results):
+                results[i] = tuple(result)
+
+        CASCADE.inc(code, "rapide", amount=len(items) - len(escalated))
+        if escalated:
+            CASCADE.inc(code, "complet", amount=len(escalated))
+        audio_s = sum(len(a) for a in speech_arrays) / 16000
+        escalated_audio_s = sum(len(speech_arrays[i]) for i in escalated) / 16000
+        with self._cascade_lock:
+            stats = self._cascade.setdefault(code, dict.fromkeys(
+                ("audios", "escalades", "secondes_audio", "secondes_audio_escaladees", "temps_rapide_s", "temps_complet_s"), 0))
+            stats["audios"] += len(items)
+            stats["escalades"] += len(escalated)
+            stats["secondes_audio"] += audio_s
+            stats["secondes_audio_escaladees"] += escalated_audio_s
+            stats["temps_rapide_s"] += fast_s
+            stats["temps_complet_s"] += full_s
+        return results
+
+    def cascade_stats(self):
+        """
+        Par langue : taux d'escalade vers le modèle complet et économie de
+        temps de calcul estimée (coût du modèle complet par seconde d'audio,
+        mesuré sur les escalades, appliqué à tout l'audio traité).
+        """
+        with self._cascade_lock:
+            cascade = {code: dict(stats) for code, stats in self._cascade.items()}
+        for code, stats in cascade.items():
+            spent = stats["temps_rapide_s"] + stats["temps_complet_s"]
+            stats["taux_escalade"] = round(stats["escalades"] / stats["audios"], 4) if stats["audios"] else 0.0
+            if stats["secondes_audio_escaladees"] > 0:
+                full_only = stats["temps_complet_s"] / stats["secondes_audio_escaladees"] * stats["secondes_audio"]
+                stats["economie_estimee_s"] = round(full_only - spent, 3)
+                stats["economie_pourcentage"] = round(100 * (full_only - spent) / full_only, 1) if full_only else None
+            else:
+                # Aucune escalade : coût du modèle complet encore inconnu
+                stats["economie_estimee_s"] = stats["economie_pourcentage"] = None
+            for key in ("secondes_audio", "secondes_audio_escaladees", "temps_rapide_s", "temps_complet_s"):
+                stats[key] = round(stats[key], 3)
+        return {code: {"modele_rapide": config["modele_rapide"],
+                       "seuil_confiance": config["cascade_confiance"],
+                       "seuil_similarite": config["cascade_similarite"],
+                       **cascade.get(code, {})}
+                for code, config in self.langues.items() if config.get("modele_rapide")}
+
+    def model_key(self, code):
+        """
+        Identifiant du modèle de la langue, sans le charger.
+        """
+        return model_key(self.langues[code]["modele"], self.backend, self.vad)
+
+    def feedback(self, code, similarite):
+        messages = self.langues[code]["feedback"]
+        for seuil, message in zip(SEUILS_FEEDBACK, messages):
+            if similarite >= seuil:
+                return message.format(similarite=similarite)
+        return messages[-1].format(similarite=similarite)
+
+    def stats(self):
+        return self.models.stats()
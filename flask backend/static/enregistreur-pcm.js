@@ -0,0 +1,205 @@
+// Enregistrement en PCM 16 bits mono à 16 kHz, la fréquence du modèle :
+// l'audio est rééchantillonné par le navigateur et le serveur le lit sans
+// décodage (audio/L16). Ce PCM alimente la lecture en direct ; l'envoi
+// classique est de l'Opus (~24 kbit/s au lieu de 256), enregistré en parallèle
+// par MediaRecorder, le PCM ne servant d'envoi que si Opus est indisponible.
+// Sans AudioWorklet, repli sur MediaRecorder seul.
+
+const FREQUENCE_PCM = 16000;
+
+// Opus en bande élargie (16 kHz) : largement suffisant pour le modèle
+const DEBIT_OPUS = 24000;
+const FORMATS_OPUS = ['audio/ogg;codecs=opus', 'audio/webm;codecs=opus'];
+
+function formatOpus() {
+  if (!window.MediaRecorder || !MediaRecorder.isTypeSupported) return null;
+  return FORMATS_OPUS.find(type => MediaRecorder.isTypeSupported(type)) || null;
+}
+
+function optionsOpus() {
+  const mimeType = formatOpus();
+  return mimeType ? { mimeType, audioBitsPerSecond: DEBIT_OPUS } : { audioBitsPerSecond: DEBIT_OPUS };
+}
+
+function nomFichierPour(mimeType) {
+  return mimeType && mimeType.startsWith('audio/ogg') ? 'recording.ogg' : 'recording.webm';
+}
+
+// Le processeur ne fait que transmettre les échantillons au thread principal
+const PROCESSEUR_PCM = `
+class CapturePCM extends AudioWorkletProcessor {
+  process(inputs) {
+    if (inputs[0].length) this.port.postMessage(inputs[0][0].slice(0));
+    return true;
+  }
+}
+registerProcessor('capture-pcm', CapturePCM);
+`;
+
+// Rééchantillonnage linéaire, si le navigateur impose sa propre fréquence
+function reechantillonner(samples, source, cible) {
+  if (source === cible) return samples;
+  const ratio = source / cible;
+  const out = new Float32Array(Math.floor(samples.length / ratio));
+  for (let i = 0; i < out.length; i++) {
+    const pos = i * ratio;
+    const j = Math.floor(pos);
+    const suivant = j + 1 < samples.length ? samples[j + 1] : samples[j];
+    out[i] = samples[j] + (suivant - samples[j]) * (pos - j);
+  }
+  return out;
+}
+
+function versInt16(samples) {
+  const out = new Int16Array(samples.length);
+  for (let i = 0; i < samples.length; i++) {
+    const s = Math.max(-1, Math.min(1, samples[i]));
+    out[i] = s < 0 ? s * 0x8000 : s * 0x7fff;
+  }
+  return out;
+}
+
+class EnregistreurPCM {
+  // onChunk(ArrayBuffer) reçoit un morceau PCM toutes les intervalleMs millisecondes
+  constructor(stream, { onChunk = null, intervalleMs = 1000 } = {}) {
+    this.stream = stream;
+    this.onChunk = onChunk;
+    this.intervalleMs = intervalleMs;
+    this.format = 'pcm16';
+    this.nomFichier = 'recording.pcm';
+    this.morceaux = [];
+    this.enAttente = [];
+    this.longueurEnAttente = 0;
+  }
+
+  async demarrer() {
+    try {
+      this.contexte = new AudioContext({ sampleRate: FREQUENCE_PCM });
+    } catch (err) {
+      // Fréquence refusée (anciens navigateurs) : rééchantillonnage en JS
+      this.contexte = new AudioContext();
+    }
+    const url = URL.createObjectURL(new Blob([PROCESSEUR_PCM], { type: 'application/javascript' }));
+    await this.contexte.audioWorklet.addModule(url);
+    URL.revokeObjectURL(url);
+
+    this.source = this.contexte.createMediaStreamSource(this.stream);
+    this.noeud = new AudioWorkletNode(this.contexte, 'capture-pcm', {
+      numberOfOutputs: 0, channelCount: 1, channelCountMode: 'explicit'
+    });
+    this.noeud.port.onmessage = event => this._recevoir(event.data);
+    this.source.connect(this.noeud);
+
+    // Envoi classique en Opus ; sans Opus, l'envoi sera le PCM (audio/L16)
+    if (formatOpus()) {
+      this.morceauxOpus = [];
+      this.compresseur = new MediaRecorder(this.stream, optionsOpus());
+      this.compresseur.ondataavailable = event => this.morceauxOpus.push(event.data);
+      this.compresseur.start();
+    }
+  }
+
+  _recevoir(samples) {
+    this.enAttente.push(samples);
+    this.longueurEnAttente += samples.length;
+    if (this.longueurEnAttente >= this.contexte.sampleRate * this.intervalleMs / 1000) {
+      this._vider();
+    }
+  }
+
+  _vider() {
+    if (!this.longueurEnAttente) return;
+    const samples = new Float32Array(this.longueurEnAttente);
+    let offset = 0;
+    for (const bloc of this.enAttente) {
+      samples.set(bloc, offset);
+      offset += bloc.length;
+    }
+    this.enAttente = [];
+    this.longueurEnAttente = 0;
+    const pcm = versInt16(reechantillonner(samples, this.contexte.sampleRate, FREQUENCE_PCM));
+    if (!this.compresseur) this.morceaux.push(pcm);
+    if (this.onChunk) this.onChunk(pcm.buffer);
+  }
+
+  _arreterCompresseur() {
+    return new Promise(resolve => {
+      this.compresseur.onstop = () => resolve(new Blob(this.morceauxOpus, { type: this.compresseur.mimeType }));
+      this.compresseur.stop();
+    });
+  }
+
+  // Renvoie l'enregistrement complet à envoyer (Blob Opus, ou audio/L16 sans Opus)
+  async arreter() {
+    this.source.disconnect();
+    this.noeud.port.onmessage = null;
+    this._vider();
+    const opus = this.compresseur ? await this._arreterCompresseur() : null;
+    this.stream.getTracks().forEach(track => track.stop());
+    await this.contexte.close();
+    if (opus) {
+      this.nomFichier = nomFichierPour(opus.type);
+      return opus;
+    }
+    return new Blob(this.morceaux, { type: `audio/L16;rate=${FREQUENCE_PCM};channels=1` });
+  }
+}
+
+// Repli : MediaRecorder seul (Opus en WebM/Ogg, décodé par le serveur)
+class EnregistreurMediaRecorder {
+  constructor(stream, { onChunk = null, intervalleMs = 1000 } = {}) {
+    this.stream = stream;
+    this.onChunk = onChunk;
+    this.intervalleMs = intervalleMs;
+    this.format = null;
+    this.nomFichier = 'recording.webm';
+    this.morceaux = [];
+    this.envoiEnCours = Promise.resolve();
+  }
+
+  async demarrer() {
+    this.recorder = new MediaRecorder(this.stream, optionsOpus());
+    this.nomFichier = nomFichierPour(this.recorder.mimeType);
+    this.recorder.ondataavailable = event => {
+      this.morceaux.push(event.data);
+      if (this.onChunk) {
+        // Les morceaux sont transmis dans l'ordre d'enregistrement
+        this.envoiEnCours = this.envoiEnCours.then(async () => this.onChunk(await event.data.arrayBuffer()));
+      }
+    };
+    if (this.onChunk) {
+      this.recorder.start(this.intervalleMs);
+    } else {
+      this.recorder.start();
+    }
+  }
+
+  arreter() {
+    return new Promise(resolve => {
+      this.recorder.onstop = async () => {
+        await this.envoiEnCours;
+        this.stream.getTracks().forEach(track => track.stop());
+        resolve(new Blob(this.morceaux, { type: this.recorder.mimeType }));
+      };
+      this.recorder.stop();
+    });
+  }
+}
+
+async function creerEnregistreur(options) {
+  const stream = await navigator.mediaDevices.getUserMedia({
+    audio: { channelCount: 1, echoCancellation: true, noiseSuppression: true }
+  });
+  if (window.AudioWorkletNode) {
+    try {
+      const enregistreur = new EnregistreurPCM(stream, options);
+      await enregistreur.demarrer();
+      return enregistreur;
+    } catch (err) {
+      console.warn("Capture PCM indisponible, repli sur MediaRecorder :", err);
+    }
+  }
+  const enregistreur = new EnregistreurMediaRecorder(stream, options);
+  await enregistreur.demarrer();
+  return enregistreur;
+}
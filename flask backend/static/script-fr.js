@@ -1,5 +1,5 @@
-let mediaRecorder;
-let audioChunks = [];
+let enregistreur = null;
+let liveSocket = null;
 
 // Validation du texte
 document.getElementById("validate-text").addEventListener("click", () => {
@@ -15,54 +15,114 @@ document.getElementById("validate-text").addEventListener("click", () => {
   document.querySelector(".text-section").style.display = "none";
 });
 
-// Enregistrement
-const recordBtn = document.getElementById("record-btn");
-const stopBtn = document.getElementById("stop-btn");
-
-recordBtn.addEventListener("click", async () => {
-  const stream = await navigator.mediaDevices.getUserMedia({ audio: true });
-  mediaRecorder = new MediaRecorder(stream);
-  audioChunks = [];
+function afficherResultat(data) {
+  document.getElementById("transcription").textContent = data.transcription || '❌';
+  document.getElementById("similarity").textContent = data.similarite ? data.similarite + "%" : '❌';
+  document.getElementById("feedback").textContent = data.feedback || '❌';
+}
 
-  mediaRecorder.ondataavailable = event => audioChunks.push(event.data);
+// Adresse du WebSocket sur le serveur qui a servi la page (https → wss)
+const URL_DIRECT = `${location.protocol === 'https:' ? 'wss:' : 'ws:'}//${location.host}/ws/evaluate`;
 
-  mediaRecorder.onstop = async () => {
-    const audioBlob = new Blob(audioChunks, { type: 'audio/wav' });
-    const formData = new FormData();
-    formData.append('audio', audioBlob, 'recording.wav');
-    const targetText = document.getElementById("target-text").textContent;
-    formData.append('target_text', targetText);
+// Lecture en direct (si le serveur l'active : ASR_LIVE=1) : les morceaux audio sont
+// envoyés pendant l'enregistrement ; sinon la connexion échoue et l'envoi classique prend le relais
+function ouvrirSessionDirecte() {
+  return new Promise(resolve => {
+    const socket = new WebSocket(URL_DIRECT);
+    socket.binaryType = 'arraybuffer';
 
-    try {
-      const res = await fetch('http://localhost:5000/evaluate-fr', {
-        method: 'POST',
-        body: formData
-      });
+    // socket.reponse : true dès la réponse finale (ou une erreur du serveur),
+    // false si la connexion se ferme avant (l'envoi classique prend alors le relais)
+    let repondre;
+    socket.reponse = new Promise(r => { repondre = r; });
+    socket.onclose = () => repondre(false);
 
-      const data = await res.json();
+    // Le message d'initialisation est envoyé une fois le format d'enregistrement connu
+    socket.onopen = () => resolve(socket);
+    socket.onerror = () => resolve(null);
 
-      if (data.error) {
+    socket.onmessage = event => {
+      const data = JSON.parse(event.data);
+      if (data.type === 'partiel') {
+        document.getElementById("transcription").textContent = data.transcription || '...';
+        document.getElementById("similarity").textContent = data.similarite + "%";
+      } else if (data.type === 'final') {
+        repondre(true);
+        afficherResultat(data);
+        socket.close();
+      } else if (data.type === 'erreur') {
+        repondre(true);
         alert(`Erreur : ${data.error}`);
-        return;
+        socket.close();
       }
+    };
+  });
+}
 
-      document.getElementById("transcription").textContent = data.transcription || '❌';
-      document.getElementById("similarity").textContent = data.similarite ? data.similarite + "%" : '❌';
-      document.getElementById("feedback").textContent = data.feedback || '❌';
+// Envoi classique après l'arrêt (si le WebSocket n'est pas disponible ou a été coupé)
+async function envoyerEnregistrement(audioBlob, nomFichier) {
+  const formData = new FormData();
+  formData.append('audio', audioBlob, nomFichier);
+  const targetText = document.getElementById("target-text").textContent;
+  formData.append('target_text', targetText);
 
-    } catch (err) {
-      console.error("Erreur:", err);
-      alert("Échec de l'envoi de l'audio.");
+  try {
+    const res = await fetch('/evaluate-fr', {
+      method: 'POST',
+      body: formData
+    });
+
+    const data = await res.json();
+
+    if (data.error) {
+      alert(`Erreur : ${data.error}`);
+      return;
     }
-  };
 
-  mediaRecorder.start();
+    afficherResultat(data);
+
+  } catch (err) {
+    console.error("Erreur:", err);
+    alert("Échec de l'envoi de l'audio.");
+  }
+}
+
+// Enregistrement
+const recordBtn = document.getElementById("record-btn");
+const stopBtn = document.getElementById("stop-btn");
+
+recordBtn.addEventListener("click", async () => {
+  const targetText = document.getElementById("target-text").textContent;
+  liveSocket = await ouvrirSessionDirecte();
+
+  // En mode direct, un morceau par seconde est envoyé pendant l'enregistrement
+  const onChunk = liveSocket ? chunk => {
+    if (liveSocket.readyState === WebSocket.OPEN) liveSocket.send(chunk);
+  } : null;
+  enregistreur = await creerEnregistreur({ onChunk, intervalleMs: 1000 });
+
+  if (liveSocket) {
+    const init = { target_text: targetText, langue: 'fr' };
+    if (enregistreur.format === 'pcm16') {
+      // PCM 16 bits mono à 16 kHz : pas de décodage côté serveur
+      init.format = 'pcm16';
+      init.frequence = FREQUENCE_PCM;
+    }
+    liveSocket.send(JSON.stringify(init));
+  }
   recordBtn.disabled = true;
   stopBtn.disabled = false;
 });
 
-stopBtn.addEventListener("click", () => {
-  mediaRecorder.stop();
+stopBtn.addEventListener("click", async () => {
   recordBtn.disabled = false;
   stopBtn.disabled = true;
+  const audioBlob = await enregistreur.arreter();
+  if (liveSocket && liveSocket.readyState === WebSocket.OPEN) {
+    // Fin signalée après l'envoi du dernier morceau
+    liveSocket.send(JSON.stringify({ type: 'stop' }));
+    if (await liveSocket.reponse) return;
+  }
+  // Pas de session directe, ou connexion perdue avant la réponse finale
+  await envoyerEnregistrement(audioBlob, enregistreur.nomFichier);
 });
@@ -0,0 +1,129 @@
+import numpy as np
+import soundfile as sf
+import soxr
+import torch
+from audio_ingest import load_audio_file
+from ctc_inference import batch_log_probs
+from metrics import timed
+
+# Champ réceptif de l'encodeur convolutif de wav2vec2 : en dessous, aucune trame n'est produite
+MIN_WINDOW_SAMPLES = 400
+
+
+def iter_audio_blocks(audio_path, sample_rate=16000, block_s=5.0):
+    """
+    Lit un fichier audio par blocs (mono, float32, rééchantillonné à sample_rate)
+    sans charger tout le fichier en mémoire.
+    Les formats non lisibles par soundfile (ex. webm) sont décodés en entier (voir audio_ingest).
+    """
+    try:
+        info = sf.info(audio_path)
+    except Exception:
+        speech_array = load_audio_file(audio_path, sample_rate)
+        block = int(block_s * sample_rate)
+        for start in range(0, len(speech_array), block):
+            yield speech_array[start:start + block]
+        return
+
+    resampler = None
+    if info.samplerate != sample_rate:
+        resampler = soxr.ResampleStream(info.samplerate, sample_rate, 1, dtype="float32")
+
+    blocksize = int(block_s * info.samplerate)
+    for block in sf.blocks(audio_path, blocksize=blocksize, dtype="float32", always_2d=True):
+        block = block.mean(axis=1)
+        if resampler is not None:
+            block = resampler.resample_chunk(block)
+        if len(block):
+            yield block
+
+    if resampler is not None:
+        tail = resampler.resample_chunk(np.zeros(0, dtype=np.float32), last=True)
+        if len(tail):
+            yield tail
+
+
+def decode_windows(processor, model, windows, sample_rate=16000):
+    """
+    Passe un lot de fenêtres (audio, recouvrement gauche, recouvrement droit ;
+    en échantillons) dans le modèle en une seule fois et renvoie, pour chaque
+    fenêtre, les identifiants prédits hors des zones de recouvrement.
+    """
+    batch = batch_log_probs(processor, model, [window for window, _, _ in windows], sample_rate)
+    ids = []
+    with timed("decodage_ctc"):
+        for (window, left, right), log_probs in zip(windows, batch):
+            ratio = log_probs.shape[0] / len(window)
+            start = int(round(left * ratio))
+            end = log_probs.shape[0] - int(round(right * ratio))
+            ids.append(torch.argmax(log_probs[start:end], dim=-1).tolist())
+    return ids
+
+
+class ChunkedCTCDecoder:
+    """
+    Décodeur CTC par fenêtres glissantes avec recouvrement.
+    Chaque fenêtre de chunk_length_s secondes est passée au modèle ; les trames
+    situées dans les zones de recouvrement (stride) sont écartées et les
+    prédictions restantes sont concaténées, de sorte que la mémoire utilisée par
+    le modèle reste bornée quelle que soit la durée de l'enregistrement.
+    """
+
+    def __init__(self, processor, model, sample_rate=16000, chunk_length_s=20.0, stride_length_s=4.0):
+        self.processor = processor
+        self.model = model
+        self.sample_rate = sample_rate
+
+        self.chunk_len = int(chunk_length_s * sample_rate)
+        self.stride = int(stride_length_s * sample_rate)
+        if self.chunk_len <= 2 * self.stride:
+            raise ValueError("chunk_length_s doit être supérieur à 2 * stride_length_s")
+        self.step = self.chunk_len - 2 * self.stride
+
+        self._buffer = np.zeros(0, dtype=np.float32)
+        self._first = True
+        self._ids = []
+
+    def _run_window(self, window, left, right):
+        """
+        Passe une fenêtre au modèle et conserve les identifiants prédits
+        hors des zones de recouvrement gauche/droite (en échantillons).
+        """
+        self._ids.extend(decode_windows(self.processor, self.model, [(window, left, right)], self.sample_rate)[0])
+
+    def feed(self, samples):
+        """
+        Ajoute des échantillons et traite toutes les fenêtres complètes.
+        Renvoie True si de nouvelles prédictions ont été produites.
+        """
+        self._buffer = np.concatenate([self._buffer, np.asarray(samples, dtype=np.float32)])
+        produced = False
+        while len(self._buffer) >= self.chunk_len:
+            window = self._buffer[:self.chunk_len]
+            left = 0 if self._first else self.stride
+            self._run_window(window, left, self.stride)
+
+            # La fenêtre suivante commence stride échantillons avant la fin de la zone conservée
+            self._buffer = self._buffer[self.step:]
+            self._first = False
+            produced = True
+        return produced
+
+    def finish(self):
+        """
+        Traite la fin de l'audio (fenêtre incomplète, sans recouvrement à droite).
+        """
+        left = 0 if self._first else self.stride
+        if len(self._buffer) > left and len(self._buffer) >= MIN_WINDOW_SAMPLES:
+            self._run_window(self._buffer, left, 0)
+        self._buffer = np.zeros(0, dtype=np.float32)
+        return self.transcription()
+
+    def transcription(self):
+        """
+        Transcription partielle à partir des prédictions accumulées.
+        Le décodage CTC fusionne les répétitions aux frontières des fenêtres.
+        """
+        if not self._ids:
+            return ""
+        return self.processor.decode(self._ids)
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Les modules de l'application sont importés comme dans app.py (répertoire courant du serveur)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
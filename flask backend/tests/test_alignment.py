@@ -0,0 +1,97 @@
+import random
+import pytest
+from alignment import (DELETE, EQUAL, INSERT, SUBSTITUTE, align, lcs_length, levenshtein,
+                       similarity_ratio, symbol_masks)
+
+
+def lcs_reference(a, b):
+    prev = [0] * (len(b) + 1)
+    for x in a:
+        row = [0]
+        for j, y in enumerate(b):
+            row.append(prev[j] + 1 if x == y else max(prev[j + 1], row[j]))
+        prev = row
+    return prev[-1]
+
+
+def levenshtein_reference(a, b):
+    prev = list(range(len(b) + 1))
+    for i, x in enumerate(a, start=1):
+        row = [i]
+        for j, y in enumerate(b, start=1):
+            row.append(min(prev[j] + 1, row[j - 1] + 1, prev[j - 1] + (x != y)))
+        prev = row
+    return prev[-1]
+
+
+def verifier_alignement(ref, hyp, distance, operations):
+    # Les opérations reconstruisent les deux séquences et coûtent exactement la distance
+    assert [o for kind, o, _ in operations if kind != INSERT] == list(ref)
+    assert [h for kind, _, h in operations if kind != DELETE] == list(hyp)
+    for kind, o, h in operations:
+        assert kind in (EQUAL, SUBSTITUTE, INSERT, DELETE)
+        if kind == EQUAL:
+            assert o == h
+        elif kind == SUBSTITUTE:
+            assert o != h
+    assert sum(kind != EQUAL for kind, _, _ in operations) == distance
+
+
+CAS_LIMITES = [
+    ("", ""),
+    ("", "abc"),
+    ("abc", ""),
+    ("abcabc", "abcabc"),
+    ("aaaa", "bbbbbb"),
+    ("a" * 70, "a" * 70),
+    ("ab" * 40, "cd" * 33),
+]
+
+
+def sequences_aleatoires(seed, n=300):
+    rng = random.Random(seed)
+    for _ in range(n):
+        alphabet = "abcde"[:rng.randint(1, 5)]
+        # Longueurs de part et d'autre de 64 (mots machine) pour les vecteurs de bits
+        a = "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 130)))
+        if rng.random() < 0.3:
+            # Variante proche : quelques modifications de a
+            b = list(a)
+            for _ in range(rng.randint(0, 5)):
+                pos = rng.randint(0, len(b))
+                choix = rng.random()
+                if choix < 0.33 and pos < len(b):
+                    b[pos] = rng.choice(alphabet)
+                elif choix < 0.66 and pos < len(b):
+                    del b[pos]
+                else:
+                    b.insert(pos, rng.choice(alphabet))
+            b = "".join(b)
+        else:
+            b = "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 130)))
+        yield a, b
+
+
+@pytest.mark.parametrize("a,b", CAS_LIMITES + list(sequences_aleatoires(2024)))
+def test_distances_egales_a_la_reference(a, b):
+    lcs = lcs_reference(a, b)
+    distance = levenshtein_reference(a, b)
+    assert lcs_length(a, b) == lcs
+    assert lcs_length(a, b, symbol_masks(a)) == lcs
+    assert levenshtein(a, b) == distance
+    assert levenshtein(a, b, symbol_masks(a)) == distance
+    total = len(a) + len(b)
+    assert similarity_ratio(a, b) == (2.0 * lcs / total if total else 1.0)
+
+
+@pytest.mark.parametrize("a,b", CAS_LIMITES + list(sequences_aleatoires(7, n=150)))
+def test_alignement_en_bande_optimal(a, b):
+    # Listes de mots, comme pour la comparaison au texte cible
+    ref, hyp = [f"m{c}" for c in a], [f"m{c}" for c in b]
+    distance, operations = align(ref, hyp)
+    assert distance == levenshtein_reference(ref, hyp)
+    verifier_alignement(ref, hyp, distance, operations)
+
+    distance, operations = align(ref, hyp, symbol_masks(ref))
+    assert distance == levenshtein_reference(ref, hyp)
+    verifier_alignement(ref, hyp, distance, operations)
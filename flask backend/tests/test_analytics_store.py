@@ -0,0 +1,33 @@
+import sqlite3
+import pytest
+from alignment import DELETE, EQUAL, INSERT, SUBSTITUTE
+from analytics_store import AnalyticsStore, missed_words
+from evaluation_store import sqlite_pool
+
+
+def test_mots_manques_sans_ponctuation():
+    report = {"alignement": [
+        (EQUAL, "Le", "Le"),
+        (SUBSTITUTE, "dort.", "dort"),
+        (SUBSTITUTE, "Il", "il"),
+        (DELETE, "rêve,", None),
+        (DELETE, "«", None),
+        (SUBSTITUTE, "l'enfant", "enfant"),
+        (INSERT, None, "euh"),
+        (DELETE, "نام،", None),
+    ]}
+    assert missed_words(report) == ["rêve", "l'enfant", "نام"]
+
+
+def test_schema_cree_au_premier_acces(tmp_path):
+    pool = sqlite_pool(str(tmp_path / "eval.db"))
+    connect = pool._connect
+    pool._connect = lambda: (_ for _ in ()).throw(sqlite3.OperationalError("base injoignable"))
+
+    # Base injoignable : la construction n'échoue pas, le premier accès si
+    analytics = AnalyticsStore(pool, "sqlite", "?")
+    with pytest.raises(sqlite3.OperationalError):
+        analytics.passages()
+
+    pool._connect = connect
+    assert analytics.passages() == []
@@ -0,0 +1,56 @@
+import io
+import numpy as np
+import soundfile as sf
+from audio_archive import AudioArchive
+from logit_store import LogitStore
+
+
+def signal(seconds=3, sample_rate=16000):
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    return (0.2 * np.sin(2 * np.pi * 220 * t)).astype(np.float32)
+
+
+def encoder(speech_array, format, subtype):
+    buffer = io.BytesIO()
+    sf.write(buffer, speech_array, 16000, format=format, subtype=subtype)
+    return buffer.getvalue()
+
+
+def test_original_garde_si_plus_petit(tmp_path):
+    archive = AudioArchive(str(tmp_path), codec="flac")
+    speech_array = signal()
+    upload = encoder(speech_array, "OGG", "OPUS")
+    rid = archive.store("fr", upload, speech_array)
+    archive.flush()
+
+    entry = archive.lookup(rid)
+    assert entry["codec"] == "original"
+    assert entry["octets"] == len(upload)
+    archive.close()
+
+
+def test_reencodage_garde_si_plus_petit(tmp_path):
+    archive = AudioArchive(str(tmp_path))
+    speech_array = signal()
+    upload = encoder(speech_array, "WAV", "PCM_16")
+    rid = archive.store("ar", upload, speech_array)
+    archive.flush()
+
+    entry = archive.lookup(rid)
+    assert entry["codec"] == "opus"
+    assert entry["octets"] < len(upload)
+    archive.close()
+
+
+def test_purge_supprime_les_log_probabilites(tmp_path):
+    logits = LogitStore(str(tmp_path / "logits"))
+    archive = AudioArchive(str(tmp_path), on_purge=logits.delete)
+    speech_array = signal()
+    rid = archive.store("ar", encoder(speech_array, "WAV", "PCM_16"), speech_array)
+    archive.flush()
+    logits.save(rid, "modele:cpu", np.zeros((10, 4)))
+
+    assert archive.purge(max_bytes=1) == 1
+    assert archive.lookup(rid) is None
+    assert logits.load(rid, "modele:cpu") is None
+    archive.close()
@@ -0,0 +1,27 @@
+import io
+import numpy as np
+import pytest
+import soundfile as sf
+from audio_ingest import decode_audio, decode_upload
+
+
+def wav(samples, sample_rate=16000):
+    buf = io.BytesIO()
+    sf.write(buf, samples, sample_rate, format="WAV")
+    return buf.getvalue()
+
+
+def test_wav_reechantillonne():
+    audio = decode_audio(wav(np.zeros(8000, dtype=np.float32), 8000))
+    assert audio.dtype == np.float32 and len(audio) == 16000
+
+
+@pytest.mark.parametrize("data", [b"pas un fichier audio", b"\x1a\x45\xdf\xa3tronque", wav(np.zeros(0))])
+def test_audio_illisible_ou_vide_est_une_erreur_client(data):
+    with pytest.raises(ValueError):
+        decode_audio(data)
+
+
+def test_pcm_sans_echantillon():
+    with pytest.raises(ValueError):
+        decode_upload(b"\x00", "audio/L16", {"rate": "16000"})
@@ -0,0 +1,104 @@
+import sqlite3
+import pytest
+from analytics_store import AnalyticsStore
+from evaluation_store import EvaluationWriter, sqlite_pool
+
+
+def compter(path, table="record"):
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def echouer(n, fonction):
+    """
+    Enveloppe qui lève sqlite3.OperationalError aux n premiers appels.
+    """
+    restants = [n]
+
+    def enveloppe(*args, **kwargs):
+        if restants[0] > 0:
+            restants[0] -= 1
+            raise sqlite3.OperationalError("panne simulée")
+        return fonction(*args, **kwargs)
+    return enveloppe
+
+
+def test_connexion_fermee_remplacee(tmp_path):
+    pool = sqlite_pool(str(tmp_path / "eval.db"))
+    conn = pool.acquire()
+    conn.close()
+    pool.release(conn)
+    conn = pool.acquire()
+    assert conn.execute("SELECT 1").fetchone() == (1,)
+    pool.release(conn)
+
+
+def test_echec_de_connexion_reessaye_sans_perte(tmp_path):
+    path = str(tmp_path / "eval.db")
+    pool = sqlite_pool(path)
+    pool._connect = echouer(2, pool._connect)
+    writer = EvaluationWriter(pool, placeholder="?", flush_interval_s=0.01, retry_backoff_s=0.01)
+    for i in range(20):
+        writer.enregistrer("ar", f"audio-{i}", 50.0, "ok")
+    writer.close()
+
+    assert compter(path) == 20
+    stats = writer.stats()
+    assert stats["echecs"] == 2
+    assert stats["perdues"] == 0
+
+
+def test_echec_en_cours_de_transaction_sans_doublon(tmp_path):
+    # L'échec survient après l'insertion des lignes d'évaluation, pendant la
+    # mise à jour des agrégats : le lot est annulé puis réécrit une seule fois.
+    path = str(tmp_path / "eval.db")
+    pool = sqlite_pool(path)
+    analytics = AnalyticsStore(pool, "sqlite", "?")
+    analytics.apply = echouer(1, analytics.apply)
+    writer = EvaluationWriter(pool, placeholder="?", flush_interval_s=0.01, retry_backoff_s=0.01,
+                              analytics=analytics)
+    report = {"texte_original": "le chat dort", "alignement": [], "mots_communs": 3,
+              "mots_manquants": 0, "mots_supplementaires": 0}
+    for i in range(10):
+        writer.enregistrer("fr", f"audio-{i}", 100.0, "ok", report)
+    writer.flush()
+
+    assert compter(path, "recorder") == 10
+    assert sum(p["evaluations"] for p in analytics.passages()) == 10
+    assert writer.stats()["perdues"] == 0
+    writer.close()
+
+
+def test_lot_abandonne_apres_les_essais(tmp_path):
+    path = str(tmp_path / "eval.db")
+    pool = sqlite_pool(path)
+    pool._connect = echouer(3, pool._connect)
+    writer = EvaluationWriter(pool, placeholder="?", flush_interval_s=0.01, max_retries=2, retry_backoff_s=0.01)
+    writer.enregistrer("ar", "audio-perdu", 10.0, "ok")
+    writer.flush()
+    writer.enregistrer("ar", "audio-suivant", 10.0, "ok")
+    writer.close()
+
+    assert compter(path) == 1
+    assert writer.stats()["perdues"] == 1
+
+
+def test_langue_enregistree_avec_son_code(tmp_path):
+    path = str(tmp_path / "eval.db")
+    tables = {"ar": ("record", "language"), "fr": ("recorder", "langue"), "es": ("recorder", "langue")}
+    writer = EvaluationWriter(sqlite_pool(path, tables=tables), placeholder="?", flush_interval_s=0.01,
+                              tables=tables)
+    writer.enregistrer("es", "audio-es", 80.0, "ok")
+    with pytest.raises(ValueError):
+        writer.enregistrer("de", "audio-de", 80.0, "ok")
+    writer.close()
+
+    conn = sqlite3.connect(path)
+    try:
+        assert conn.execute("SELECT langue FROM recorder").fetchall() == [("es",)]
+        assert conn.execute("SELECT COUNT(*) FROM record").fetchone()[0] == 0
+    finally:
+        conn.close()
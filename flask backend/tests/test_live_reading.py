@@ -0,0 +1,36 @@
+import numpy as np
+from live_reading import LiveReadingSession
+
+
+def pcm(seconds, sample_rate=16000):
+    return np.zeros(int(seconds * sample_rate), dtype="<i2").tobytes()
+
+
+def test_fenetres_avec_recouvrement_et_fin_seule_a_l_arret():
+    fenetres = []
+
+    def transcrire(window):
+        fenetres.append((len(window.audio), window.left, window.right, len(window.prefix)))
+        return [1] * 10, f"mot{len(fenetres)}"
+
+    session = LiveReadingSession(transcrire, "un deux trois", window_s=6, stride_s=1, pcm_rate=16000)
+    try:
+        assert session.add_chunk(pcm(5)) is None
+        assert session.add_chunk(pcm(5))["transcription"] == "mot2"
+        assert len(session.finish()) == 10 * 16000
+    finally:
+        session.discard()
+
+    # Fenêtres de 6 s avançant de 4 s, puis la fin (2 s) sans recouvrement à droite
+    assert fenetres == [(96000, 0, 16000, 0), (96000, 16000, 16000, 10), (32000, 16000, 0, 20)]
+    assert session.transcription == "mot3"
+
+
+def test_fenetre_perdue_impose_une_evaluation_complete():
+    session = LiveReadingSession(lambda window: None, "un deux", window_s=6, stride_s=1, pcm_rate=16000)
+    try:
+        assert session.add_chunk(pcm(7)) is None
+        session.finish()
+    finally:
+        session.discard()
+    assert session.transcription is None
@@ -0,0 +1,19 @@
+import metrics
+from metrics import timed
+from micro_batcher import MicroBatcher
+
+
+def test_etapes_du_lot_dans_la_trace_de_la_requete():
+    def lot(items):
+        with timed("inference", langue="fr"):
+            return [item * 2 for item in items]
+
+    batcher = MicroBatcher(lot, window_ms=1)
+    trace = metrics.start_trace()
+    assert batcher(21, timeout=5) == 42
+    assert [etape for etape, _ in trace] == ["inference"]
+
+    # Sans trace active, rien n'est collecté
+    metrics.current_trace.set(None)
+    assert batcher(1, timeout=5) == 2
+    assert [etape for etape, _ in trace] == ["inference"]
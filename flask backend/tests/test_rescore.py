@@ -0,0 +1,35 @@
+import numpy as np
+from logit_store import LogitStore
+from rescore import rescorer, split_segments
+
+
+class Processeur:
+    # Décodage CTC glouton minimal : répétitions fusionnées, blanc (0) retiré
+    alphabet = "_abc"
+
+    def decode(self, ids):
+        ids = [int(i) for i in ids]
+        return "".join(self.alphabet[i] for j, i in enumerate(ids) if i and (j == 0 or ids[j - 1] != i))
+
+
+def log_probs(ids, vocab=4):
+    lp = np.full((len(ids), vocab), -10.0, dtype=np.float16)
+    lp[np.arange(len(ids)), ids] = 0.0
+    return lp
+
+
+def test_segments_decodes_separement_et_temps_absolus(tmp_path):
+    store = LogitStore(str(tmp_path))
+    # Deux segments de parole séparés par un silence retiré : "ab" puis "bc"
+    segments = [[0, 0.5, 0.56], [3, 2.0, 2.06]]
+    store.save("rid", "modele:torch", log_probs([1, 2, 2, 2, 3, 3]), segments=segments)
+    lp, seg = store.load("rid", "modele:torch"), store.load_segments("rid", "modele:torch")
+
+    assert rescorer(lp, Processeur(), "ab bc", "base", segments=seg)["transcription"] == "ab bc"
+    # Sans les bornes, le CTC fusionne le "b" de part et d'autre de la frontière
+    assert rescorer(lp, Processeur(), "ab bc", "base")["transcription"] == "abc"
+
+    starts = np.concatenate([s for _, s in split_segments(lp, seg)])
+    np.testing.assert_allclose(starts, [0.5, 0.52, 0.54, 2.0, 2.02, 2.04])
+    assert store.delete(["rid"]) == 1
+    assert store.load_segments("rid", "modele:torch") is None
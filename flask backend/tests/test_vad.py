@@ -0,0 +1,8 @@
+from vad import VoiceActivityDetector
+
+
+def test_signature_suit_les_reglages():
+    reference = VoiceActivityDetector().signature()
+    assert VoiceActivityDetector(frame_ms=30.0, min_pause_s=0.8).signature() == reference
+    for reglage in ({"threshold_db": -30.0}, {"padding_s": 0.3}, {"min_speech_s": 0.2}, {"split": False}):
+        assert VoiceActivityDetector(**reglage).signature() != reference
@@ -0,0 +1,135 @@
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+import numpy as np
+
+
+class TranscriptionCache:
+    """
+    Cache des transcriptions adressé par contenu.
+    La clé est l'empreinte SHA-256 du signal décodé (PCM float32) et de
+    l'identifiant du modèle : un même enregistrement renvoyé (nouvel essai,
+    re-notation d'un fichier de audios/) ne repasse pas par le modèle.
+    Deux niveaux : une LRU en mémoire, puis un répertoire sur disque dont la
+    taille totale est bornée (les fichiers les moins récemment lus sont supprimés).
+    """
+
+    def __init__(self, cache_dir=None, max_memory_items=1024, max_disk_bytes=200 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_memory_items = max_memory_items
+        self.max_disk_bytes = max_disk_bytes
+
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits_memory = 0
+        self._hits_disk = 0
+        self._misses = 0
+        self._disk_evictions = 0
+
+        self._disk_sizes = {}
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+            for filename in os.listdir(cache_dir):
+                if filename.endswith(".txt"):
+                    self._disk_sizes[filename[:-4]] = os.path.getsize(os.path.join(cache_dir, filename))
+
+    @staticmethod
+    def key(speech_array, model_id, sample_rate=16000):
+        """
+        Empreinte du signal décodé et du modèle qui le transcrit.
+        """
+        h = hashlib.sha256(f"{model_id}|{sample_rate}|".encode("utf-8"))
+        h.update(np.ascontiguousarray(speech_array, dtype=np.float32).tobytes())
+        return h.hexdigest()
+
+    def _disk_path(self, key):
+        return os.path.join(self.cache_dir, key + ".txt")
+
+    def _remember(self, key, transcription):
+        # Appelé avec self._lock
+        self._memory[key] = transcription
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_items:
+            self._memory.popitem(last=False)
+
+    def get(self, key):
+        """
+        Renvoie la transcription en cache, ou None.
+        """
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self._hits_memory += 1
+                return self._memory[key]
+            on_disk = key in self._disk_sizes
+
+        if on_disk:
+            try:
+                path = self._disk_path(key)
+                with open(path, "r", encoding="utf-8") as f:
+                    transcription = f.read()
+                os.utime(path)  # ordre de lecture pour l'éviction
+                with self._lock:
+                    self._hits_disk += 1
+                    self._remember(key, transcription)
+                return transcription
+            except OSError:
+                with self._lock:
+                    self._disk_sizes.pop(key, None)
+
+        with self._lock:
+            self._misses += 1
+        return None
+
+    def put(self, key, transcription):
+        with self._lock:
+            self._remember(key, transcription)
+            if not self.cache_dir or key in self._disk_sizes:
+                return
+
+        data = transcription.encode("utf-8")
+        with open(self._disk_path(key), "wb") as f:
+            f.write(data)
+        with self._lock:
+            self._disk_sizes[key] = len(data)
+        self._evict_disk()
+
+    def _evict_disk(self):
+        with self._lock:
+            total = sum(self._disk_sizes.values())
+            if total <= self.max_disk_bytes:
+                return
+            keys = list(self._disk_sizes)
+
+        def last_read(key):
+            try:
+                return os.path.getmtime(self._disk_path(key))
+            except OSError:
+                return 0
+
+        for key in sorted(keys, key=last_read):
+            if total <= self.max_disk_bytes:
+                break
+            try:
+                os.remove(self._disk_path(key))
+            except OSError:
+                pass
+            with self._lock:
+                total -= self._disk_sizes.pop(key, 0)
+                self._disk_evictions += 1
+
+    def stats(self):
+        with self._lock:
+            hits = self._hits_memory + self._hits_disk
+            requests = hits + self._misses
+            return {
+                "hits_memoire": self._hits_memory,
+                "hits_disque": self._hits_disk,
+                "misses": self._misses,
+                "taux_hits": (hits / requests) if requests else 0.0,
+                "elements_memoire": len(self._memory),
+                "elements_disque": len(self._disk_sizes),
+                "taille_disque_octets": sum(self._disk_sizes.values()),
+                "evictions_disque": self._disk_evictions,
+            }
@@ -0,0 +1,124 @@
+import hashlib
+import threading
+import numpy as np
+
+# Taille minimale d'un segment envoyé au modèle (champ réceptif de l'encodeur wav2vec2)
+MIN_SEGMENT_SAMPLES = 400
+
+
+class VoiceActivityDetector:
+    """
+    Détection d'activité vocale par énergie, avant l'inférence.
+    Le silence de début et de fin est supprimé et les pauses plus longues que
+    min_pause_s découpent l'audio en segments, transcrits ensemble dans le même
+    lot : le modèle ne voit plus les trames de silence.
+    """
+
+    def __init__(self, frame_ms=30, threshold_db=-35.0, floor_db=-55.0, min_pause_s=0.8,
+                 padding_s=0.2, min_speech_s=0.1, split=True):
+        """
+        threshold_db : seuil relatif au niveau de la trame la plus forte ;
+        floor_db : seuil absolu minimal (dBFS), pour les enregistrements très faibles.
+        split : découper sur les pauses longues, sinon seulement rogner début et fin.
+        """
+        self.frame_ms = frame_ms
+        self.threshold_db = threshold_db
+        self.floor_db = floor_db
+        self.min_pause_s = min_pause_s
+        self.padding_s = padding_s
+        self.min_speech_s = min_speech_s
+        self.split = split
+
+        self._lock = threading.Lock()
+        self._total_s = 0.0
+        self._skipped_s = 0.0
+        self._segments = 0
+        self._audios = 0
+
+    def params(self):
+        """
+        Réglages qui déterminent les segments produits.
+        """
+        return {
+            "frame_ms": self.frame_ms, "threshold_db": self.threshold_db, "floor_db": self.floor_db,
+            "min_pause_s": self.min_pause_s, "padding_s": self.padding_s,
+            "min_speech_s": self.min_speech_s, "split": self.split,
+        }
+
+    def signature(self):
+        """
+        Empreinte courte des réglages (clé de cache) : changer un réglage
+        change les segments, donc les transcriptions.
+        """
+        # 30 et 30.0 donnent la même empreinte (réglages lus dans l'environnement ou par défaut)
+        text = ",".join(f"{name}={value if isinstance(value, bool) else float(value)!r}"
+                        for name, value in sorted(self.params().items()))
+        return hashlib.sha1(text.encode()).hexdigest()[:10]
+
+    def speech_ranges(self, speech_array, sample_rate=16000):
+        """
+        Plages (début, fin) en échantillons contenant de la parole.
+        """
+        frame = max(1, int(sample_rate * self.frame_ms / 1000))
+        n_frames = len(speech_array) // frame
+        if n_frames == 0:
+            return [(0, len(speech_array))] if len(speech_array) else []
+
+        frames = np.asarray(speech_array[:n_frames * frame], dtype=np.float32).reshape(n_frames, frame)
+        db = 10 * np.log10(np.mean(frames ** 2, axis=1) + 1e-12)
+        voiced = db > max(db.max() + self.threshold_db, self.floor_db)
+        if not voiced.any():
+            return []
+
+        # Plages de trames voisées consécutives
+        edges = np.diff(np.concatenate(([0], voiced.astype(np.int8), [0])))
+        starts, ends = np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+
+        # Fusion des plages séparées par une pause courte (ou toutes, sans découpage)
+        max_gap = self.min_pause_s * 1000 / self.frame_ms if self.split else float("inf")
+        merged = [[starts[0], ends[0]]]
+        for start, end in zip(starts[1:], ends[1:]):
+            if start - merged[-1][1] < max_gap:
+                merged[-1][1] = end
+            else:
+                merged.append([start, end])
+
+        padding = int(self.padding_s * sample_rate)
+        min_speech = int(self.min_speech_s * sample_rate)
+        ranges = []
+        for start, end in merged:
+            start = max(0, int(start) * frame - padding)
+            end = min(len(speech_array), int(end) * frame + padding)
+            if end - start >= max(min_speech, MIN_SEGMENT_SAMPLES):
+                ranges.append((start, end))
+        return ranges
+
+    def segments(self, speech_array, sample_rate=16000):
+        """
+        Segments de parole de l'audio (liste vide si l'audio n'est que silence).
+        """
+        return [segment for _, segment in self.segments_with_offsets(speech_array, sample_rate)]
+
+    def segments_with_offsets(self, speech_array, sample_rate=16000):
+        """
+        Comme segments, avec la position (échantillon de début) de chaque segment
+        dans l'audio : liste de (début, segment).
+        """
+        ranges = self.speech_ranges(speech_array, sample_rate)
+        kept = sum(end - start for start, end in ranges)
+        with self._lock:
+            self._audios += 1
+            self._segments += len(ranges)
+            self._total_s += len(speech_array) / sample_rate
+            self._skipped_s += (len(speech_array) - kept) / sample_rate
+        return [(start, speech_array[start:end]) for start, end in ranges]
+
+    def stats(self):
+        with self._lock:
+            return {
+                "audios": self._audios,
+                "segments": self._segments,
+                "duree_totale_s": round(self._total_s, 2),
+                "silence_ignore_s": round(float(self._skipped_s), 2),
+                "part_ignoree": float(self._skipped_s / self._total_s) if self._total_s else 0.0,
+            }